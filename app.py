@@ -1,11 +1,11 @@
 from __future__ import division
-import ode, sys, math, pygame
+import ode, sys, math, pygame, threading, time
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
-import collision, util, console, resman, app
+import collision, util, console, resman, broadphase, simthread, lod, stepsched, forceacc, app
 from geometry import *
 
 #The ODE simulation
@@ -13,7 +13,11 @@ odeworld = None
 static_space = None
 dyn_space = None
 
-#All the various game objects in a LayeredList (sim_init() prepares this to have objects shoved in it)
+#broadphase.SpaceConfs used by optimize_spaces(); if None, it picks a configuration automatically
+static_space_conf = None
+dyn_space_conf = None
+
+#All the various game objects in a util.ObjectRegistry (sim_init() prepares this to have objects shoved in it)
 objects = None
 
 #Input events (from PyGame) which occurred this step
@@ -31,9 +35,26 @@ collisions = {}
 #A group for momentary joints; the group is emptied each step, so joints only last for one step
 contactgroup = ode.JointGroup()
 
+#Number of contact joints created this step
+contact_count = 0
+
 winsize = Size(1024, 768) #Size of the display window in pixels; TODO: should be a user setting
 winmeters = Size(4, 3) #Size of the display window in meters
-maxfps = 60 #Max frames per second, and absolute sim-steps per second
+maxfps = 60 #Max frames per second drawn
+simfps = 60 #Absolute sim-steps per second, whatever the frame rate
+max_catchup_steps = 5 #The most sim steps run between two frames; after a long hitch, the sim falls behind instead
+interp = 1.0 #How far (0 to 1) drawing is between the previous and latest sim states; see GameObj.draw_pos()
+threaded_sim = False #If True, run() steps the simulation on its own thread (see simthread.py) while drawing on this one
+sim_lock = threading.RLock() #Held by the sim thread during each step; hold it to safely poke at the world from elsewhere
+lod_enabled = False #If True, objects far from the camera get less simulation; see lod.py
+lod_region_size = 4.0 #Size in meters of the square regions that are assigned level of detail tiers
+lod_ranges = (12.0, 24.0) #Distances from the camera beyond which regions are in the REDUCED and FROZEN tiers
+lod_step_interval = 4 #How many steps apart REDUCED tier objects run their drives
+lod_update_interval = 10 #How many steps apart lod.update() is called
+destroy_queue = [] #GameObjs that have had destroy() called on them, waiting for the end of the step to be torn down
+streamer = None #If set to a streaming.ChunkMap, it's updated each sim step to load the chunks near the camera
+scheduler = None #A stepsched.Scheduler, made by sim_init(), for drives that only need to act on certain steps
+forces = None #A forceacc.ForceAccumulator, made by sim_init(), that drives add forces to; it's flushed to ODE each step
 pixm = winsize[0]/winmeters[0] #Number of screen pixels per game meter
 camera = Point() #Where, in game meters, the view is centered
 zoom = 1.0 #The zoom factor for the camera (1.0 is neutral)
@@ -42,6 +63,15 @@ clock = None #An instance of pygame.time.Clock() used for timing; use step count
 msecs = 0 #TODO: Make sure everything uses step counters, not wall-clock time
 totalsteps = 0L #Number of simulation steps we've ran
 draw_geoms = False #If True, then GameObjs and geom-related drives draw collision geom outlines
+autodisable = True #If True, ODE puts bodies to sleep once they've settled; see GameObj.wake()
+autodisable_linear = 0.01 #Linear speed (in m/s) below which a body counts as idle
+autodisable_angular = 0.01 #Angular speed (in rads/s) below which a body counts as idle
+autodisable_steps = 10 #Number of consecutive idle steps before a body goes to sleep
+adaptive_solver = False #If True, solver iterations follow contact_count, and fast bodies are swept against static_space
+solver_iters = 10 #Number of quickStep iterations; this is the minimum if adaptive_solver is on
+max_solver_iters = 30 #With adaptive_solver, the most quickStep iterations that will be used in one step
+contacts_per_iter = 8 #With adaptive_solver, one extra quickStep iteration is used per this many contacts
+max_substeps = 8 #With adaptive_solver, the most intermediate positions checked when sweeping a fast body
 cons = None #An instances of console.Console used for in-game debugging
 watchers = [] #A sequence of console.Watchers used for in-game debugging
 
@@ -100,13 +130,10 @@ def sim_init():
 	
 	You must call this before calling run().
 
-	After calling this, app.objects will be a util.LayeredList(). Within,
-	create 6 lists, all of which are either TrackerLists or LayeredLists.
-	LayeredLists should always contain either more LayeredLists and/or TrackerLists,
-	and TrackerLists should contain only GameObjs. This way, you can make everything
-	as deep or shallow as you like, but the recursive behavior of LayeredList.append()
-	will make sure that GameObjs that are created and stuffed into some top list will
-	eventually arrive at the right place.
+	After calling this, app.objects will be an empty util.ObjectRegistry. Within,
+	append 6 util.ObjectLayers (plain lists of GameObjs are turned into ObjectLayers
+	for you). Iterating over app.objects goes through every GameObj in layer order,
+	and GameObjs can be taken out of whichever layer they're in with app.objects.remove().
 	
 	The top-level layers of objects should be as follows:
 	0 - Non-colliding background imagery, and general non-colliding GameObjs, without geoms
@@ -119,15 +146,46 @@ def sim_init():
 	
 	Objects in static_space do not collide with one another. Objects in dyn_space collide
 	with those in static_space, as well as with each other.
+	
+	Both spaces start out as plain HashSpaces. Once a level's geoms have been created,
+	call optimize_spaces() to reorganize them to suit that level.
 	"""
 	
-	global odeworld, static_space, dyn_space, objects, totalsteps
+	global odeworld, static_space, dyn_space, objects, scheduler, forces, totalsteps
 	totalsteps = 0L
+	scheduler = stepsched.Scheduler()
+	forces = forceacc.ForceAccumulator()
 	odeworld = ode.World()
-	odeworld.setQuickStepNumIterations(10)
+	odeworld.setQuickStepNumIterations(solver_iters)
+	odeworld.setAutoDisableFlag(autodisable)
+	odeworld.setAutoDisableLinearThreshold(autodisable_linear)
+	odeworld.setAutoDisableAngularThreshold(autodisable_angular)
+	odeworld.setAutoDisableSteps(autodisable_steps)
+	odeworld.setAutoDisableTime(0)
 	static_space = ode.HashSpace()
 	dyn_space = ode.HashSpace()
-	objects = util.LayeredList()
+	objects = util.ObjectRegistry()
+
+def optimize_spaces(static_conf = None, dyn_conf = None):
+	"""Rebuilds static_space and dyn_space to suit the geoms currently in them.
+	
+	Each argument is a broadphase.SpaceConf. If one is None, then static_space_conf or dyn_space_conf
+	is used instead, and if that's also None, a default configuration is picked (a QuadTreeSpace fitted
+	to the level bounds for static_space, and a HashSpace fitted to the geom sizes for dyn_space).
+	All geoms are moved over into the new spaces, so existing references to them remain valid.
+	"""
+	
+	global static_space, dyn_space, static_space_conf, dyn_space_conf
+	if static_conf != None: static_space_conf = static_conf
+	if dyn_conf != None: dyn_space_conf = dyn_conf
+	
+	if static_space_conf != None: conf = static_space_conf
+	else: conf = broadphase.default_static_conf()
+	static_space = broadphase.rebuild(static_space, conf)
+	
+	if dyn_space_conf != None: conf = dyn_space_conf
+	else: conf = broadphase.default_dyn_conf()
+	dyn_space = broadphase.rebuild(dyn_space, conf)
 
 def sim_deinit():
 	"""Deinitializes the camera and simulation, including ODE.
@@ -136,7 +194,13 @@ def sim_deinit():
 	Other than that, you don't need to call this.
 	"""
 
-	global odeworld, static_space, dyn_space, objects
+	global odeworld, static_space, dyn_space, objects, scheduler, forces, destroy_queue, streamer
+	destroy_queue = []
+	streamer = None #Its chunks hold objects and geoms from the world being thrown away
+	import bake #Not imported at the top, since bake needs gameobj, which needs app
+	bake.forget()
+	scheduler = None
+	forces = None
 	odeworld = None
 	static_space = None
 	dyn_space = None
@@ -144,29 +208,67 @@ def sim_deinit():
 	ode.CloseODE()
 
 def _sim_step():
-	"""Runs one step of the simulation. This is (1/maxfps)th of a simulated second."""
+	"""Runs one step of the simulation. This is (1/simfps)th of a simulated second."""
+	
+	global collisions, contactgroup, contact_count
 	
-	global collisions, contactgroup
+	if lod_enabled and totalsteps % lod_update_interval == 0:
+		lod.update()
+	
+	if streamer != None:
+		streamer.update()
 	
 	#Calculate collisions, run ODE simulation
 	contactgroup.empty()
 	collisions = {}
+	contact_count = 0
 	dyn_space.collide(contactgroup, collision.collision_cb) #Collisions among dyn_space objects
 	ode.collide2(dyn_space, static_space, contactgroup, collision.collision_cb) #Colls between dyn_space objects and static_space objs
-	odeworld.quickStep(1/maxfps)
+	
+	#Hand ODE the forces that drives added during the last step
+	forces.flush()
+	
+	if adaptive_solver:
+		#Crowded steps get more solver iterations, and bodies that might tunnel through something get swept afterwards
+		odeworld.setQuickStepNumIterations(min(max_solver_iters, solver_iters + contact_count//contacts_per_iter))
+		fast = collision.find_fast(objects, 1/simfps)
+		odeworld.quickStep(1/simfps)
+		collision.sweep(fast, max_substeps)
+	else:
+		odeworld.quickStep(1/simfps)
 		
-	#Cancel non-2d activity, and load each GameObj's state with the new information ODE calculated
+	#Load each GameObj's state with the new information ODE calculated
 	for o in objects:
 		o.sync_ode()
+	
+	#Make any scheduled calls that are due this step
+	scheduler.tick()
 
 	#Have each object do any simulation stuff it needs
 	for o in objects:
 		o.step()
+	
+	flush_destroyed()
 
-def _draw_frame():
+def flush_destroyed():
+	"""Tears down every GameObj that has had destroy() called on it since the last time this was called.
+	
+	This is called at the end of every sim step, so there's usually no need to call it yourself."""
+	global destroy_queue
+	while len(destroy_queue) > 0:
+		doomed = destroy_queue
+		destroy_queue = [] #Tearing down can destroy more objects; those are handled on the next time around
+		for o in doomed:
+			o._teardown()
+
+def _draw_frame(shot = None):
+	"""Draws a frame of the world, or of a simthread.Snapshot if one is given."""
 	global msecs
 	msecs = clock.get_time()
 	
+	#Free textures that were let go of on the sim thread, now that GL calls are safe
+	resman.flush_unloads()
+	
 	glClear(GL_COLOR_BUFFER_BIT)
 	glLoadIdentity();
 	gluOrtho2D(0.0, winsize[0]*zoom, winsize[1]*zoom, 0.0) #This makes the y-axis go in the direction we want
@@ -175,15 +277,21 @@ def _draw_frame():
 	glScalef(pixm, pixm, 0) #OpenGL units are now game meters, not pixels
 	
 	#Mostly, this is used for setting the camera's position
-	for o in objects:
-		o.predraw()
+	if shot != None:
+		shot.predraw()
+	else:
+		for o in objects:
+			o.predraw()
 	
 	#Translate so that camera position is centered
 	glTranslatef((winsize[0]*zoom)/(2*pixm) - camera[0], (winsize[1]*zoom)/(2*pixm) - camera[1], 0)
 
 	#This actually draws the objects
-	for o in objects:
-		o.draw()
+	if shot != None:
+		shot.draw()
+	else:
+		for o in objects:
+			o.draw()
 	
 	glPopMatrix()
 	
@@ -212,32 +320,81 @@ def _proc_input():
 			events.append(event)
 	keys = pygame.key.get_pressed()
 
+def _run_threaded():
+	"""Like run(), but with the simulation stepping on a simthread.SimThread.
+	
+	This thread just handles input and draws the latest snapshot published by the sim thread,
+	so simulation and drawing overlap instead of taking turns."""
+	global interp
+	worker = simthread.SimThread()
+	worker.start()
+	try:
+		while worker.error == None:
+			clock.tick(maxfps)
+			
+			#Console commands may touch the world, so keep the sim thread out while handling input
+			#The sim thread replaces events with its own list once it gets the lock, so hold on to ours first
+			sim_lock.acquire()
+			try:
+				_proc_input()
+				(my_events, my_keys) = (events, keys)
+			finally:
+				sim_lock.release()
+			worker.give_input(my_events, my_keys)
+			
+			(prev, shot) = worker.latest()
+			interp = min((time.time() - shot.time)*simfps, 1.0)
+			shot.show(prev, interp)
+			_draw_frame(shot)
+		raise worker.error
+	finally:
+		worker.stop()
+		for o in objects:
+			o._shown = None
+
 def run():
 	"""Runs the game.
 	
 	You have to call ui_init() and sim_init() before running this.
+	
+	The simulation runs at a fixed simfps steps per second, while frames are drawn
+	at up to maxfps. Frames are drawn between the latest two sim states (see interp),
+	so motion stays smooth even when the two rates don't line up. If the game falls too
+	far behind, then at most max_catchup_steps are run before the next frame, and the
+	rest of the lost time is dropped.
+	
+	If threaded_sim is True, then the simulation runs on a separate thread instead.
 	"""
-	global totalsteps
+	global totalsteps, interp
 	
 	try:
-		totalms = 0L       #Total number of milliseconds passed
+		if threaded_sim:
+			_run_threaded()
+			return
+		
+		owedms = 0.0 #Milliseconds of simulation time that haven't been stepped through yet
+		stepms = 1000/simfps
 		while True:
 			elapsedms = clock.tick(maxfps)
 			
 			if not cons.active:
-				totalms += elapsedms
+				owedms += elapsedms
 				
 				#Figure out how many simulation steps we're doing this frame.
-				#In theory, shouldn't be zero, since frames per second is the same as steps per second
-				#However, it's alright to be occasionally zero, since clock.tick is sometimes slightly off
-				steps = int(math.floor((totalms*maxfps/1000)))-totalsteps
+				#This may well be zero when drawing faster than simfps.
+				steps = int(math.floor(owedms/stepms))
+				if steps > max_catchup_steps:
+					steps = max_catchup_steps
+					owedms = steps*stepms
 				
 				#Run the simulation the desired number of steps
 				for i in range(steps):
 					_proc_input()
 					_sim_step()
+					totalsteps += 1
 				
-				totalsteps += steps
+				owedms -= steps*stepms
+				interp = owedms/stepms
 			else:
 				_proc_input()
 			
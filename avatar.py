@@ -29,6 +29,7 @@ class DAvatar(drive.Drive):
 	lantern_ang -- Current angle of the lantern from Satyrn, controlled by player.
 	last_push_step -- The step at which the player last pushed a direction.
 	last_push_ang -- The last angle that the player pushed from (that is, the lantern's angle).
+	lantern_drifting -- True once lantern_drift_delay steps have passed since the player last pushed a direction.
 	attack_rot_speed -- How fast (in revs per second) the attack angle changes
 		when the player pushes a direction during an attack. This is also the
 		speed at which Satyrn's orientation can be manually changed while the
@@ -42,7 +43,7 @@ class DAvatar(drive.Drive):
 	"""
 	
 	def __init__(self):
-		super(DAvatar, self).__init__(drawing = True, stepping = True)
+		super(DAvatar, self).__init__(drawing = True, stepping = True, sleep_stepping = True)
 		self.sprite = sprite.DSprite("float",
 			{
 				"crouch-flip":image.DImage("satyrn/crouch-flip.png", Size(1.0, 1.0)),
@@ -118,6 +119,9 @@ class DAvatar(drive.Drive):
 		self.lantern_ang = 0.5
 		self.last_push_step = 0
 		self.last_push_ang = 0.5
+		self.lantern_drifting = False
+		self._pushing = True #So that the first step without a push schedules the drift as though released at step 0
+		self._drift_timer = None
 		self.attack_rot_speed = 3
 		self.cruise_push = 1.8
 		self.cruise_max_speed = 1.5
@@ -126,18 +130,39 @@ class DAvatar(drive.Drive):
 		self.boost_max_speed = 5
 		self.stall_push = 4
 	
+	def clone(self):
+		ret = super(DAvatar, self).clone()
+		ret.sprite = self.sprite.clone()
+		ret.field_attack = self.field_attack.clone()
+		ret.field_boost = self.field_boost.clone()
+		ret.lantern = self.lantern.clone()
+		ret.lantern_drifting = False
+		ret._pushing = True
+		ret._drift_timer = None
+		return ret
+	
+	def destroy(self, obj):
+		if self._drift_timer != None:
+			self._drift_timer.cancel()
+			self._drift_timer = None
+	
+	def _start_drift(self):
+		self._drift_timer = None
+		self.lantern_drifting = True
+	
 	def _draw(self, obj):
-		self.lantern.offset = Point(self.lantern_rad, 0).rot(Point(0,0), self.lantern_ang-obj.ang)
+		ang = obj.draw_ang()
+		self.lantern.offset = Point(self.lantern_rad, 0).rot(Point(0,0), self.lantern_ang-ang)
 		self.lantern.draw(obj)
 		self.sprite.draw(obj)
-		self.field_boost.rot_offset = self.lantern_ang-obj.ang
+		self.field_boost.rot_offset = self.lantern_ang-ang
 		self.field_boost.draw(obj)
 		self.field_attack.draw(obj)
 	
 	def _step(self, obj):
 		# Add strong angular drag; Satyrn has a tendency to make himself stop rotating
 		angVel = obj.body.getAngularVel()[2]
-		obj.body.addTorque((0, 0, -angVel/4))
+		app.forces.add_torque(obj, -angVel/4, "avatar drag")
 		
 		# Figure out which direction the user is pressing in
 		push_vec = Point(0, 0)
@@ -150,6 +175,10 @@ class DAvatar(drive.Drive):
 		if app.keys[K_RIGHT]:
 			push_vec[0] = 1
 		
+		# Any input at all means Satyrn is about to be pushed around, so he can't stay asleep
+		if push_vec[0] != 0 or push_vec[1] != 0 or app.keys[K_v] or app.keys[K_b]:
+			obj.wake()
+		
 		# Turn on the attack animation if they're holding down the sword key
 		if app.keys[K_v]:
 			if self.field_attack.cur_anim == "null":
@@ -183,20 +212,30 @@ class DAvatar(drive.Drive):
 		if push_vec[0] != 0 or push_vec[1] != 0:
 			self.last_push_step = app.totalsteps
 			self.last_push_ang = des_lantern_ang = (-push_vec).ang()
-		elif self.field_attack.cur_anim == "null" and self.field_boost.cur_anim == "null" and obj.vel.mag() > 0.01 and app.totalsteps - self.last_push_step >= self.lantern_drift_delay:
+			if self._drift_timer != None:
+				self._drift_timer.cancel()
+				self._drift_timer = None
+			self.lantern_drifting = False
+			self._pushing = True
+		elif self._pushing:
+			# Just let go; the scheduler lets us know when the drift delay is up, so there's no counting steps here
+			self._pushing = False
+			self._drift_timer = app.scheduler.call_at(self.last_push_step + self.lantern_drift_delay, self._start_drift)
+		
+		if self.lantern_drifting and self.field_attack.cur_anim == "null" and self.field_boost.cur_anim == "null" and obj.vel.mag() > 0.01:
 			lantern_rot_speed = self.lantern_drift_rot_speed
 			self.last_push_ang = des_lantern_ang = (-obj.vel).ang()
 		
 		if self.field_attack.cur_anim != "null":	
 			# When an attack field is up, orient Satyrn (and also, the sword) to face away from the lantern
-			obj.ang += util.cap_ang_diff(util.min_ang_diff(obj.ang, des_lantern_ang + 0.5), self.attack_rot_speed/app.maxfps)
+			obj.ang += util.cap_ang_diff(util.min_ang_diff(obj.ang, des_lantern_ang + 0.5), self.attack_rot_speed/app.simfps)
 			
 			# Holding down the attack field means killing rotation and slowing/killing linear velocity
 			obj.body.setAngularVel((0,0,0))
-			push = -obj.vel * app.maxfps * obj.body.getMass().mass
+			push = -obj.vel * app.simfps * obj.body.getMass().mass
 			if push.mag() > self.stall_push:
 				push = push.to_length(self.stall_push)
-			obj.body.addForce(push.fake_3d_tuple())
+			app.forces.add_force(obj, push, "avatar stall")
 		
 		# If player is not attacking, but is pushing the boost button and/or holding a direction, move Satyrn
 		# Either way, set his animation to be appropriate to his movement/non-movement
@@ -209,16 +248,16 @@ class DAvatar(drive.Drive):
 				# If we're already going faster, we'll have to ditch some of that existing speed first
 				# This means that Satyrn will be twice as effective slowing down from speed with a cruise as speeding up
 				# That's basically just fine, even though it is unrealistic
-				post_vel = obj.vel + (force/(obj.body.getMass().mass * app.maxfps))
+				post_vel = obj.vel + (force/(obj.body.getMass().mass * app.simfps))
 				if post_vel.mag() > self.cruise_max_speed:
-					diff = (post_vel - post_vel.to_length(self.cruise_max_speed)) * obj.body.getMass().mass * app.maxfps
+					diff = (post_vel - post_vel.to_length(self.cruise_max_speed)) * obj.body.getMass().mass * app.simfps
 					if diff.mag() > self.cruise_push:
 						diff = diff.to_length(self.cruise_push)
 					force -= diff
 					
-			obj.body.addForce(force.fake_3d_tuple())
+			app.forces.add_force(obj, force, "avatar push")
 		elif self.field_boost.cur_anim == "null":
 			self.sprite.cur_anim = "float"
 		
 		# Move the lantern towards the pressed direction
-		self.lantern_ang += util.cap_ang_diff(util.min_ang_diff(self.lantern_ang, des_lantern_ang), lantern_rot_speed/app.maxfps)
+		self.lantern_ang += util.cap_ang_diff(util.min_ang_diff(self.lantern_ang, des_lantern_ang), lantern_rot_speed/app.simfps)
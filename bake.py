@@ -0,0 +1,319 @@
+"""Merging the unchanging parts of a level into a few big pieces.
+
+Layer 1 is mostly walls and floors: separate static GameObjs, each with its own box geom and
+its own image drive, which go through the broadphase and get drawn one by one every frame even
+though they never change. bake() groups them into square regions, and replaces each region's
+objects with a single GameObj that has:
+- As few GeomBoxes as cover all the boxes: boxes with the same collision properties that line up
+  along a whole side are merged into one, and rotated boxes each keep a GeomBox of their own
+- A DBakedBatch drive, which draws all the region's images with one display list per texture
+
+The original objects are kept in the Baked records (and anything else that refers to them, such as
+level.Level.names), with their geoms taken out of static_space, so they can still be looked at
+while debugging. unbake() puts them back.
+
+Only objects that can't tell the difference are baked: ones with a box geom (see geommold.BoxGeomMold)
+in static_space, no body, no props, not kinematic, and no drives other than image.DImage and
+image.DTiledImage. Everything else is left as it is.
+"""
+
+from __future__ import division
+import math
+from OpenGL.GL import *
+
+import app, gameobj, geommold, image, util, drive, collision
+from geometry import *
+
+REGION_SIZE = 16.0 #Default size in meters of the square regions that are each baked together
+EPSILON = 0.0001 #How close in meters box edges have to be to count as lined up
+
+_baked = [] #Every Baked that hasn't been unbaked yet
+
+class Baked(object):
+	"""A region of objects that have been baked together by bake().
+
+	Data attributes:
+	region -- The (x, y) index of the region.
+	layer -- The index of the layer in app.objects that the objects were in.
+	obj -- The GameObj that stands in for them; its geom is the first of geoms.
+	geoms -- The merged collision GeomBoxes.
+		They all have obj as their gameobj, but only the first is obj's geom.
+	objs -- The original GameObjs, no longer in app.objects.
+	"""
+
+	def __init__(self, region, layer, obj, geoms, objs):
+		self.region = region
+		self.layer = layer
+		self.obj = obj
+		self.geoms = geoms
+		self.objs = objs
+
+
+class _StandIn(gameobj.GameObj):
+	#The GameObj that takes the place of a baked region's objects; it collides through all of the region's merged geoms
+	
+	owns_geoms = True
+	
+	def __init__(self, pos, geoms):
+		super(_StandIn, self).__init__(pos = pos)
+		self._geoms = geoms
+		if len(geoms) > 0:
+			self.geom = geoms[0]
+		for g in geoms[1:]:
+			g.gameobj = self
+	
+	def owned_geoms(self):
+		return list(self._geoms)
+	
+	def _drop_geoms(self):
+		self.geom = None
+		for g in self._geoms[1:]:
+			util.remove_geom(g)
+			g.gameobj = None
+		self._geoms = []
+	
+	def _teardown(self):
+		self._drop_geoms()
+		super(_StandIn, self)._teardown()
+
+
+class DBakedBatch(drive.Drive):
+	"""Drive that draws the images of a baked region.
+
+	Each batch is a texture, the wrapping to use with it (or None to leave it alone, as DImage
+	does), and a list of quads, each four (texture coordinate, vertex) pairs relative to the object.
+	The quads for each batch are compiled into a GL display list the first time they're drawn.
+
+	Data attributes:
+	batches -- A list of (resman.Texture, wrap, quads) tuples, where wrap is None or a (GL wrap s, GL wrap t) tuple.
+	"""
+
+	def __init__(self, batches):
+		super(DBakedBatch, self).__init__(drawing = True)
+		self.batches = batches
+		self._lists = None
+
+	def __str__(self):
+		return super(DBakedBatch, self).__str__() + "(%i textures)" % len(self.batches)
+
+	def clone(self):
+		ret = super(DBakedBatch, self).clone()
+		ret._lists = None
+		return ret
+
+	def destroy(self, obj):
+		if self._lists != None:
+			glDeleteLists(self._lists, len(self.batches))
+			self._lists = None
+
+	def _compile(self):
+		self._lists = glGenLists(len(self.batches))
+		for (i, (tex, wrap, quads)) in enumerate(self.batches):
+			glNewList(self._lists + i, GL_COMPILE)
+			glBegin(GL_QUADS)
+			for quad in quads:
+				for (texcoord, vertex) in quad:
+					glTexCoord2fv(texcoord)
+					glVertex2fv(vertex)
+			glEnd()
+			glEndList()
+
+	def _draw(self, obj):
+		if self._lists == None:
+			self._compile()
+		glEnable(GL_TEXTURE_2D)
+		glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+		for (i, (tex, wrap, quads)) in enumerate(self.batches):
+			glBindTexture(GL_TEXTURE_2D, tex.glname)
+			if wrap != None:
+				glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap[0])
+				glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap[1])
+			glCallList(self._lists + i)
+		glDisable(GL_TEXTURE_2D)
+
+
+def _bakeable(o):
+	if o.geom == None or o.body != None or o.kinematic or len(o.props) > 0:
+		return False
+	if isinstance(o, gameobj.LimbedGameObj):
+		return False
+	if not isinstance(o.geom.mold, geommold.BoxGeomMold):
+		return False
+	if not app.static_space.query(o.geom):
+		return False
+	for d in o.drives:
+		if type(d) not in (image.DImage, image.DTiledImage):
+			return False
+	return True
+
+def _quad(d, xform):
+	#Returns the texture, wrap and quad (see DBakedBatch) that drive d draws, with vertices put through xform
+	#The texture coordinates are worked out the same way as in the drives' _draw() methods
+	corners = (d.size.tl(), d.size.tr(), d.size.br(), d.size.bl())
+	if isinstance(d, image.DTiledImage):
+		texoffset = (d.size/d.tilesize - 1)/2
+		gl_tile_offset = (-d.tileoffset)/d.tilesize
+		gl_tile_offset[1] = -gl_tile_offset[1]
+		texcoords = (
+			Point(0 - texoffset[0], 1 + texoffset[1]) + gl_tile_offset,
+			Point(1 + texoffset[0], 1 + texoffset[1]) + gl_tile_offset,
+			Point(1 + texoffset[0], 0 - texoffset[1]) + gl_tile_offset,
+			Point(0 - texoffset[0], 0 - texoffset[1]) + gl_tile_offset,
+		)
+		wrap = []
+		for c in d.clamp:
+			if c: wrap.append(0x812F) #GL_CLAMP_TO_EDGE
+			else: wrap.append(GL_REPEAT)
+		wrap = tuple(wrap)
+	else:
+		texcoords = (Point(0.0, 1.0), Point(1.0, 1.0), Point(1.0, 0.0), Point(0.0, 0.0))
+		wrap = None
+	quad = [(tuple(texcoords[i]), tuple(xform.apply(corners[i]))) for i in range(4)]
+	return (d.tex, wrap, quad)
+
+def _props_key(props):
+	if props == None: return None
+	return (props.intersec_push, props.intersec_pri)
+
+def _axis_aligned(o):
+	#Returns True if the object's box has its sides along the x and y axes
+	quarters = (o.ang*4) % 1
+	return quarters < EPSILON or quarters > 1 - EPSILON
+
+def _merge_rects(rects):
+	#Greedily merges (minx, maxx, miny, maxy) rects that line up along a whole side and touch or overlap
+	rects = list(rects)
+	merged = True
+	while merged:
+		merged = False
+		for i in range(len(rects)):
+			a = rects[i]
+			for j in range(i+1, len(rects)):
+				b = rects[j]
+				same_y = abs(a[2]-b[2]) < EPSILON and abs(a[3]-b[3]) < EPSILON
+				same_x = abs(a[0]-b[0]) < EPSILON and abs(a[1]-b[1]) < EPSILON
+				touch_x = a[0] <= b[1] + EPSILON and b[0] <= a[1] + EPSILON
+				touch_y = a[2] <= b[3] + EPSILON and b[2] <= a[3] + EPSILON
+				if (same_y and touch_x) or (same_x and touch_y):
+					rects[i] = (min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]))
+					del rects[j]
+					merged = True
+					break
+			if merged:
+				break
+	return rects
+
+def _bake_region(region, layer, objs, region_size):
+	#Merge the boxes into as few GeomBoxes as possible, separately for each kind of collision properties
+	#Axis-aligned boxes that line up are merged together; rotated ones get a GeomBox each
+	mold = geommold.BoxGeomMold()
+	walls = {} #Key is _props_key(), value is (collision.Props, list of rects, list of rotated objects)
+	order = []
+	for o in objs:
+		props = o.geom.coll_props
+		key = _props_key(props)
+		if key == None:
+			continue #Never collides, so it doesn't need a geom
+		if not walls.has_key(key):
+			walls[key] = (collision.Props(props.intersec_push, props.intersec_pri), [], [])
+			order.append(key)
+		if _axis_aligned(o):
+			size = o.geom.geom_args[0]
+			if int(round(o.ang*4)) % 2 == 1: #Turned a quarter or three quarters, so width and height swap
+				size = Size(size[1], size[0])
+			walls[key][1].append((o.pos[0] - size[0]/2, o.pos[0] + size[0]/2, o.pos[1] - size[1]/2, o.pos[1] + size[1]/2))
+		else:
+			walls[key][2].append(o)
+	
+	geoms = []
+	for key in order:
+		(props, rects, rotated) = walls[key]
+		for (minx, maxx, miny, maxy) in _merge_rects(rects):
+			geom = mold.make_geom(Size(maxx-minx, maxy-miny), app.static_space, props)
+			geom.setPosition(((minx+maxx)/2, (miny+maxy)/2, 0))
+			geoms.append(geom)
+		for o in rotated:
+			geom = mold.make_geom(o.geom.geom_args[0], app.static_space, props)
+			geom.setPosition(o.geom.getPosition())
+			geom.setRotation(o.geom.getRotation())
+			geoms.append(geom)
+	
+	#The stand-in object takes its place from its geom, or sits in the middle of the region if there isn't one
+	obj = _StandIn(Point((region[0]+0.5)*region_size, (region[1]+0.5)*region_size), geoms)
+	to_local = obj.transform().inverse()
+
+	#Gather up the images, grouped by texture and wrapping
+	batches = {} #Key is (texture filename, wrap), value is (texture, wrap, quads)
+	border = []
+	for o in objs:
+		for d in o.drives:
+			if not d.drawing:
+				continue
+			(tex, wrap, quad) = _quad(d, to_local * o.transform() * d.local_transform())
+			key = (tex.filename, wrap)
+			if not batches.has_key(key):
+				batches[key] = (tex, wrap, [])
+				border.append(key)
+			batches[key][2].append(quad)
+	obj.drives.append(DBakedBatch([batches[k] for k in border]))
+
+	#Every geom draws the outlines of all the original boxes, in the stand-in object's frame
+	outlines = []
+	for o in objs:
+		size = o.geom.geom_args[0]
+		outlines.append(image.DPoly([(to_local * o.transform()).apply(c) for c in (size.tl(), size.tr(), size.br(), size.bl())]))
+	for g in geoms:
+		g.draw_drives = outlines
+
+	for o in objs:
+		app.objects.remove(o)
+		util.remove_geom(o.geom)
+	app.objects[layer].append(obj)
+	return Baked(region, layer, obj, geoms, objs)
+
+def bake(layer = 1, region_size = REGION_SIZE):
+	"""Bakes the static objects in a layer of app.objects together, region by region, and returns a list of Baked records.
+
+	Regions with only one bakeable object are left alone. Afterwards, call app.optimize_spaces() so
+	that static_space suits its new, smaller set of geoms."""
+	regions = {}
+	order = []
+	for o in app.objects[layer]:
+		if not _bakeable(o):
+			continue
+		region = (int(math.floor(o.pos[0]/region_size)), int(math.floor(o.pos[1]/region_size)))
+		if not regions.has_key(region):
+			regions[region] = []
+			order.append(region)
+		regions[region].append(o)
+
+	ret = []
+	for region in order:
+		if len(regions[region]) > 1:
+			ret.append(_bake_region(region, layer, regions[region], region_size))
+	_baked.extend(ret)
+	return ret
+
+def unbake(baked = None):
+	"""Undoes bake() for the given Baked records, or for everything baked if none are given.
+
+	The original objects are put back at the end of their layer, and their geoms back in static_space."""
+	if baked == None:
+		baked = list(_baked)
+	for b in baked:
+		_baked.remove(b)
+		b.obj._drop_geoms() #Right away, rather than when it's torn down, so they're gone before the originals are back
+		b.obj.destroy()
+		for o in b.objs:
+			app.static_space.add(o.geom)
+			app.objects[b.layer].append(o)
+
+def baked():
+	"""Returns a list of every Baked that hasn't been unbaked."""
+	return list(_baked)
+
+def forget():
+	"""Forgets every Baked record without unbaking anything.
+	
+	This is for when the world they're in is being thrown away; app.sim_deinit() calls it."""
+	del _baked[:]
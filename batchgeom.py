@@ -0,0 +1,108 @@
+"""Versions of the geometry module's point operations that work on many points at once.
+
+Each function takes an N x 2 NumPy array of points (see points()) and returns an array.
+The arithmetic is done in the same order as the one-point-at-a-time method it mirrors
+(noted in each docstring), so that switching a loop over to these doesn't change its results.
+The trig functions are the only exception: rot() and the rect functions go through NumPy's
+sin, cos and arctan2, which can differ from the math module's in the last bit.
+
+NumPy is optional. If it isn't installed, enabled is False, and callers should fall back
+to the methods in geometry.
+"""
+
+from __future__ import division
+import math
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import util
+from geometry import *
+
+enabled = numpy != None #True if the functions in this module can be used
+
+def points(seq):
+	"""Returns an N x 2 array of floats from a sequence of Points or 2-tuples."""
+	if len(seq) == 0:
+		return numpy.zeros((0, 2))
+	return numpy.array(seq, dtype = numpy.float64).reshape(len(seq), 2)
+
+def to_points(arr):
+	"""Returns a list of Points from an N x 2 array."""
+	return [Point(float(x), float(y)) for (x, y) in arr]
+
+def dist(pts, other):
+	"""Returns an array of the distances from each of pts to other, like pts[i].dist_to(other).
+
+	Other can be a single point, or an array of points the same length as pts."""
+	if isinstance(other, numpy.ndarray) and other.ndim == 2:
+		ox, oy = other[:,0], other[:,1]
+	else:
+		ox, oy = other[0], other[1]
+	return numpy.sqrt((pts[:,0]-ox)**2.0 + (pts[:,1]-oy)**2.0)
+
+def rot(pts, cen, ang):
+	"""Returns pts rotated around cen by a given number of cw revolutions, like pts[i].rot(cen, ang)."""
+	if abs(ang) < 0.000001:
+		return pts.copy()
+	a = util.rev2rad(ang)
+	h = numpy.sqrt((cen[0]-pts[:,0])**2.0 + (cen[1]-pts[:,1])**2.0) #Same as cen.dist_to(pt)
+	b = -2.0 * (numpy.arctan2(pts[:,1]-cen[1], pts[:,0]-cen[0])/(2*math.pi)) * math.pi #Same as util.rev2rad(cen.ang_to(pt))
+	ret = numpy.empty_like(pts)
+	ret[:,0] = h*numpy.cos(a+b)+cen[0]
+	ret[:,1] = -1*h*numpy.sin(a+b)+cen[1]
+	return ret
+
+def line_nearest(line, pts):
+	"""Returns the nearest point on a geometry.Line to each of pts, like line.nearest_pt_to(pts[i]).
+
+	Raises ZeroDivisionError if the line has no length, as nearest_pt_to() does."""
+	a, b = line.a, line.b
+	seglen = abs((a.x-b.x)**2 + (a.y-b.y)**2)
+	if seglen == 0:
+		raise ZeroDivisionError("Line has no length")
+	u = (pts[:,0]-a.x)*(b.x-a.x) + (pts[:,1]-a.y)*(b.y-a.y)
+	u /= seglen
+	u = numpy.minimum(numpy.maximum(0.0, u), 1.0)
+	ret = numpy.empty_like(pts)
+	ret[:,0] = a.x + u*(b.x-a.x)
+	ret[:,1] = a.y + u*(b.y-a.y)
+	return ret
+
+def line_dist(line, pts):
+	"""Returns the distance from each of pts to the nearest point on a geometry.Line.
+
+	Same as line.nearest_pt_to(pts[i]).dist_to(pts[i])."""
+	return dist(line_nearest(line, pts), pts)
+
+def rect_contains(rect, pts):
+	"""Returns a boolean array of whether each of pts is inside a geometry.Rect, like rect.contains(pts[i])."""
+	realp = rot(pts, rect.cen, -rect.ang)
+	ret = numpy.ones(len(pts), dtype = bool)
+	for axis in range(0, 2):
+		ret &= ~(realp[:,axis] > rect.cen[axis] + rect.size[axis]/2)
+		ret &= ~(realp[:,axis] < rect.cen[axis] - rect.size[axis]/2)
+	return ret
+
+def rect_nearest(rect, pts):
+	"""Returns the nearest point in a geometry.Rect to each of pts, like rect.nearest_pt_to(pts[i])."""
+	nearest = pts.copy()
+	inside = rect_contains(rect, pts)
+	curdist = dist(pts, rect.cen)
+	for s in rect.sides():
+		cand = line_nearest(s, pts)
+		cand_dist = dist(cand, pts)
+		closer = (cand_dist < curdist) & ~inside
+		curdist = numpy.where(closer, cand_dist, curdist)
+		nearest[closer] = cand[closer]
+	return nearest
+
+def nearest(shape, pts):
+	"""Calls line_nearest() or rect_nearest(), depending on whether shape is a geometry.Line or geometry.Rect."""
+	if isinstance(shape, Line):
+		return line_nearest(shape, pts)
+	elif isinstance(shape, Rect):
+		return rect_nearest(shape, pts)
+	raise TypeError("Can't find nearest points on %r" % (shape,))
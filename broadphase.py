@@ -0,0 +1,200 @@
+from __future__ import division
+import ode, math, time
+
+import app
+from geometry import *
+
+def space_geoms(space):
+	"""Returns a list of all the geoms directly within an ODE space."""
+	return [space.getGeom(i) for i in range(space.getNumGeoms())]
+
+def geoms_bounds(geoms):
+	"""Returns an axis-aligned Rect just large enough to hold the AABBs of all the given geoms.
+
+	If there are no geoms, returns None."""
+	if len(geoms) == 0:
+		return None
+
+	minx, maxx, miny, maxy = geoms[0].getAABB()[0:4]
+	for g in geoms[1:]:
+		aabb = g.getAABB()
+		minx = min(minx, aabb[0])
+		maxx = max(maxx, aabb[1])
+		miny = min(miny, aabb[2])
+		maxy = max(maxy, aabb[3])
+	return Rect(Point((minx+maxx)/2, (miny+maxy)/2), Size(maxx-minx, maxy-miny))
+
+def geom_extents(geoms):
+	"""Returns a sorted list of the larger of the width and height of each given geom's AABB."""
+	ret = []
+	for g in geoms:
+		aabb = g.getAABB()
+		ret.append(max(aabb[1]-aabb[0], aabb[3]-aabb[2]))
+	ret.sort()
+	return ret
+
+
+class SpaceConf(object):
+	"""Describes how to build an ODE space used for broadphase collision detection.
+
+	This class is only to describe the interface that all the actual SpaceConf types have.
+	Parameters that are left as None are worked out automatically from the geoms that
+	will be placed in the space when make_space() is called.
+	"""
+
+	def make_space(self, geoms):
+		"""Returns a new top-level ODE space suited to holding the given geoms.
+
+		The geoms are not added to the space; use rebuild() for that."""
+		return None
+
+
+class SimpleSpaceConf(SpaceConf):
+	"""Creates an ODE SimpleSpace, which checks every pair of geoms.
+
+	This is only sensible for spaces with a handful of geoms in them."""
+
+	def __str__(self):
+		return "Simple"
+
+	def make_space(self, geoms):
+		return ode.SimpleSpace()
+
+
+class HashSpaceConf(SpaceConf):
+	"""Creates an ODE HashSpace, a multi-resolution grid that works well for moving geoms.
+
+	Data attributes:
+	minlevel, maxlevel -- The smallest and largest grid cell sizes, as powers of two (in meters).
+		If None, they're picked to bracket the sizes of the geoms going into the space.
+	"""
+
+	def __init__(self, minlevel = None, maxlevel = None):
+		self.minlevel = minlevel
+		self.maxlevel = maxlevel
+
+	def __str__(self):
+		return "Hash(%s, %s)" % (self.minlevel, self.maxlevel)
+
+	def make_space(self, geoms):
+		minlevel, maxlevel = self.minlevel, self.maxlevel
+		exts = [e for e in geom_extents(geoms) if e > 0]
+		if minlevel == None:
+			if len(exts) > 0: minlevel = int(math.floor(math.log(exts[0], 2)))
+			else: minlevel = -3
+		if maxlevel == None:
+			if len(exts) > 0: maxlevel = int(math.ceil(math.log(exts[-1], 2)))
+			else: maxlevel = 10
+		maxlevel = max(minlevel, maxlevel)
+
+		space = ode.HashSpace()
+		space.setLevels(minlevel, maxlevel)
+		return space
+
+
+class QuadTreeSpaceConf(SpaceConf):
+	"""Creates an ODE QuadTreeSpace, which works best for many geoms that never move.
+
+	The quadtree is fixed in place when it is created, so it's a good fit for static_space.
+
+	Data attributes:
+	center -- The Point at the center of the tree. If None, the center of the geoms' bounds.
+	extents -- The Size covered by the tree, in total (not half of it, as ODE takes it). If None, the size
+		of the geoms' bounds plus margin.
+	depth -- How many times the tree subdivides. If None, picked so that the smallest cells are
+		about the size of a typical (median) geom.
+	margin -- How much room (in meters) to leave on each side of the geoms' bounds when auto-sizing extents.
+	"""
+
+	def __init__(self, center = None, extents = None, depth = None, margin = 1.0):
+		self.center = center
+		self.extents = extents
+		self.depth = depth
+		self.margin = margin
+
+	def __str__(self):
+		return "QuadTree(%s, %s, %s)" % (self.center, self.extents, self.depth)
+
+	def make_space(self, geoms):
+		center, extents, depth = self.center, self.extents, self.depth
+		bounds = geoms_bounds(geoms)
+		if bounds == None:
+			bounds = Rect(Point(0, 0), Size(0, 0))
+		if center == None:
+			center = bounds.cen
+		if extents == None:
+			extents = bounds.size + self.margin*2
+		if depth == None:
+			exts = [e for e in geom_extents(geoms) if e > 0]
+			if len(exts) > 0:
+				#Each level halves the cells, so the smallest are extents/2**depth across
+				typical = exts[len(exts)//2]
+				depth = int(math.ceil(math.log(max(extents[0], extents[1])/typical, 2)))
+				depth = min(max(depth, 1), 10)
+			else:
+				depth = 4
+
+		#ODE's root block spans center plus or minus the extents it's given, so it gets half of ours
+		return ode.QuadTreeSpace((center[0], center[1], 0), (extents[0]/2, extents[1]/2, 1), depth)
+
+
+def rebuild(space, conf):
+	"""Moves every geom out of the given space into a new one made from conf, and returns the new space.
+
+	The old space is left empty."""
+	geoms = space_geoms(space)
+	newspace = conf.make_space(geoms)
+	for g in geoms:
+		space.remove(g)
+		newspace.add(g)
+	return newspace
+
+def default_static_conf():
+	"""Returns the SpaceConf used for app.static_space when the level doesn't choose one."""
+	return QuadTreeSpaceConf()
+
+def default_dyn_conf():
+	"""Returns the SpaceConf used for app.dyn_space when the level doesn't choose one."""
+	return HashSpaceConf()
+
+def _count_cb(counter, geom1, geom2):
+	#Broadphase-only callback; just counts candidate pairs, doesn't generate contacts
+	counter[0] += 1
+
+def benchmark(confs = None, steps = 100):
+	"""Times broadphase collision detection on the current level under several space configurations.
+
+	Confs is a sequence of (static SpaceConf, dyn SpaceConf) pairs. Each configuration is timed
+	over the given number of steps, performing the same collide() calls as app's sim step
+	(but only counting candidate pairs, not generating contacts). The level is left using
+	app.static_space_conf and app.dyn_space_conf afterwards.
+
+	Returns a list of (description, msecs per step, candidate pairs per step) tuples, and also
+	prints them out as a table."""
+
+	if confs == None:
+		confs = (
+			(SimpleSpaceConf(), SimpleSpaceConf()),
+			(HashSpaceConf(), HashSpaceConf()),
+			(HashSpaceConf(-3, 5), HashSpaceConf(-3, 5)),
+			(QuadTreeSpaceConf(), HashSpaceConf()),
+		)
+
+	results = []
+	for (static_conf, dyn_conf) in confs:
+		app.static_space = rebuild(app.static_space, static_conf)
+		app.dyn_space = rebuild(app.dyn_space, dyn_conf)
+		counter = [0]
+		start = time.time()
+		for i in range(steps):
+			app.dyn_space.collide(counter, _count_cb)
+			ode.collide2(app.dyn_space, app.static_space, counter, _count_cb)
+		msecs = (time.time() - start)*1000/steps
+		desc = "%s / %s" % (static_conf, dyn_conf)
+		results.append((desc, msecs, counter[0]/steps))
+
+	app.optimize_spaces()
+
+	for (desc, msecs, pairs) in results:
+		print "%-50s %8.3f ms %8.1f pairs" % (desc, msecs, pairs)
+	return results
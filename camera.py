@@ -23,7 +23,7 @@ class DCameraDirect(drive.Drive):
 		else:	self.offset = offset
 	
 	def _predraw(self, obj):
-		wanted_pos = obj.pos + self.offset
+		wanted_pos = obj.draw_pos() + self.offset
 		if self.bounds == None:
 			app.camera = wanted_pos
 		else:
@@ -50,7 +50,7 @@ class DCameraLead(drive.Drive):
 	"""
 	
 	def __init__(self, bounds = None, max_speed = 4.0, lead_length = 0.5, cam_speed = 0.6, max_zoom = 0.4, zoom_speed = 0.5):
-		super(DCameraLead, self).__init__(drawing = True, stepping = True)
+		super(DCameraLead, self).__init__(drawing = True, stepping = True, sleep_stepping = True)
 		self.bounds = bounds
 		self.max_speed = max_speed
 		self.lead_length = lead_length
@@ -58,6 +58,7 @@ class DCameraLead(drive.Drive):
 		self.max_zoom = max_zoom
 		self.zoom_speed = zoom_speed
 		self._cur_offset = Point(0, 0) #The camera's offset as of now
+		self._prev_offset = Point(0, 0) #The camera's offset as of the previous step, for interpolating between steps
 		self._cur_zoom = 0 #The camera's zoom offset as of now (added to the neutral 1.0 zoom)
 	
 	def _step(self, obj):
@@ -65,19 +66,21 @@ class DCameraLead(drive.Drive):
 		
 		des_offset = obj.vel.to_length(self.lead_length * (speed/self.max_speed))
 		diff = des_offset - self._cur_offset
-		if diff.mag() > self.cam_speed/app.maxfps:
-			diff = diff.to_length(self.cam_speed/app.maxfps)
-		self._cur_offset += diff
+		if diff.mag() > self.cam_speed/app.simfps:
+			diff = diff.to_length(self.cam_speed/app.simfps)
+		self._prev_offset = self._cur_offset
+		self._cur_offset = self._cur_offset + diff
 		
 		des_zoom = self.max_zoom * (speed/self.max_speed)
 		diff = des_zoom - self._cur_zoom
-		if abs(diff) > self.zoom_speed/app.maxfps:
+		if abs(diff) > self.zoom_speed/app.simfps:
 			if diff > 0:
-				diff = self.zoom_speed/app.maxfps
+				diff = self.zoom_speed/app.simfps
 			else:
-				diff = -self.zoom_speed/app.maxfps
+				diff = -self.zoom_speed/app.simfps
 		self._cur_zoom += diff
 	
 	def _predraw(self, obj):
 		#app.zoom = 1.0 + self._cur_zoom
-		DCameraDirect(self.bounds, self._cur_offset)._predraw(obj)
+		offset = self._prev_offset + (self._cur_offset - self._prev_offset)*min(app.interp, 1.0)
+		DCameraDirect(self.bounds, offset)._predraw(obj)
@@ -1,23 +1,137 @@
 from __future__ import division
 
-import ode, sre
+import ode, sre, math
 
 import app, util
 from geometry import *
 
 def collision_cb(contactgroup, geom1, geom2):
-	"""Callback function to the collide method."""
+	"""Callback function to the collide method.
+	
+	Geoms that share a coll_group (for example, the main geom and limb geoms of
+	a LimbedGameObj) never collide with each other. This lets grouped geoms live
+	directly in app.dyn_space instead of in a sub-space, which would otherwise
+	cost an extra layer of Python callbacks for every pair of nearby geoms.
+	
+	Pairs of geoms that both lack bodies (such as a kinematic GameObj and a wall) are still
+	logged in app.collisions, but get no contact joints, since neither could be pushed by the other."""
 	
 	#Get collision props objects if they exist
 	g1_coll_props = getattr(geom1, "coll_props", None)
 	g2_coll_props = getattr(geom2, "coll_props", None)
 	
-	#If both geoms either have collision properties or are spaces, then perform a collision
+	#If both geoms have collision properties, then perform a collision unless they're in the same group
 	if g1_coll_props != None and g2_coll_props != None:
+		g1_group = getattr(geom1, "coll_group", None)
+		if g1_group != None and g1_group is getattr(geom2, "coll_group", None):
+			return
 		g1_coll_props.handle_collision(geom1, geom2, contactgroup)
 	elif (geom1.isSpace() or g1_coll_props != None) and (geom2.isSpace() or g2_coll_props != None):
+		#Only reached for spaces nested within app.dyn_space or app.static_space by hand
 		ode.collide2(geom1, geom2, contactgroup, collision_cb)
 
+def _hit_cb(hit, geom1, geom2):
+	#Callback for sweep(); notes whether there's a real intersection-stopping collision, and the normal of a contact in it
+	g1_coll_props = getattr(geom1, "coll_props", None)
+	g2_coll_props = getattr(geom2, "coll_props", None)
+	if g1_coll_props != None and g2_coll_props != None and g1_coll_props.intersec_push and g2_coll_props.intersec_push:
+		contacts = ode.collide(geom1, geom2)
+		if len(contacts) > 0:
+			hit[0] = True
+			hit[1] = contacts[0].getContactGeomParams()[1]
+
+def _kinematic_obj(geom):
+	#Returns the GameObj that owns a geom if it's kinematic, or None
+	obj = getattr(geom, "gameobj", None)
+	if obj != None and obj.kinematic:
+		return obj
+	return None
+
+def _wake(geom):
+	#Wakes up the GameObj that owns a geom, if there is one
+	obj = getattr(geom, "gameobj", None)
+	if obj != None:
+		obj.wake()
+
+def _carry(contact, kobj):
+	#Sets up a contact against a kinematic object so that friction moves the other body along with its surface
+	#ODE drives the attached body's velocity along FDir1 towards Motion1, whichever side of the joint it's attached to,
+	#so this is the same for either geom order
+	(pos, normal) = contact.getContactGeomParams()[0:2]
+	rx, ry = pos[0]-kobj.pos[0], pos[1]-kobj.pos[1]
+	w = 2*math.pi*kobj.kin_ang_vel
+	vel = kobj.vel
+	sx, sy = vel[0] - w*ry, vel[1] + w*rx #Velocity of the kinematic object's surface at the contact point
+	tx, ty = -normal[1], normal[0] #Along the surface, in the plane
+	contact.setFDir1((tx, ty, 0))
+	contact.setMotion1(sx*tx + sy*ty)
+
+def geom_size(geom):
+	"""Returns the smaller of the width and height of a geom's axis-aligned bounding box."""
+	aabb = geom.getAABB()
+	return min(aabb[1]-aabb[0], aabb[3]-aabb[2])
+
+def find_fast(objs, dt):
+	"""Finds GameObjs that are moving fast enough to pass through something thin in one step.
+	
+	An object is fast if, at its current velocity, it would move more than half of its geom's size
+	in dt seconds. Returns a list of (GameObj, position before the step) tuples, suitable to be
+	passed to sweep() once the step has been taken."""
+	
+	ret = []
+	for o in objs:
+		if o.body == None or o.geom == None or o.asleep:
+			continue
+		vel = o.body.getLinearVel()
+		reach = geom_size(o.geom)/2
+		if (vel[0]*vel[0] + vel[1]*vel[1])*dt*dt > reach*reach:
+			ret.append((o, o.body.getPosition()))
+	return ret
+
+def sweep(fast, max_substeps):
+	"""Checks the paths of fast-moving objects for static geoms that they skipped over during the last step.
+	
+	The argument should be the list returned by find_fast() just before the step was taken. Each
+	object's path is split into pieces no longer than half the geom's size (but at most max_substeps
+	of them), and the geom is tested against app.static_space at each point along the way. If it
+	hits something, the body is put back at the last point before that, where it was still clear,
+	and the part of its velocity heading into what it hit is taken away. Only fast bodies pay for
+	this; everything else is stepped just once."""
+	
+	for (o, oldpos) in fast:
+		newpos = o.body.getPosition()
+		dist = math.sqrt((newpos[0]-oldpos[0])**2 + (newpos[1]-oldpos[1])**2)
+		reach = geom_size(o.geom)/2
+		if reach <= 0 or dist <= reach:
+			continue
+		
+		substeps = min(int(math.ceil(dist/reach)), max_substeps)
+		dx, dy = newpos[0]-oldpos[0], newpos[1]-oldpos[1]
+		hit = [False, None]
+		for i in range(1, substeps):
+			frac = i/substeps
+			o.geom.setPosition((oldpos[0] + dx*frac, oldpos[1] + dy*frac, newpos[2]))
+			ode.collide2(o.geom, app.static_space, hit, _hit_cb)
+			if hit[0]:
+				break
+		
+		if not hit[0]:
+			o.geom.setPosition(newpos)
+			continue
+		
+		#Back up to the last clear point
+		frac = (i-1)/substeps
+		o.geom.setPosition((oldpos[0] + dx*frac, oldpos[1] + dy*frac, newpos[2]))
+		
+		#Stop moving into the wall, whichever way the contact normal happens to point
+		nx, ny = hit[1][0], hit[1][1]
+		if nx*dx + ny*dy < 0:
+			nx, ny = -nx, -ny
+		vel = o.body.getLinearVel()
+		into = vel[0]*nx + vel[1]*ny
+		if into > 0:
+			o.body.setLinearVel((vel[0] - into*nx, vel[1] - into*ny, vel[2]))
+
 class Collision:
 	"""Describes a collision that took place between two ODE geoms.
 
@@ -47,10 +161,11 @@ class Props:
 	collide physically may require either a ContactJoint between them if they've
 	got equal collision priority, or may require a ContactJoint between the world
 	and the one with lesser priority. There's no reason I can think of now
-	to have any more than two layers of priority, but what the heck. The point
-	of this system is to allow things like moving platforms that have bodies
-	and geoms but cannot be pushed around by the player, although they can push
-	the player around.
+	to have any more than two layers of priority, but what the heck.
+	
+	Moving platforms, doors and the like should be kinematic GameObjs (see GameObj.kinematic)
+	rather than bodies with a higher priority. Contacts against a kinematic object always
+	push only the other object, and carry it along with the kinematic object's surface.
 
 	All collisions are logged to 
 	
@@ -79,6 +194,7 @@ class Props:
 		
 		# Add the collision to app.collisions
 		if len(contacts) > 0:
+			app.contact_count += len(contacts)
 			cpoints = []
 			for c in contacts:
 				cpoints.append(Point(c.getContactGeomParams()[0][0], c.getContactGeomParams()[0][1]))
@@ -89,14 +205,33 @@ class Props:
 				else:
 					app.collisions[a].append(Collision(b, cpoints))
 					
+		if geom1.getBody() == None and geom2.getBody() == None:
+			return #Nothing to push
+		
 		if self.intersec_push and geom2.coll_props.intersec_push:
+			kin1 = _kinematic_obj(geom1)
+			kin2 = _kinematic_obj(geom2)
 			for c in contacts:
-				c.setMode(ode.ContactApprox1 | ode.ContactBounce)
+				if kin1 != None or kin2 != None:
+					c.setMode(ode.ContactApprox1 | ode.ContactBounce | ode.ContactFDir1 | ode.ContactMotion1)
+				else:
+					c.setMode(ode.ContactApprox1 | ode.ContactBounce)
 				c.setBounce(0.5)
 				c.setMu(5000)
-				cjoint = ode.ContactJoint(app.odeworld, cjointgroup, c)
+				if kin2 != None:
+					#Push this object out of the kinematic one, and let the kinematic one carry it
+					#It's woken up, since a sleeping body would otherwise be passed through or left hanging
+					_wake(geom1)
+					_carry(c, kin2)
+					cjoint = ode.ContactJoint(app.odeworld, cjointgroup, c)
+					cjoint.attach(geom1.getBody(), None)
+				elif kin1 != None:
+					_wake(geom2)
+					_carry(c, kin1)
+					cjoint = ode.ContactJoint(app.odeworld, cjointgroup, c)
+					cjoint.attach(None, geom2.getBody())
 				#FIXME: Collision priority stuff doesn't work very well when higher priority object pushes
-				if self.intersec_pri == geom2.coll_props.intersec_pri:
+				elif self.intersec_pri == geom2.coll_props.intersec_pri:
 					#Push both objects away from each other
 					cjoint = ode.ContactJoint(app.odeworld, cjointgroup, c)
 					cjoint.attach(geom1.getBody(), geom2.getBody())
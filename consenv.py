@@ -11,19 +11,34 @@ from pygame.locals import *
 
 import app
 import background
+import bake
+import batchgeom
+import broadphase
 import camera
 import collision
 import colors
 import console
 import drive
+import forceacc
 import gameobj
 from geometry import *
 import geommold
 import image
+import leaks
+import level
+import lod
 import magnet
+import mover
+import nav
+import particles
+import prefab
+import query
 import resman
 import sprite
+import stepsched
+import streaming
 import text
+import tilemap
 from util import *
 
 def wset(num, expr):
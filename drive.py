@@ -1,7 +1,9 @@
 from __future__ import division
+import copy
 from OpenGL.GL import *
 
 import consenv, util, sre
+from geometry import *
 
 class Drive(object):
 	"""Base class for classes that control GameObj behavior/visuals.
@@ -14,41 +16,112 @@ class Drive(object):
 	rot_offset -- If not near-zero, then before a draw takes place, rotates this amount of revolutions.
 	drawing -- If false, then calls to draw() and predraw() do nothing.
 	stepping -- If false, then calls to step() do nothing.
+	sleep_stepping -- If true, then step() is still called while the GameObj's body is asleep.
+		Leave this false for drives that have nothing to do while their object is sitting still.
+	
+	The offset and rot_offset are turned into a geometry.Transform by local_transform(), which is
+	cached until either of them changes.
+	
+	GameObjs keep lists of just the drives that have something to do (see GameObj._dispatch_for()).
+	Setting drawing, stepping or sleep_stepping on a drive increments the gen of the util.DriveList
+	it's in, which tells just the GameObj that owns that list to rebuild them.
 	"""
-
-	def __init__(self, drawing = False, stepping = False, offset = None, rot_offset = 0):
-		self.drawing = drawing
-		self.stepping = stepping
+	
+	_drive_list = None #The util.DriveList this drive is in, if any; set by the DriveList
+	
+	def __init__(self, drawing = False, stepping = False, offset = None, rot_offset = 0, sleep_stepping = False):
+		#A new drive isn't in any GameObj's lists yet, so there's no DriveList to tell about the flags
+		self._drawing = drawing
+		self._stepping = stepping
+		self._sleep_stepping = sleep_stepping
 		self.offset = offset
 		self.rot_offset = rot_offset
+		self._local_xform = None #Cached ((offset x, offset y, rot_offset), Transform) for local_transform()
+	
+	def _flags_changed(self):
+		if self._drive_list != None:
+			self._drive_list.gen += 1
+	
+	def _get_drawing(self): return self._drawing
+	
+	def _set_drawing(self, drawing):
+		self._drawing = drawing
+		self._flags_changed()
+	
+	def _get_stepping(self): return self._stepping
+	
+	def _set_stepping(self, stepping):
+		self._stepping = stepping
+		self._flags_changed()
+	
+	def _get_sleep_stepping(self): return self._sleep_stepping
+	
+	def _set_sleep_stepping(self, sleep_stepping):
+		self._sleep_stepping = sleep_stepping
+		self._flags_changed()
 	
 	def __str__(self):
 		return sre.match(r"<class '.+\.(.+)'>", str(type(self))).group(1)[1:] #Extract simple type name, remove first "D"
 		
+	def clone(self):
+		"""Returns a copy of this drive, ready to be used by another GameObj.
+		
+		This is a shallow copy, so things like textures and sprite libraries are shared
+		between the drive and its clone. Drives that own something that can't be shared,
+		such as a geom of their own, should override this."""
+		ret = copy.copy(self)
+		ret._drive_list = None
+		return ret
+	
+	def destroy(self, obj):
+		"""Called when the GameObj that this drive belongs to is destroyed (see GameObj.destroy()).
+		
+		Drives that hold on to ODE objects or other resources of their own should let go of them here."""
+		pass
+	
 	def draw(self, obj):
 		"""Puts the object on-screen somehow.
 		
 		This will be called by app in a state where GL is ready and
 		GL units are meters."""
 		if self.drawing:
-			need_pop = False
-			
-			if abs(self.rot_offset) > 0.00001:
+			xform = self.local_transform()
+			if xform is IDENTITY:
+				self._draw(obj)
+			else:
 				glPushMatrix()
-				glRotate(util.rev2deg(self.rot_offset), 0, 0, 1)
-				need_pop = True
-			
-			if self.offset != None:
-				if not need_pop:
-					glPushMatrix()
-					need_pop = True
-				glTranslatef(self.offset[0], self.offset[1], 0)
-			
-			self._draw(obj)
-		
-			if need_pop:
+				glMultMatrixf(xform.gl_matrix())
+				self._draw(obj)
 				glPopMatrix()
 	
+	def local_transform(self):
+		"""Returns a geometry.Transform from the drive's frame of reference to its object's.
+		
+		This is a rotation by rot_offset, followed by a translation by offset within the rotated frame.
+		If there's no offset and no rot_offset, geometry.IDENTITY itself is returned."""
+		if self.offset == None:
+			if abs(self.rot_offset) <= 0.00001:
+				return IDENTITY
+			key = (None, None, self.rot_offset)
+		else:
+			key = (self.offset[0], self.offset[1], self.rot_offset)
+		if self._local_xform == None or self._local_xform[0] != key:
+			if abs(self.rot_offset) > 0.00001:
+				xform = Transform(ang = self.rot_offset)
+			else:
+				xform = IDENTITY
+			if self.offset != None:
+				xform = xform * Transform(self.offset)
+			self._local_xform = (key, xform)
+		return self._local_xform[1]
+	
+	def world_transform(self, obj):
+		"""Returns a geometry.Transform from the drive's frame of reference to the world, as drawn for the given object."""
+		xform = self.local_transform()
+		if xform is IDENTITY:
+			return obj.draw_transform()
+		return obj.draw_transform() * xform
+	
 	def _draw(self, obj):
 		pass
 	
@@ -70,6 +143,10 @@ class Drive(object):
 	
 	def _step(self, obj):
 		pass
+	
+	drawing = property(_get_drawing, _set_drawing)
+	stepping = property(_get_stepping, _set_stepping)
+	sleep_stepping = property(_get_sleep_stepping, _set_sleep_stepping)
 
 
 class DDebug(Drive):
@@ -88,7 +165,7 @@ class DDebug(Drive):
 		Since compile() is used, you can pass statements as well as expressions
 		in the arguments to __init__."""
 		
-		super(DDebug, self).__init__(True, True)
+		super(DDebug, self).__init__(True, True, sleep_stepping = True)
 		
 		self.draw_expr = None
 		self.predraw_expr = None
@@ -0,0 +1,105 @@
+"""Collecting up the forces that drives push bodies around with, to hand them to ODE all at once."""
+
+from __future__ import division
+
+import app
+
+class ForceAccumulator(object):
+	"""Adds up the forces and torques applied to each body during a step.
+
+	Drives call add_force(), add_force_at() and add_torque() instead of calling addForce(),
+	addForceAtPos() and addTorque() on bodies themselves. Each body's totals are handed to ODE
+	in one go by flush(), which app calls just before ODE runs each step. Since ODE just adds
+	up forces until it steps anyway, the result is the same, but each body crosses into ODE at
+	most twice per step, no matter how many drives are pushing on it.
+
+	Every force is given a source tag, usually a short string naming what it's for.
+	The totals for each source over the last flushed step are kept, for tuning things
+	like magnets and the player's movement; see totals and report().
+
+	app.sim_init() makes one of these as app.forces.
+
+	Data attributes:
+	totals -- Dictionary from source tag to the (x force, y force, torque) applied by that source
+		during the last flushed step, added up over all bodies.
+	"""
+
+	def __init__(self):
+		self._bodies = {} #Key is id(body), value is [body, x force, y force, torque]
+		self._totals = {} #Like totals, but for the step in progress
+		self.totals = {}
+
+	def _entry(self, obj):
+		body = obj.body
+		entry = self._bodies.get(id(body))
+		if entry == None:
+			entry = self._bodies[id(body)] = [body, 0.0, 0.0, 0.0]
+		return entry
+
+	def _tally(self, source, fx, fy, torque):
+		total = self._totals.get(source)
+		if total == None:
+			self._totals[source] = [fx, fy, torque]
+		else:
+			total[0] += fx
+			total[1] += fy
+			total[2] += torque
+
+	def add_force(self, obj, force, source = None):
+		"""Pushes on a GameObj's body at its center with the given force, a 2-tuple."""
+		entry = self._entry(obj)
+		entry[1] += force[0]
+		entry[2] += force[1]
+		self._tally(source, force[0], force[1], 0.0)
+
+	def add_force_at(self, obj, force, pos, source = None):
+		"""Pushes on a GameObj's body with the given force at pos, in world coordinates.
+
+		Like ODE's addForceAtPos(), this is the same as pushing at the center, plus the torque that
+		comes from pushing off-center. The object's pos is used as the center, which is where
+		its body is, as of the last sync."""
+		torque = (pos[0]-obj.pos[0])*force[1] - (pos[1]-obj.pos[1])*force[0]
+		entry = self._entry(obj)
+		entry[1] += force[0]
+		entry[2] += force[1]
+		entry[3] += torque
+		self._tally(source, force[0], force[1], torque)
+
+	def add_torque(self, obj, torque, source = None):
+		"""Twists a GameObj's body with the given torque about the z-axis."""
+		entry = self._entry(obj)
+		entry[3] += torque
+		self._tally(source, 0.0, 0.0, torque)
+
+	def pending(self, obj):
+		"""Returns the (x force, y force, torque) that will be applied to a GameObj's body at the next flush()."""
+		entry = self._bodies.get(id(obj.body))
+		if entry == None:
+			return (0.0, 0.0, 0.0)
+		return (entry[1], entry[2], entry[3])
+
+	def flush(self):
+		"""Applies all the forces added since the last flush() to their bodies.
+
+		Sleeping bodies are woken up if they're pushed at all, since ODE ignores forces on disabled bodies.
+		Bodies that have since been taken away from their GameObjs are skipped."""
+		for (body, fx, fy, torque) in self._bodies.itervalues():
+			obj = getattr(body, "gameobj", None)
+			if obj == None:
+				continue
+			if fx != 0 or fy != 0 or torque != 0:
+				obj.wake()
+			if fx != 0 or fy != 0:
+				body.addForce((fx, fy, 0))
+			if torque != 0:
+				body.addTorque((0, 0, torque))
+		self._bodies = {}
+		self.totals = dict([(k, tuple(v)) for (k, v) in self._totals.iteritems()])
+		self._totals = {}
+
+	def report(self):
+		"""Prints the totals for each source over the last flushed step."""
+		keys = self.totals.keys()
+		keys.sort()
+		for k in keys:
+			print "%-16s (%8.3f, %8.3f) %8.3f" % ((str(k),) + self.totals[k])
@@ -1,9 +1,33 @@
 import math, ode, sre
 from OpenGL.GL import *
 
-import app, util
+import app, util, lod, drive
 from geometry import *
 
+def _overrides(d, name):
+	#Whether the drive's class has its own version of the given method, rather than Drive's do-nothing one
+	return getattr(type(d), name).im_func is not getattr(drive.Drive, name).im_func
+
+def _make_dispatch(drives):
+	#Returns tuples of the bound methods to call for the drives that actually do something:
+	#(steps while awake, steps while asleep, predraws, draws)
+	step_all, step_sleep, predraws, draws = [], [], [], []
+	for d in drives:
+		if d.stepping and _overrides(d, "_step"):
+			step_all.append(d._step)
+			if d.sleep_stepping:
+				step_sleep.append(d._step)
+		if d.drawing:
+			if _overrides(d, "_predraw"):
+				predraws.append(d._predraw)
+			if _overrides(d, "_draw"):
+				draws.append(d.draw) #Not _draw, since draw() handles offset and rot_offset
+	return (tuple(step_all), tuple(step_sleep), tuple(predraws), tuple(draws))
+
+def _rot_to_ang(rot):
+	#Converts the first row of an ODE rotation matrix (ccw radians) to an angle in cw revolutions
+	return (math.atan2(-rot[1], rot[0])/(2.0 * math.pi)) % 1
+
 class GameObj(object):
 	"""The base class for in-game objects of all kinds.
 
@@ -13,7 +37,7 @@ class GameObj(object):
 	
 	Data attributes:
 	pos -- 2-tuple of the absolute location of the center of the object, in meters.
-	vel -- The linear velocity of the object.
+	vel -- The linear velocity of the object. For kinematic objects, this is the scripted velocity.
 	ang -- The angle of the object, in clockwise revolutions.
 		Set these instead of calling methods on body or geom: ODE
 		will automatically be updated when these are set, and
@@ -28,7 +52,9 @@ class GameObj(object):
 		Additionally, pos and ang are automatically loaded from body
 		after it is set, and geom's ang and pos are overwritten.
 		Also, the body will be given a "gameobj" attribute so you can
-		get back to a GameObj from its body.
+		get back to a GameObj from its body. The body is held in the
+		x/y plane by an ODE Plane2DJoint, so it never picks up z-axis
+		motion or rotation about anything but the z-axis.
 	geom -- The ODE geometry used for collision detection.
 		This can be None if you don't want an object to ever collide.
 		Setting geom will cause it to be ssociated with
@@ -38,25 +64,61 @@ class GameObj(object):
 		ang and pos are overwritten. Also, the geom will be given
 		a "gameobj" attribute so you can get back to a GameObj from
 		its geom.
-	drives -- A util.TrackerList of drives. Each simstep, each drive's step method
+	drives -- A util.DriveList of drives; anything else it's set to is converted to one. Each simstep, each drive's step method
 		is called in order. Each frame, every object's predraw method
 		is called, then after that's done, every object's draw method
 		is called.
 	props -- A set of lowercase strings describing various properties of the GameObj.
 		The meaning of particular strings depends upon drives; for example,
 		a GameObj might have a "smelly" property if it can be detected by
-		creatures with big noses.
-	
+		creatures with big noses. This is a util.PropSet, which is a set that keeps
+		app.objects.with_prop() up to date; anything else it's set to is converted to one.
+	asleep -- True if ODE has disabled the body because it stopped moving (see app.autodisable).
+		Sleeping objects skip sync_ode(), and only step drives that have sleep_stepping set.
+		ODE wakes bodies up when something enabled touches them; call wake() to do it yourself,
+		for example before applying a force.
+	lod_tier -- How much simulation effort the object gets; one of the tiers in lod.py.
+		This is normally set by lod.update() based on distance from the camera.
+		Objects in the FROZEN tier have their bodies disabled, and are woken back up when promoted.
+	destroyed -- True once destroy() has been called. The object is gone from the game by the end of that step.
+	kinematic -- If True, the object is moved by script rather than by ODE, like a moving platform or a door.
+		Kinematic objects can't have a body. Instead, each step sync_ode() moves them by vel and kin_ang_vel,
+		which drives (such as mover.DMover) set. Bodies that touch a kinematic object are pushed out of it
+		and carried along by friction, but the object itself never goes through ODE's solver.
+		Its geom should be in app.dyn_space; it doesn't collide with static_space.
+	kin_ang_vel -- For kinematic objects, the scripted angular velocity in clockwise revolutions per second.
+	owns_geoms -- True for kinds of objects that collide through geoms of their own other than geom,
+		such as tilemap.TileMap. They aren't counted as geomless by app.objects.without_geom(),
+		even if geom is None, and they list those geoms in owned_geoms(). This is a class attribute.
+	
+	The object's frame of reference is available as a geometry.Transform from transform() (at its
+	simulated pos and ang) and draw_transform() (where it's drawn). Both are cached until the object moves,
+	so drives, magnets and queries can share them instead of rotating points around themselves.
 	"""
 	
+	owns_geoms = False
+	
 	def __init__(self, pos = None, ang = 0, body = None, geom = None, drives = None):
 		"""Creates a GameObj. Pos and ang given override the position of body and/or geom.
 		
-		If the drives argument passed in is not a TrackerList, then it is converted to
+		If the drives argument passed in is not a util.DriveList, then it is converted to
 		one for you.
 		"""
+		self._drives = None
+		self._props = None
+		self._dispatches = {} #Key is id() of a DriveList, value is (DriveList.gen, dispatch tuples); see _dispatch_for()
 		self._body = None
 		self._geom = None
+		self._asleep = False
+		self._plane_joint = None
+		self._kinematic = False
+		self._kin_vel = Point(0.0, 0.0)
+		self.kin_ang_vel = 0.0
+		self._ang = 0.0
+		self._rot = (1.0, 0.0)
+		self._xform = None #Cached transform(); None when pos or ang have changed since it was made
+		self._draw_xform = None #Cached ((x, y, ang), Transform) for draw_transform()
+		self._drawn_xform = None #The Transform that the GL matrix was set to for the draw in progress; see drawn_transform()
 		self.body = body #This calls the smart setter,
 		self.geom = geom #This also calls smart setter, which associates if possible
 		
@@ -64,11 +126,18 @@ class GameObj(object):
 		else: self.pos = pos #Overwrite ODE position with the passed-in position
 		self.ang = ang #Overwrite ODE angle too
 		
-		if drives == None: self.drives = util.TrackerList()
-		elif isinstance(drives, util.TrackerList): self.drives = drives
-		else: self.drives = util.TrackerList(drives)
-
-		self.props = set()
+		self.drives = drives #Smart setter; makes it a util.DriveList
+		self.props = set() #Also a smart setter; makes it a util.PropSet
+		
+		self._prev_pos = self._pos
+		self._prev_ang = self._ang
+		self._prev_rot = self._rot
+		self._shown = None #(pos, ang) to draw at, when drawing from a simthread.Snapshot
+		
+		self._lod_tier = lod.FULL
+		self._lod_phase = id(self) % 9973 #Spreads out the steps at which REDUCED tier objects run their drives
+		self._lod_region = None
+		self._destroyed = False
 
 	def __str__(self):
 		return " GO: (%7.3f, %7.3f) %s [%s]" % (
@@ -84,7 +153,9 @@ class GameObj(object):
 		#Remove and disassociate existing geom if any
 		if self._geom != None:
 			self._geom.setBody(None)
-			app.odeworld.remove(self._geom)
+			util.remove_geom(self._geom)
+			self._geom.gameobj = None
+			self._geom.coll_group = None
 		
 		#Set the new geom, load its ang and pos, and associate it if possible
 		self._geom = geom
@@ -95,56 +166,183 @@ class GameObj(object):
 				self._set_ode_pos(self._body)
 				self._set_ode_ang(self._body)
 				self._geom.setBody(self._body)
+		self._reindex()
+	
+	def _get_drives(self): return self._drives
+	
+	def _set_drives(self, drives):
+		if self._drives != None:
+			self._drives.owner = None
+		if drives == None: self._drives = util.DriveList(owner = self)
+		elif isinstance(drives, util.DriveList) and drives.owner == None:
+			self._drives = drives
+			drives.owner = self
+		else: self._drives = util.DriveList(drives, owner = self)
+		self._drives_changed()
+	
+	def _drives_changed(self):
+		#Called by the DriveList whenever drives are added or removed
+		self._dispatches = {}
+		self._reindex()
+	
+	def _dispatch_for(self, drives):
+		#Returns the dispatch tuples (see _make_dispatch()) for one of this object's DriveLists, building them if needed
+		entry = self._dispatches.get(id(drives))
+		if entry == None or entry[0] != drives.gen:
+			entry = (drives.gen, _make_dispatch(drives))
+			self._dispatches[id(drives)] = entry
+		return entry[1]
+	
+	def _get_props(self): return self._props
+	
+	def _set_props(self, props):
+		if self._props != None:
+			self._props.owner = None
+		self._props = util.PropSet(props, owner = self)
+		self._props_changed()
+	
+	def _props_changed(self):
+		#Called by the PropSet whenever it changes
+		self._reindex()
+	
+	def _reindex(self):
+		#Keeps app.objects' indexes (see util.ObjectRegistry) up to date
+		if app.objects != None:
+			app.objects.reindex(self)
 	
 	def _get_body(self): return self._body
 	
 	def _set_body(self, body):
+		if body != None and self._kinematic:
+			raise ValueError("Kinematic GameObjs can't have bodies")
+		
 		#Remove and disassociate existing body if any
 		if self._geom != None:
 			self._geom.setBody(None)
 		
-		#FIXME: Figure out a way to actually delete bodies from the world
+		#Once nothing refers to the old body any more, PyODE destroys it
+		if self._body != None:
+			self._plane_joint.attach(None, None)
+			self._body.gameobj = None
+			self._body.disable()
 		
 		#Set the new body, load its ang and pos, and associate it if possible
 		self._body = body
+		self._asleep = False
+		self._plane_joint = None
 		if self._body != None:
-			self._body.gameobl = self
+			self._body.gameobj = self
+			self._plane_joint = ode.Plane2DJoint(app.odeworld)
+			self._plane_joint.attach(self._body, ode.environment)
 			self._fetch_ode_from(self._body)
 			if self._geom != None:
 				self._set_ode_pos(self._geom)
 				self._set_ode_ang(self._geom)
 		if self._geom != None:
 			self._geom.setBody(self._body)
+		self._reindex()
 	
 	def _get_pos(self): return self._pos
 	
 	def _set_pos(self, pos):	
 		self._pos = pos
+		self._xform = None
 		
 		#If body and geom are connected, setting pos or ang in one sets it in both
-		if self._body != None: self._set_ode_pos(self._body)
+		if self._body != None:
+			self._set_ode_pos(self._body)
+			self.wake()
 		elif self._geom != None: self._set_ode_pos(self._geom)
 	
 	def _get_vel(self):
 		if self._body != None:
 			return Point(*self.body.getLinearVel()[0:2])
+		elif self._kinematic:
+			return Point(self._kin_vel[0], self._kin_vel[1])
 		else:
 			return Point(0,0)
 
 	def _set_vel(self, vel):
 		if self._body != None:
 			self.body.setLinearVel(vel.fake_3d_tuple())
-	
-	def _get_ang(self): return self._ang
+			self.wake()
+		elif self._kinematic:
+			self._kin_vel = Point(vel[0], vel[1])
+	
+	def _get_kinematic(self): return self._kinematic
+	
+	def _set_kinematic(self, kinematic):
+		if kinematic and self._body != None:
+			raise ValueError("Kinematic GameObjs can't have bodies")
+		self._kinematic = kinematic
+		if not kinematic:
+			self._kin_vel = Point(0.0, 0.0)
+			self.kin_ang_vel = 0.0
+	
+	def _get_ang(self):
+		#Converting the rotation to an angle is put off until somebody actually wants it
+		if self._ang == None:
+			self._ang = _rot_to_ang(self._rot)
+		return self._ang
 	
 	def _set_ang(self, ang):
 		#Wrap to [0-1) revolutions
 		self._ang = ang % 1
+		self._xform = None
 		
 		#If body and geom are connected, setting pos or ang in one sets it in both
-		if self._body != None: self._set_ode_ang(self._body)
+		if self._body != None:
+			self._set_ode_ang(self._body)
+			self.wake()
 		elif self._geom != None: self._set_ode_ang(self._geom)
 	
+	def _get_asleep(self): return self._asleep
+	
+	def _get_destroyed(self): return self._destroyed
+	
+	def destroy(self):
+		"""Removes the object from the game for good, freeing its body, its geom, and anything its drives hold.
+		
+		This is safe to call in the middle of a step. The object is only queued up, and is actually
+		torn down at the end of the step, by app.flush_destroyed(). Calling this again does nothing."""
+		if not self._destroyed:
+			self._destroyed = True
+			app.destroy_queue.append(self)
+	
+	def _teardown(self):
+		#Called by app.flush_destroyed() once it's safe to free everything
+		try:
+			app.objects.remove(self)
+		except ValueError:
+			pass #Not in app.objects; for example, sitting in a prefab.Prefab's free list
+		for d in self.drives:
+			d.destroy(self)
+		self.drives = None
+		self.geom = None
+		self.body = None
+	
+	def owned_geoms(self):
+		"""Returns a list of every geom that collides on the object's behalf: just geom, if there is one.
+		
+		Kinds of objects with owns_geoms set override this to include their other geoms."""
+		if self._geom != None:
+			return [self._geom]
+		return []
+	
+	def wake(self):
+		"""Re-enables the body if ODE has put it to sleep. Does nothing if it's awake or there is no body.
+		
+		Also does nothing while the object is in the FROZEN level of detail tier; it's woken when it leaves that tier."""
+		if self._body != None and self._asleep and self._lod_tier != lod.FROZEN:
+			self._body.enable()
+			self._asleep = False
+	
+	def sleep(self):
+		"""Disables the body until wake() is called, or something enabled touches it. Does nothing if there is no body."""
+		if self._body != None and not self._asleep:
+			self._body.disable()
+			self._asleep = True
+	
 	
 	def _fetch_ode_from(self, odething):
 		"""Sets position and rotation from the given ODE object (either a body or a geom)."""
@@ -153,23 +351,18 @@ class GameObj(object):
 		odepos = odething.getPosition()
 		self._pos = Point(odepos[0], odepos[1])
 		
-		#Convert ccw radians to cw revolutions
+		#Just keep the first row of the rotation matrix; _get_ang() turns it into cw revolutions when needed
 		rot = odething.getRotation()
-		uncos = math.acos(rot[0])
-		unsin = math.asin(rot[1])
-		self._ang = uncos/(-2.0 * math.pi)
-		if unsin < 0:
-			self._ang = -self._ang
-
-		#Wrap to [0-1) revolutions
-		self._ang = self.ang % 1
+		self._rot = (rot[0], rot[1])
+		self._ang = None
+		self._xform = None
 	
 	def _set_ode_ang(self, odething):
 		"""Sets the angle in an ODE object (body or geom) from the GameObj's angle.
 		
 		Converts from GameObj angles (cw revolutions) to ODE angles (ccw radians).
 		"""
-		a = util.rev2rad(self._ang)
+		a = util.rev2rad(self.ang)
 		s = math.sin(a)
 		c = math.cos(a)
 		rotmatr = (c, s, 0.0, -s, c, 0.0, 0.0, 0.0, 1.0)
@@ -180,55 +373,176 @@ class GameObj(object):
 		odething.setPosition(self._pos.fake_3d_tuple())
 	
 	def sync_ode(self):
-		"""Sets position and rotation based on the ODE state, cancels non-two-dimensional motion.
+		"""Sets position and rotation based on the ODE state.
 		
 		This is called automatically by the main loop after the simstep is ran, so it isn't
 		neccessary for drives or game objects to call it themselves.
 
-		After it's done syncing itself, it calls sync_ode on all the drives.
+		The body's Plane2DJoint keeps it two-dimensional, so this only reads state from ODE;
+		nothing is written back. Objects without a body only move when pos or ang are set,
+		so there's nothing to do for them, except for kinematic objects: those are moved one step's
+		worth by their vel and kin_ang_vel (unless they're in the FROZEN level of detail tier).
+		If the body is asleep, then nothing is done either; it hasn't moved since the last time it was synced.
+		
+		Either way, the state from before the sync is kept around for draw_pos() and draw_ang().
 		"""
 		
+		self._prev_pos = self._pos
+		self._prev_ang = self._ang
+		self._prev_rot = self._rot
+		
 		if self._body != None:
-			#Kill z-axis motion
-			vel = self._body.getLinearVel()
-			self._body.setLinearVel((vel[0], vel[1], 0.0))
-			self._body.setAngularVel((0.0, 0.0, self._body.getAngularVel()[2]))
-
-			#Load pos and ang, then set them both back into ODE, sans 3rd dimension
+			#Bodies that ODE disabled get one last sync, then are left alone until woken
+			if not self._body.isEnabled():
+				if self._asleep:
+					return
+				self._asleep = True
+			else:
+				self._asleep = False
+			
 			self._fetch_ode_from(self._body)
-			self._set_ode_pos(self._body)
-			self._set_ode_ang(self._body)
-		elif self._geom != None:
-			self._fetch_ode_from(self._geom)
+		elif self._kinematic and self._lod_tier != lod.FROZEN:
+			dt = 1.0/app.simfps
+			if self._kin_vel[0] != 0 or self._kin_vel[1] != 0:
+				self.pos = Point(self._pos[0] + self._kin_vel[0]*dt, self._pos[1] + self._kin_vel[1]*dt)
+			if self.kin_ang_vel != 0:
+				self.ang = self.ang + self.kin_ang_vel*dt
+	
+	def _get_lod_tier(self): return self._lod_tier
+	
+	def _set_lod_tier(self, tier):
+		if tier == self._lod_tier:
+			return
+		old = self._lod_tier
+		self._lod_tier = tier
+		if tier == lod.FROZEN:
+			self.sleep()
+		elif old == lod.FROZEN:
+			self.wake()
+	
+	def _stepping_all(self):
+		#Whether this step should run every drive, or only the ones with sleep_stepping set
+		if self._asleep:
+			return False
+		if self._lod_tier == lod.REDUCED:
+			return (app.totalsteps + self._lod_phase) % app.lod_step_interval == 0
+		return True
 	
 	def step(self):
-		"""Does a simulation step for the object; calls do() on every drive."""
-		for d in self.drives:
-			d.step(self)
+		"""Does a simulation step for the object; calls step() on every drive.
+		
+		While the object is asleep, only drives with sleep_stepping set are stepped. That's also
+		true for objects in the REDUCED level of detail tier, except that every app.lod_step_interval
+		steps all their drives get stepped. Objects in the FROZEN tier aren't stepped at all."""
+		self._step_with(self._dispatch_for(self._drives))
+	
+	def _step_with(self, dispatch):
+		if self._lod_tier == lod.FROZEN:
+			return
+		if self._stepping_all():
+			for f in dispatch[0]:
+				f(self)
+		else:
+			for f in dispatch[1]:
+				f(self)
+	
+	def draw_pos(self):
+		"""Returns where to draw the object: between its previous and current pos, according to app.interp.
+		
+		When the sim is running in its own thread, this is instead where the latest snapshot says to draw it."""
+		if self._shown != None:
+			return self._shown[0]
+		prev = self._prev_pos
+		a = app.interp
+		if a >= 1.0 or prev is self._pos:
+			return self._pos
+		return Point(prev[0] + (self._pos[0]-prev[0])*a, prev[1] + (self._pos[1]-prev[1])*a)
+	
+	def draw_ang(self):
+		"""Returns the angle to draw the object at: between its previous and current ang, according to app.interp.
+		
+		When the sim is running in its own thread, this is instead the angle the latest snapshot says to draw it at."""
+		if self._shown != None:
+			return self._shown[1]
+		cur = self.ang
+		a = app.interp
+		if a >= 1.0:
+			return cur
+		prev = self._prev_ang
+		if prev == None:
+			prev = _rot_to_ang(self._prev_rot)
+		return (prev + util.min_ang_diff(prev, cur)*a) % 1
+	
+	def transform(self):
+		"""Returns a geometry.Transform from the object's frame of reference to the world, at its current pos and ang."""
+		if self._xform == None:
+			self._xform = Transform(self._pos, self.ang)
+		return self._xform
+	
+	def draw_transform(self):
+		"""Like transform(), but at draw_pos() and draw_ang() rather than pos and ang."""
+		pos = self.draw_pos()
+		ang = self.draw_ang()
+		if pos is self._pos and ang == self.ang:
+			return self.transform()
+		key = (pos[0], pos[1], ang)
+		if self._draw_xform == None or self._draw_xform[0] != key:
+			self._draw_xform = (key, Transform(pos, ang))
+		return self._draw_xform[1]
+	
+	def drawn_transform(self):
+		"""Returns the Transform that the GL matrix was set up with for drawing the object's drives.
+		
+		This is what draw_transform() returned when drawing started, which drives can use to get
+		back to world coordinates. Calling draw_transform() again instead could give a different answer
+		while the sim thread is running (see app.threaded_sim)."""
+		return self._drawn_xform
+	
+	def skip_interp(self):
+		"""Makes draw_pos() and draw_ang() jump straight to the current pos and ang.
+		
+		Call this after teleporting an object, so that it isn't drawn sliding over from where it was."""
+		self._prev_pos = self._pos
+		self._prev_ang = self._ang
+		self._prev_rot = self._rot
 	
 	def predraw(self):
 		"""Calls predraw() on every drive."""
-		for d in self.drives:
-			d.predraw(self)
+		self._predraw_with(self._dispatch_for(self._drives))
+	
+	def _predraw_with(self, dispatch):
+		for f in dispatch[2]:
+			f(self)
 	
 	def draw(self, draw_geoms = None):
 		"""Draws the object; pushes correct GL matrix, calls draw() on every drive, restores GL.
 		
 		Optionally, specify the draw_geoms argument. Set it to False to not draw a hall, True to draw it,
 		or None (that is, just leave it unset) to use the value from app.draw_geoms."""
+		self._draw_with(self._dispatch_for(self._drives), draw_geoms)
+	
+	def _draw_with(self, dispatch, draw_geoms = None):
+		#Draws the drives in the given dispatch tuples (see _make_dispatch()) in this object's frame of reference
 		if draw_geoms == None:
 			draw_geoms = app.draw_geoms
 		glPushMatrix()
-		glTranslatef(self.pos[0], self.pos[1], 0)
-		if self.ang > 0.00001:
-			glRotatef(util.rev2deg(self.ang), 0, 0, 1)
-		for d in self.drives:
-			d.draw(self)
+		self._drawn_xform = self.draw_transform()
+		glMultMatrixf(self._drawn_xform.gl_matrix())
+		for f in dispatch[3]:
+			f(self)
 		if self.geom != None and draw_geoms:
 			for x in self.geom.draw_drives:
 				x.draw(self)
 		glPopMatrix()
 	
+	def snap(self, entries):
+		"""Appends entries describing how to draw this object to a simthread.Snapshot's entry list.
+		
+		Each entry is a tuple of (GameObj, pos, ang, dispatch, draw_geoms), where pos is a 2-tuple
+		and dispatch is the tuples of methods to call to draw (see _make_dispatch()).
+		Subclasses that draw in several parts append several entries."""
+		entries.append((self, (self._pos[0], self._pos[1]), self.ang, self._dispatch_for(self._drives), None))
+	
 	def freeze(self):
 		"""Kills the object's linear and angular velocity."""
 		if self._body == None:
@@ -246,21 +560,29 @@ class GameObj(object):
 	ang = property(_get_ang, _set_ang)
 	body = property(_get_body, _set_body)
 	geom = property(_get_geom, _set_geom)
+	drives = property(_get_drives, _set_drives)
+	props = property(_get_props, _set_props)
+	asleep = property(_get_asleep)
+	lod_tier = property(_get_lod_tier, _set_lod_tier)
+	destroyed = property(_get_destroyed)
+	kinematic = property(_get_kinematic, _set_kinematic)
 
 class LimbedGameObj(GameObj):
 	"""A GameObj that has some limbs attached.
 	
-	The limbs are just other GameObjs. This GameObj's regular geom is kept in a space, the geom_space data
-	attribute, which also contains the geoms of all the sub-objects.
+	The limbs are just other GameObjs. This GameObj's regular geom is kept in a space, the space data
+	attribute, which also contains the geoms of all the sub-objects. By default that's just app.dyn_space;
+	the main geom and limb geoms are given this object as their coll_group, so they don't collide
+	with each other, but a LimbedGameObj costs no more to collide than the same number of plain GameObjs.
 
 	During the process of running step(), draw(), etc., the following steps are made:
 	- The regular drives for the object are ran
 	- The drives for each limb are ran
-	- The 'drives' attribute is temporarily set to the postdrives, those drives are ran, then the attribute is restored
+	- The postdrives are ran
 	
 	Data attributes (other than ones in GameObj that are still here):
-	postdrives -- A TrackerList of drives which are ran _after_ the limb drives are ran.
-	space -- An ODE space which contains this object's geom and the geoms of all limbs.
+	postdrives -- A util.DriveList of drives which are ran _after_ the limb drives are ran.
+	space -- The ODE space which contains this object's geom and the geoms of all limbs.
 	limbs -- A TrackerList of other GameObjs that are attached to the main one.
 	joints -- A TrackerList of HingeJoints connecting the limbs to the main geom. Add to this with the add_limb method.
 	"""
@@ -271,10 +593,13 @@ class LimbedGameObj(GameObj):
 		"""Creates a LimbedGameObj. Pos and ang given override the position of body.
 
 		Note that you cannot pass a geom into the constructor. That's because when an ODE geom is created, you have to give it
-		a parent at that time, and it's stuck with that parent forever. This means that you have to first create the LimbedGameObj
-		with a geom_space, and then assign a geom afterwords with that geom_space as the parent.
+		a parent at that time, and it's stuck with that parent forever. This means that you have to first create the LimbedGameObj,
+		and then assign a geom afterwords with its space as the parent.
 		
-		If the drives argument passed in is not a TrackerList, then it is converted to
+		If no space is given, app.dyn_space is used. Passing in a space of your own (nested within app.dyn_space)
+		still works, but collisions against a nested space go through an extra layer of Python callbacks.
+		
+		If the drives argument passed in is not a util.DriveList, then it is converted to
 		one for you.
 
 		For draw(), step(), predraw(), and sync_ode(), after the main object is done, the call is propogated on to the limbs.
@@ -284,12 +609,10 @@ class LimbedGameObj(GameObj):
 		self.limbs = util.TrackerList()
 		self.joints = util.TrackerList()
 
-		if space == None: self.space = ode.SimpleSpace(app.dyn_space)
-		else: self.space = space
+		self._space = space
 		
-		if postdrives == None: self.postdrives = util.TrackerList()
-		elif isinstance(postdrives, util.TrackerList): self.postdrives = postdrives
-		else: self.postdrives = util.TrackerList(postdrives)
+		self._postdrives = None
+		self.postdrives = postdrives #Smart setter, like drives
 	
 	def __str__(self):
 		ret = super(LimbedGameObj, self).__str__().replace(" ", "L", 1) #To make it line up with " GO" lines
@@ -303,6 +626,8 @@ class LimbedGameObj(GameObj):
 		a geom that is a child of the LimbedGameObj's space. The anchor
 		argument should be an offset relative to the object's center where the joint should be attached.
 		"""	
+		if limb.geom != None:
+			limb.geom.coll_group = self
 		self.limbs.append(limb)
 		joint = ode.HingeJoint(app.odeworld)
 		joint.attach(limb.body, self.body)
@@ -310,34 +635,84 @@ class LimbedGameObj(GameObj):
 		joint.setAxis((0, 0, 1))
 		self.joints.append(joint)
 	
+	def limb_transform(self, limb):
+		"""Returns a geometry.Transform from a limb's frame of reference to this object's.
+		
+		Limbs are simulated bodies of their own, so this is worked out from the two objects' transform()s."""
+		return self.transform().inverse() * limb.transform()
+	
+	def _teardown(self):
+		for joint in self.joints:
+			joint.attach(None, None)
+		self.joints = util.TrackerList()
+		for limb in self.limbs:
+			limb._destroyed = True
+			limb._teardown()
+		self.limbs = util.TrackerList()
+		for d in self.postdrives:
+			d.destroy(self)
+		self.postdrives = None
+		super(LimbedGameObj, self)._teardown()
+	
+	def _get_postdrives(self): return self._postdrives
+	
+	def _set_postdrives(self, postdrives):
+		if self._postdrives != None:
+			self._postdrives.owner = None
+		if postdrives == None: self._postdrives = util.DriveList(owner = self)
+		elif isinstance(postdrives, util.DriveList) and postdrives.owner == None:
+			self._postdrives = postdrives
+			postdrives.owner = self
+		else: self._postdrives = util.DriveList(postdrives, owner = self)
+		self._drives_changed()
+	
+	def _get_space(self):
+		#Follow app.dyn_space around, since app.optimize_spaces() can replace it
+		if self._space == None: return app.dyn_space
+		else: return self._space
+	
+	def _set_space(self, space): self._space = space
+	
+	def _set_geom(self, geom):
+		super(LimbedGameObj, self)._set_geom(geom)
+		if geom != None:
+			geom.coll_group = self
+	
+	def _set_lod_tier(self, tier):
+		super(LimbedGameObj, self)._set_lod_tier(tier)
+		for limb in self.limbs:
+			limb.lod_tier = tier
+	
 	def draw(self):
-		super(LimbedGameObj, self).draw()
+		self._draw_with(self._dispatch_for(self._drives))
 		for limb in self.limbs:
 			limb.draw()
-		temp_drives = self.drives
-		self.drives = self.postdrives
-		super(LimbedGameObj, self).draw(draw_geoms = False)
-		self.drives = temp_drives
+		self._draw_with(self._dispatch_for(self._postdrives), False)
 	
 	def predraw(self):
-		super(LimbedGameObj, self).predraw()
+		self._predraw_with(self._dispatch_for(self._drives))
 		for limb in self.limbs:
 			limb.predraw()
-		temp_drives = self.drives
-		self.drives = self.postdrives
-		super(LimbedGameObj, self).predraw()
-		self.drives = temp_drives
+		self._predraw_with(self._dispatch_for(self._postdrives))
+	
+	def snap(self, entries):
+		super(LimbedGameObj, self).snap(entries)
+		for limb in self.limbs:
+			limb.snap(entries)
+		entries.append((self, (self._pos[0], self._pos[1]), self.ang, self._dispatch_for(self._postdrives), False))
 	
 	def step(self):
-		super(LimbedGameObj, self).step()
+		self._step_with(self._dispatch_for(self._drives))
 		for limb in self.limbs:
 			limb.step()
-		temp_drives = self.drives
-		self.drives = self.postdrives
-		super(LimbedGameObj, self).step()
-		self.drives = temp_drives
+		self._step_with(self._dispatch_for(self._postdrives))
 	
 	def sync_ode(self):
 		super(LimbedGameObj, self).sync_ode()
 		for limb in self.limbs:
 			limb.sync_ode()
+	
+	geom = property(GameObj._get_geom, _set_geom)
+	postdrives = property(_get_postdrives, _set_postdrives)
+	space = property(_get_space, _set_space)
+	lod_tier = property(GameObj._get_lod_tier, _set_lod_tier)
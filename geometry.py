@@ -332,3 +332,87 @@ class Rect:
 				nearest = cand
 		
 		return nearest
+
+
+class Transform(object):
+	"""Represents a two-dimensional rotation and translation, like a GL modelview matrix.
+	
+	A Transform made with a position and angle maps points from an object's frame of reference
+	into its parent's: it's what glTranslate() to pos followed by glRotate() by ang does.
+	Multiplying two Transforms gives one that does the right-hand one first, then the left-hand one,
+	the same as multiplying GL matrices, so a parent's transform times a child's local transform
+	is the child's world transform.
+	
+	Transforms should be treated as immutable, so they can be cached and shared.
+	
+	Data attributes:
+	m -- A 6-tuple (a, b, c, d, tx, ty) of the matrix values. A point (x, y) is
+		mapped to (a*x + c*y + tx, b*x + d*y + ty).
+	"""
+	
+	def __init__(self, pos = None, ang = 0, m = None):
+		if m != None:
+			self.m = tuple(m)
+			return
+		if pos == None: tx, ty = 0.0, 0.0
+		else: tx, ty = pos[0], pos[1]
+		if abs(ang) < 0.000001:
+			self.m = (1.0, 0.0, 0.0, 1.0, tx, ty)
+		else:
+			a = 2.0 * math.pi * ang #Positive rotation turns x towards y, which is clockwise since y points down
+			c = math.cos(a)
+			s = math.sin(a)
+			self.m = (c, s, -s, c, tx, ty)
+	
+	def __mul__(self, other):
+		a1, b1, c1, d1, x1, y1 = self.m
+		a2, b2, c2, d2, x2, y2 = other.m
+		return Transform(m = (
+			a1*a2 + c1*b2,
+			b1*a2 + d1*b2,
+			a1*c2 + c1*d2,
+			b1*c2 + d1*d2,
+			a1*x2 + c1*y2 + x1,
+			b1*x2 + d1*y2 + y1,
+		))
+	
+	def is_identity(self):
+		"""Returns true if the transform leaves points where they are."""
+		return self.m == (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+	
+	def apply(self, p):
+		"""Returns the Point that the given point is mapped to."""
+		a, b, c, d, tx, ty = self.m
+		return Point(a*p[0] + c*p[1] + tx, b*p[0] + d*p[1] + ty)
+	
+	def apply_vec(self, v):
+		"""Like apply(), but ignores the translation; for directions and forces rather than positions."""
+		a, b, c, d, tx, ty = self.m
+		return Point(a*v[0] + c*v[1], b*v[0] + d*v[1])
+	
+	def inverse(self):
+		"""Returns the transform that undoes this one."""
+		a, b, c, d, tx, ty = self.m
+		det = a*d - b*c
+		ia, ib, ic, id = d/det, -b/det, -c/det, a/det
+		return Transform(m = (ia, ib, ic, id, -(ia*tx + ic*ty), -(ib*tx + id*ty)))
+	
+	def pos(self):
+		"""Returns where the transform puts the origin."""
+		return Point(self.m[4], self.m[5])
+	
+	def ang(self):
+		"""Returns the transform's rotation in clockwise revolutions, wrapped to [0, 1)."""
+		return (math.atan2(self.m[1], self.m[0])/(2*math.pi)) % 1
+	
+	def gl_matrix(self):
+		"""Returns a 16-tuple in column-major order, suitable for glMultMatrixf() or glLoadMatrixf()."""
+		a, b, c, d, tx, ty = self.m
+		return (
+			a, b, 0.0, 0.0,
+			c, d, 0.0, 0.0,
+			0.0, 0.0, 1.0, 0.0,
+			tx, ty, 0.0, 1.0
+		)
+
+IDENTITY = Transform()
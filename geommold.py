@@ -3,7 +3,7 @@ from __future__ import division
 import pygame, math, os, ode, cPickle, sys
 from OpenGL.GL import *
 
-import app, image, collision, colors
+import app, image, collision, colors, batchgeom
 from geometry import *
 
 # Constants used in mold generation
@@ -57,6 +57,7 @@ class GeomMold:
 		coll_props - The collision properties for the geom
 		draw_drive - A Drive that can be used to draw an outline of the geom
 		geom_args - The arguments (other than self) that were passed to make_geom to create the geom
+		coll_group - None, or an object shared by geoms that should never collide with each other
 		
 		If no space is specified, app.dyn_space will be used by default.
 		If no coll_props is specified, it will make a new collision.Props
@@ -112,6 +113,7 @@ class CircleGeomMold(GeomMold):
 		
 		if coll_props == -1: geom.coll_props = collision.Props()
 		else: geom.coll_props = coll_props
+		geom.coll_group = None
 		
 		return geom
 
@@ -131,6 +133,7 @@ class BoxGeomMold(GeomMold):
 		
 		if coll_props == -1: geom.coll_props = collision.Props()
 		else: geom.coll_props = coll_props
+		geom.coll_group = None
 		
 		return geom
 
@@ -148,15 +151,20 @@ class ComplexGeomMold(GeomMold):
 			# Create an approximate hull of lines based on the border pixels
 			# We'll do this by subtracting superfluous points from the hull list
 			death_list_five = [] #Indices for points that will be removed
+			if batchgeom.enabled:
+				hull_arr = batchgeom.points(hull) #Nothing is removed from hull until the end, so this stays lined up
 			start = 0
 			while start < (len(hull)-2):
 				for end in range(len(hull)-1, start+1, -1):
 					line = Line(hull[start], hull[end])
-					cullable = True
-					for mid in range(start+1, end):
-						if line.nearest_pt_to(hull[mid]).dist_to(hull[mid]) > MAX_LINE_OFF:
-							cullable = False
-							break
+					if batchgeom.enabled:
+						cullable = bool((batchgeom.line_dist(line, hull_arr[start+1:end]) <= MAX_LINE_OFF).all())
+					else:
+						cullable = True
+						for mid in range(start+1, end):
+							if line.nearest_pt_to(hull[mid]).dist_to(hull[mid]) > MAX_LINE_OFF:
+								cullable = False
+								break
 					if cullable:
 						for c in range(start+1, end):
 							death_list_five.append(c)
@@ -314,10 +322,29 @@ class ComplexGeomMold(GeomMold):
 			_save_cache(cache_name, cache)
 		self.inner_paths = cache["inner"]
 		self.outer_paths = cache["outer"]
+		self._meshes = {} #Key: (w, h, outer, inner), value: (ode.TriMeshData, draw drives)
 	
 	def make_geom(self, size, space = None, coll_props = -1, outer = 1, inner = 0):
 		if space == None: space = app.dyn_space
 		
+		#Geoms of the same size can share their mesh data and outline drives
+		key = (size[0], size[1], outer, inner)
+		if not self._meshes.has_key(key):
+			self._meshes[key] = self._make_mesh(size, outer, inner)
+		tdat, draw_drives = self._meshes[key]
+		
+		geom = ode.GeomTriMesh(tdat, space)
+		geom.mold = self
+		geom.draw_drives = draw_drives
+		geom.geom_args = (size, space, coll_props, outer, inner)
+		
+		if coll_props == -1: geom.coll_props = collision.Props()
+		else: geom.coll_props = coll_props
+		geom.coll_group = None
+		
+		return geom
+	
+	def _make_mesh(self, size, outer, inner):
 		meshverts = []
 		meshtris = []
 		draw_drives = []
@@ -349,13 +376,5 @@ class ComplexGeomMold(GeomMold):
 				add_hull(hull)
 		
 		tdat = ode.TriMeshData()
-		tdat.build(meshverts, meshtris)	
-		geom = ode.GeomTriMesh(tdat, space)
-		geom.mold = self
-		geom.draw_drives = draw_drives
-		geom.geom_args = (size, space, coll_props, outer, inner)
-		
-		if coll_props == -1: geom.coll_props = collision.Props()
-		else: geom.coll_props = coll_props
-		
-		return geom
+		tdat.build(meshverts, meshtris)
+		return (tdat, draw_drives)
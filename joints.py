@@ -14,3 +14,10 @@ class DEnvJoint(drive.Drive):
 	def __init__(self, joint):
 		super(DEnvJoint, self).__init__() #Nothing propogated
 		self.joint = joint
+	
+	def clone(self):
+		raise TypeError("DEnvJoint can't be cloned; each GameObj needs its own joint")
+	
+	def destroy(self, obj):
+		self.joint.attach(None, None)
+		self.joint = None
@@ -0,0 +1,70 @@
+"""Tools for checking that ODE objects aren't piling up over a long session.
+
+Take a count() now and then (say, from the console) and hand the previous one to report();
+anything that keeps growing while the game's contents stay about the same is a leak.
+"""
+
+from __future__ import division
+import gc, ode
+
+import app
+
+ODE_TYPES = (ode.Body, ode.Joint, ode.GeomObject, ode.SpaceBase)
+
+def live_objs():
+	"""Returns a set of the ids of every GameObj in the game, including limbs."""
+	ret = set()
+	for o in app.objects:
+		ret.add(id(o))
+		for limb in getattr(o, "limbs", ()):
+			ret.add(id(limb))
+	return ret
+
+def count():
+	"""Returns a dictionary of counts describing the ODE objects that currently exist.
+
+	The keys are:
+	Body, Joint, GeomObject, SpaceBase -- How many of each kind of PyODE object are alive, found through the gc module.
+	geoms -- How many geoms are in app.static_space and app.dyn_space.
+	orphan_geoms -- How many of those belong to a GameObj that has been destroyed, or isn't in app.objects.
+	drive_geoms -- How many of those don't belong to any GameObj; usually ones owned by drives.
+	objects -- How many GameObjs are in the game, counting limbs.
+	destroy_queue -- How many GameObjs are waiting to be torn down.
+	"""
+	ret = {}
+	for t in ODE_TYPES:
+		ret[t.__name__] = 0
+	for o in gc.get_objects():
+		for t in ODE_TYPES:
+			if isinstance(o, t):
+				ret[t.__name__] += 1
+
+	live = live_objs()
+	ret["geoms"] = 0
+	ret["orphan_geoms"] = 0
+	ret["drive_geoms"] = 0
+	for space in (app.static_space, app.dyn_space):
+		for i in range(space.getNumGeoms()):
+			geom = space.getGeom(i)
+			ret["geoms"] += 1
+			owner = getattr(geom, "gameobj", None)
+			if owner == None:
+				ret["drive_geoms"] += 1
+			elif owner.destroyed or id(owner) not in live:
+				ret["orphan_geoms"] += 1
+
+	ret["objects"] = len(live)
+	ret["destroy_queue"] = len(app.destroy_queue)
+	return ret
+
+def report(prev = None):
+	"""Prints the current count(), along with the change since prev if it's given, and returns the count."""
+	cur = count()
+	keys = cur.keys()
+	keys.sort()
+	for k in keys:
+		if prev != None and prev.has_key(k):
+			print "%-16s %8d (%+d)" % (k, cur[k], cur[k] - prev[k])
+		else:
+			print "%-16s %8d" % (k, cur[k])
+	return cur
@@ -0,0 +1,275 @@
+"""Loads levels from compact JSON files in the levels directory.
+
+A level file is one JSON object with these keys:
+format -- The version of the format; currently always 1.
+molds -- A dictionary from mold name to mold description. A mold description is a dictionary
+	with a "type" ("circle", "box", or "complex") and, for circle and complex molds, an "img".
+	Each mold is only created once, however many objects use it, and molds are kept around between
+	levels, so switching to a level that uses the same images doesn't have to work them out again.
+layers -- A list of layers (see app.sim_init() for what each is for), each a list of objects.
+index -- Information worked out ahead of time by make_index(); see there.
+bake -- Optional; if true, the static objects in layer 1 are baked together once loaded (see bake.py).
+nav -- Optional; if present, a nav.NavGrid of the level is made once loaded, and becomes nav.grid. It's a
+	dictionary that can have "cell_size" and "clearance" (see nav.NavGrid); either can be left out.
+
+An object is a dictionary with these keys, all of them optional:
+pos -- [x, y] position.
+ang -- Angle in revolutions.
+body -- {"density":d, "radius":r}, for an object that has a body (see util.sphere_body()).
+geom -- {"mold":name, "size":[w, h]}, for an object that has a geom. Can also have "space", either "static"
+	or "dyn"; the default is static_space for layer 1, and dyn_space otherwise. Complex molds also take
+	"outer" and "inner" (see ComplexGeomMold.make_geom()).
+kinematic -- true for an object that's moved by its drives rather than by ODE (see GameObj.kinematic), such as
+	a moving platform with a mover.DMover. It can't have a body, and its geom defaults to dyn_space even in layer 1.
+drives -- A list of drive descriptions.
+joints -- A list of joints to the static environment, each {"type":ODE joint class name, "anchor":[x, y]}.
+	Each becomes a joints.DEnvJoint on the object.
+limbs -- A list of objects to add as limbs, each with an "anchor" as well (see LimbedGameObj.add_limb()).
+	Objects with limbs or postdrives are created as LimbedGameObjs, and their limbs' geoms go in their space.
+postdrives -- A list of drive descriptions for a LimbedGameObj's postdrives.
+name -- A name that the object can be found by afterwards, through Level.names.
+
+A drive description is {"type":"module.Class", "args":{...}}. The args are passed as keyword
+arguments, after these conversions: arguments named in POINT_ARGS are made into Points, those named
+in SIZE_ARGS are made into Sizes, a string "color" is looked up in the colors module, and any
+dictionary with a "type" (even inside a list or dictionary) is itself created the same way.
+This is how, for example, a sprite.DSprite gets its library of image.DImages and its sprite.DSprite.Anims.
+"""
+
+from __future__ import division
+import os, json, ode
+
+import app, gameobj, geommold, joints, resman, colors, util, bake, nav
+from geometry import *
+
+FORMAT = 1
+
+LEVEL_DIR = "levels"
+
+#Drive arguments that are converted from [x, y] lists
+POINT_ARGS = ("pos", "offset", "anchor", "end", "tileoffset", "parallax")
+SIZE_ARGS = ("size", "tilesize")
+
+_molds = {} #Key: (mold type, img), value: GeomMold instance
+_types = {} #Key: "module.Class" string, value: the class
+_parsed = {} #Key: level file path, value: (modification time, parsed level data)
+
+MOLD_TYPES = {
+	"circle": geommold.CircleGeomMold,
+	"box": geommold.BoxGeomMold,
+	"complex": geommold.ComplexGeomMold,
+}
+
+class Level(object):
+	"""A level that has been loaded into the world.
+
+	Data attributes:
+	filename -- The name of the level file, relative to LEVEL_DIR.
+	names -- A dictionary from object name to the GameObj that was created for it.
+	"""
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.names = {}
+
+
+def _resolve_type(name):
+	#Turns "module.Class.Inner" into the class it names
+	if not _types.has_key(name):
+		parts = name.split(".")
+		val = __import__(parts[0])
+		for p in parts[1:]:
+			val = getattr(val, p)
+		_types[name] = val
+	return _types[name]
+
+def _mold(data, name):
+	desc = data["molds"][name]
+	key = (desc["type"], desc.get("img"))
+	if not _molds.has_key(key):
+		cls = MOLD_TYPES[desc["type"]]
+		if desc["type"] == "box":
+			_molds[key] = cls()
+		else:
+			_molds[key] = cls(desc.get("img"))
+	return _molds[key]
+
+def _convert(val):
+	#Converts a drive argument value, recursively creating any described objects within it
+	if isinstance(val, dict):
+		if val.has_key("type"):
+			return make_drive(val)
+		return dict([(str(k), _convert(v)) for (k, v) in val.iteritems()])
+	elif isinstance(val, list):
+		return [_convert(v) for v in val]
+	elif isinstance(val, unicode):
+		return str(val)
+	return val
+
+def make_drive(desc):
+	"""Creates an object (usually a Drive) from a description of the form {"type":"module.Class", "args":{...}}."""
+	args = {}
+	for (k, v) in desc.get("args", {}).iteritems():
+		k = str(k)
+		if k in POINT_ARGS and v != None:
+			v = Point(v[0], v[1])
+		elif k in SIZE_ARGS and v != None:
+			v = Size(v[0], v[1])
+		elif k == "color" and isinstance(v, basestring):
+			v = getattr(colors, v)
+		else:
+			v = _convert(v)
+		args[k] = v
+	return _resolve_type(desc["type"])(**args)
+
+def make_obj(data, desc, layer, space = None):
+	"""Creates a GameObj from an object description. See the module docstring for the format.
+
+	Data is the whole level's data, which is needed to look up molds. Layer is the layer number that
+	the object is going into, which picks its default space. If space is given, the geom goes there instead."""
+	pos = Point(*desc.get("pos", (0, 0)))
+	ang = desc.get("ang", 0)
+
+	body = None
+	if desc.has_key("body"):
+		body = util.sphere_body(desc["body"]["density"], desc["body"]["radius"])
+
+	limbed = desc.has_key("limbs") or desc.has_key("postdrives")
+	if limbed:
+		obj = gameobj.LimbedGameObj(pos, ang, body)
+		space = obj.space
+	else:
+		obj = gameobj.GameObj(pos, ang, body)
+
+	if desc.get("kinematic", False):
+		obj.kinematic = True
+	
+	if desc.has_key("geom"):
+		g = desc["geom"]
+		if space == None:
+			if g.get("space", "static" if layer == 1 and not obj.kinematic else "dyn") == "static":
+				space = app.static_space
+			else:
+				space = app.dyn_space
+		size = Size(*g["size"])
+		mold = _mold(data, g["mold"])
+		if isinstance(mold, geommold.ComplexGeomMold):
+			obj.geom = mold.make_geom(size, space, outer = g.get("outer", 1), inner = g.get("inner", 0))
+		else:
+			obj.geom = mold.make_geom(size, space)
+		obj.pos = pos
+		obj.ang = ang
+
+	for d in desc.get("drives", ()):
+		obj.drives.append(make_drive(d))
+
+	for j in desc.get("joints", ()):
+		anchor = Point(*j.get("anchor", (0, 0)))
+		obj.drives.append(joints.DEnvJoint(util.anchored_joint(getattr(ode, j["type"]), obj, anchor)))
+
+	if limbed:
+		for l in desc.get("limbs", ()):
+			obj.add_limb(make_obj(data, l, layer, obj.space), Point(*l["anchor"]))
+		for d in desc.get("postdrives", ()):
+			obj.postdrives.append(make_drive(d))
+
+	return obj
+
+def _textures(val, found):
+	#Collects the image filenames named anywhere within a level's data
+	if isinstance(val, dict):
+		for (k, v) in val.iteritems():
+			if k == "imgfile" and isinstance(v, basestring):
+				found.add(str(v))
+			else:
+				_textures(v, found)
+	elif isinstance(val, list):
+		for v in val:
+			_textures(v, found)
+
+def make_index(data):
+	"""Works out the level's index, and stores it in data["index"]. Returns the index.
+
+	The index has these keys:
+	names -- A dictionary from object name to [layer number, position within layer].
+	textures -- A sorted list of every image file used by the level.
+	count -- The total number of objects, not counting limbs.
+
+	The loader uses the index to read in all the level's textures at once before creating anything."""
+	names = {}
+	count = 0
+	for (l, layer) in enumerate(data["layers"]):
+		for (i, desc) in enumerate(layer):
+			if desc.has_key("name"):
+				names[desc["name"]] = [l, i]
+			count += 1
+	found = set()
+	_textures(data["layers"], found)
+	textures = list(found)
+	textures.sort()
+	data["index"] = {"names": names, "textures": textures, "count": count}
+	return data["index"]
+
+def read(filename):
+	"""Returns the parsed data of a level file, reusing the last parse if the file hasn't changed since."""
+	path = os.path.join(LEVEL_DIR, filename)
+	mtime = os.stat(path).st_mtime
+	cached = _parsed.get(path)
+	if cached != None and cached[0] == mtime:
+		return cached[1]
+
+	f = open(path, "r")
+	data = json.load(f)
+	f.close()
+	if data.get("format") != FORMAT:
+		raise ValueError("Level %s has format %s, expected %s" % (filename, data.get("format"), FORMAT))
+	if not data.has_key("index"):
+		make_index(data)
+	_parsed[path] = (mtime, data)
+	return data
+
+def save(data, filename):
+	"""Writes level data out to a level file, compactly, with a freshly made index."""
+	make_index(data)
+	f = open(os.path.join(LEVEL_DIR, filename), "w")
+	json.dump(data, f, separators = (",", ":"), sort_keys = True)
+	f.close()
+
+def load(filename):
+	"""Loads a level file into the world, and returns a Level.
+
+	This expects a freshly initialized world, right after app.sim_init(); it creates app.objects' layers
+	itself. Once everything has been created, app.optimize_spaces() is called to suit the spaces to the level."""
+	data = read(filename)
+	lvl = Level(filename)
+
+	for t in data["index"]["textures"]:
+		resman.Texture(t)
+
+	for (l, layer) in enumerate(data["layers"]):
+		objs = util.ObjectLayer()
+		app.objects.append(objs)
+		for desc in layer:
+			objs.append(make_obj(data, desc, l))
+
+	for (name, (l, i)) in data["index"]["names"].iteritems():
+		lvl.names[str(name)] = app.objects[l][i]
+
+	if data.has_key("nav"):
+		nav.build(data["nav"].get("cell_size", nav.CELL_SIZE), data["nav"].get("clearance", 0.0))
+	else:
+		nav.clear()
+	
+	if data.get("bake", False):
+		bake.bake(1)
+	
+	app.optimize_spaces()
+	return lvl
+
+def switch(filename):
+	"""Throws away the current world and loads the given level in its place. Returns the new Level.
+	
+	App.streamer is cleared along with the old world, so any streaming.ChunkMap has to be set up again afterwards."""
+	app.sim_deinit()
+	app.sim_init()
+	return load(filename)
@@ -0,0 +1,65 @@
+from __future__ import division
+import math
+
+import app
+from geometry import *
+
+#The level of detail tiers; see GameObj.lod_tier
+FULL = 0 #Everything is stepped every sim step
+REDUCED = 1 #Drives are stepped every app.lod_step_interval steps (except those with sleep_stepping set)
+FROZEN = 2 #Bodies are disabled and drives aren't stepped at all
+
+def region_of(pos):
+	"""Returns the (x, y) index of the LOD region containing the given position."""
+	return (int(math.floor(pos[0]/app.lod_region_size)), int(math.floor(pos[1]/app.lod_region_size)))
+
+def region_tier(region, cen):
+	"""Returns the tier that a region gets when cen (usually the camera) is the point of interest.
+
+	The tier is based on the distance between cen and the nearest point of the region."""
+	size = app.lod_region_size
+	dx = max(region[0]*size - cen[0], 0, cen[0] - (region[0]+1)*size)
+	dy = max(region[1]*size - cen[1], 0, cen[1] - (region[1]+1)*size)
+	dist = math.sqrt(dx*dx + dy*dy)
+	if dist <= app.lod_ranges[0]:
+		return FULL
+	elif dist <= app.lod_ranges[1]:
+		return REDUCED
+	else:
+		return FROZEN
+
+def update():
+	"""Assigns every object in app.objects a level of detail tier.
+
+	Each region gets a tier based on its distance from app.camera. Then, so that nothing can
+	wander into a frozen area and bump into objects that won't react, every awake body in a
+	non-frozen region promotes the regions around it to its own tier. Finally, each object
+	takes the tier of the region it's in.
+
+	This is called every app.lod_update_interval steps by app when app.lod_enabled is True."""
+
+	cam = app.camera
+	tiers = {}
+	movers = []
+	for o in app.objects:
+		r = region_of(o.pos)
+		o._lod_region = r
+		t = tiers.get(r)
+		if t == None:
+			t = tiers[r] = region_tier(r, cam)
+		if t != FROZEN and o.body != None and not o.asleep:
+			movers.append((r, t))
+
+	for (r, t) in movers:
+		for nx in (r[0]-1, r[0], r[0]+1):
+			for ny in (r[1]-1, r[1], r[1]+1):
+				n = (nx, ny)
+				nt = tiers.get(n)
+				if nt == None:
+					nt = region_tier(n, cam)
+				if nt > t:
+					nt = t
+				tiers[n] = nt
+
+	for o in app.objects:
+		o.lod_tier = tiers[o._lod_region]
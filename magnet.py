@@ -1,9 +1,9 @@
 from __future__ import division
-import app, math, util, drive, geommold, collision
+import app, math, util, drive, batchgeom, query
 from geometry import *
 
 def mag_force(source, target, tgtmass, pow, loss = 0, grav = False):
-	"""Returns a 3-tuple, appropriate for passing to body.addForce(), for a magnetic/gravitational force.
+	"""Returns a Point, appropriate for passing to app.forces.add_force(), for a magnetic/gravitational force.
 	
 	Force is emanating from source, affecting target. Both are passed as 2-tuples.
 	Pow is the amount of force applied. Negative for pulling, positive for pushing.
@@ -31,6 +31,20 @@ def mag_force(source, target, tgtmass, pow, loss = 0, grav = False):
 	ang = math.atan2(target[1]-source[1], target[0]-source[0])
 	return Point(force*math.cos(ang), force*math.sin(ang))
 
+def _nearest_all(shape, objs):
+	#Returns a list of (nearest point on shape, distance to it) for the pos of each of objs
+	#Shape is a Line or Rect; the batch version is used if NumPy is around
+	if batchgeom.enabled:
+		pts = batchgeom.points([o.pos for o in objs])
+		near = batchgeom.nearest(shape, pts)
+		dists = batchgeom.dist(near, pts)
+		return [(Point(float(near[i,0]), float(near[i,1])), dists[i]) for i in range(len(objs))]
+	ret = []
+	for o in objs:
+		near = shape.nearest_pt_to(o.pos)
+		ret.append((near, near.dist_to(o.pos)))
+	return ret
+
 
 class DMagnet(drive.Drive):
 	"""Drive that creates a point of gravitational/magnetic attraction or repulsion.
@@ -45,35 +59,19 @@ class DMagnet(drive.Drive):
 	"""
 
 	def __init__(self, pow, rad = 0, loss = 0, gravity = False):
-		super(DMagnet, self).__init__(stepping = True)
+		super(DMagnet, self).__init__(stepping = True, sleep_stepping = True)
 		self.pow = pow
 		self.rad = rad
 		self.loss = loss
 		self.gravity = gravity
-		
-		# A non-intersec-pushing sphere so we can easily figure out which things are in range
-		if rad != 0:
-			self._geom = geommold.CircleGeomMold().make_geom(Size(abs(rad)*2,abs(rad)*2), coll_props = collision.Props(False))
-			self._geom_placed = False
-		else:
-			self._geom = None
 	
 	def _step(self, magobj):
-		#If this one has limited range
-		#No magnetism on the first step, since that step has to be used to initially set the magnet's range geom
-		#Also, we use setPosition, not setBody, since the magnet doesn't necessarily have to have a body
-		if self._geom != None:
-			self._geom.setPosition(magobj.pos.fake_3d_tuple())
-			self._geom_placed = True
-		
 		# Figure out which objects are in range of the magnet
-		targets = []
-		if self._geom != None and self._geom_placed and app.collisions.has_key(id(self._geom)):
-			for other in app.collisions[id(self._geom)]:
-				targets.append((other.geom.gameobj, other.avg_pos))
-		elif self._geom == None:
-			for obj in app.objects:
-				targets.append((obj, obj.pos))
+		# With a limited range, the magnetized point is the middle of where the object overlaps the range circle
+		if self.rad != 0:
+			targets = query.in_circle(magobj.pos, abs(self.rad), geomless = False, points = True)
+		else:
+			targets = [(obj, obj.pos) for obj in app.objects.with_body()]
 		
 		#For each object in range, affect it magnetically if we should 
 		for (obj, mpoint) in targets:
@@ -83,11 +81,15 @@ class DMagnet(drive.Drive):
 			
 			if obj.body != None:
 				force = mag_force(magobj.pos, mpoint, obj.body.getMass().mass, self.pow, self.loss, self.gravity)
-				obj.body.addForceAtPos(force.fake_3d_tuple(), mpoint.fake_3d_tuple())
+				if force[0] != 0 or force[1] != 0:
+					obj.wake()
+					app.forces.add_force_at(obj, force, mpoint, "magnet")
 			
 			if magobj.body != None:
 				force = mag_force(mpoint, magobj.pos, magobj.body.getMass().mass, self.pow, self.loss, self.gravity)
-				magobj.body.addForce(force.fake_3d_tuple())
+				if force[0] != 0 or force[1] != 0:
+					magobj.wake()
+					app.forces.add_force(magobj, force, "magnet")
 
 
 class DLineMagnet(drive.Drive):
@@ -110,7 +112,7 @@ class DLineMagnet(drive.Drive):
 	"""
 	
 	def __init__(self, pow, end, rad = 0, loss = 0, gravity = False):
-		super(DLineMagnet, self).__init__(stepping = True)
+		super(DLineMagnet, self).__init__(stepping = True, sleep_stepping = True)
 		self.pow = pow
 		self.end = end
 		self.rad = rad
@@ -118,26 +120,23 @@ class DLineMagnet(drive.Drive):
 		self.gravity = gravity
 	
 	def _step(self, magobj):
-		#For every object excluding the actual pulling object, check if we're affecting it
-		for o in app.objects:
-			if o == magobj:
-				continue
-			
-			#Ignore objects outside the ODE force system
-			if o.body == None:
-				continue
-
-			#Find the nearest point on the line to the object
-			magline = Line(
-				(magobj.pos + self.end).rot(magobj.pos, magobj.ang),
-				(magobj.pos - self.end).rot(magobj.pos, magobj.ang))
-			nearest = magline.nearest_pt_to(o.pos)
-			
+		#The line is the same for every object, so work it out in world coordinates once
+		xform = magobj.transform()
+		magline = Line(xform.apply(self.end), xform.apply(-self.end))
+		
+		#For every object in the ODE force system excluding the actual pulling object, check if we're affecting it
+		objs = [o for o in app.objects.with_body() if o != magobj]
+		
+		#Find the nearest point on the line to each object, all in one go
+		for (o, (nearest, dist)) in zip(objs, _nearest_all(magline, objs)):
 			#Ignore objects outside range, if there's a range set
-			if self.rad > 0 and self.rad < nearest.dist_to(o.pos):
+			if self.rad > 0 and self.rad < dist:
 				continue
 			
-			o.body.addForce(mag_force(nearest, o.pos, o.body.getMass().mass, self.pow, self.loss, self.gravity))
+			force = mag_force(nearest, o.pos, o.body.getMass().mass, self.pow, self.loss, self.gravity)
+			if force[0] != 0 or force[1] != 0:
+				o.wake()
+				app.forces.add_force(o, force, "line magnet")
 
 	
 
@@ -161,7 +160,7 @@ class DRectMagnet(drive.Drive):
 	"""
 	
 	def __init__(self, pow, size, rad = 0, loss = 0, gravity = False):
-		super(DRectMagnet, self).__init__(stepping = True)
+		super(DRectMagnet, self).__init__(stepping = True, sleep_stepping = True)
 		self.pow = pow
 		self.size = size
 		self.rad = rad
@@ -169,19 +168,15 @@ class DRectMagnet(drive.Drive):
 		self.gravity = gravity
 	
 	def _step(self, magobj):
-		#For every object excluding the actual pulling object, check if we're affecting it
+		#For every object in the ODE force system excluding the actual pulling object, check if we're affecting it
 		mag_rect = Rect(magobj.pos, self.size, magobj.ang)
-		for o in app.objects:
-			if o == magobj:
-				continue
-			
-			#Ignore objects outside the ODE force system
-			if o.body == None:
-				continue
-			
+		objs = [o for o in app.objects.with_body() if o != magobj]
+		for (o, (nearest, dist)) in zip(objs, _nearest_all(mag_rect, objs)):
 			#Ignore objects outside range, if there's a range set
-			nearest = mag_rect.nearest_pt_to(o.pos)
-			if self.rad > 0 and self.rad < nearest.dist_to(o.pos):
+			if self.rad > 0 and self.rad < dist:
 				continue
 			
-			o.body.addForce(mag_force(nearest, o.pos, o.body.getMass().mass, self.pow, self.loss, self.gravity))
+			force = mag_force(nearest, o.pos, o.body.getMass().mass, self.pow, self.loss, self.gravity)
+			if force[0] != 0 or force[1] != 0:
+				o.wake()
+				app.forces.add_force(o, force, "rect magnet")
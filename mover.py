@@ -0,0 +1,56 @@
+from __future__ import division
+
+import app, drive
+from geometry import *
+
+class DMover(drive.Drive):
+	"""Drive that moves its object along a path of points at a steady speed, like a moving platform.
+
+	This is meant for kinematic GameObjs (see GameObj.kinematic): it sets the object's vel each
+	step, so that sync_ode() carries it to the next point, arriving there exactly.
+	It also works on objects with bodies, though then other things can push them off course.
+
+	Data attributes:
+	path -- A list of Points, in absolute coordinates, to move between.
+	speed -- How fast to move, in meters per second.
+	pause -- How many steps to stop for at each point.
+	loop -- If True, after the last point the object heads back to the first. Otherwise, it goes back and forth along the path.
+	target -- The index in path of the point being moved towards.
+	"""
+
+	def __init__(self, path, speed, pause = 0, loop = True):
+		super(DMover, self).__init__(stepping = True, sleep_stepping = True)
+		self.path = [Point(p[0], p[1]) for p in path]
+		self.speed = speed
+		self.pause = pause
+		self.loop = loop
+		self.target = 0
+		self._dir = 1
+		self._wait = 0
+
+	def _advance(self):
+		if len(self.path) < 2:
+			return
+		if self.loop:
+			self.target = (self.target + 1) % len(self.path)
+		else:
+			if not 0 <= self.target + self._dir < len(self.path):
+				self._dir = -self._dir
+			self.target += self._dir
+
+	def _step(self, obj):
+		if len(self.path) == 0:
+			return
+		if self._wait > 0:
+			self._wait -= 1
+			obj.vel = Point(0, 0)
+			return
+
+		off = self.path[self.target] - obj.pos
+		if off.mag() <= self.speed/app.simfps:
+			#Close enough to get there by the next step; then, stop there for a while and go on to the next point
+			obj.vel = off*app.simfps
+			self._wait = self.pause
+			self._advance()
+		else:
+			obj.vel = off.to_length(self.speed)
@@ -0,0 +1,384 @@
+"""Finding ways around the static parts of the world, for drives that chase things.
+
+A NavGrid divides the level into square cells, each either blocked or free. A cell is blocked if
+a box the size of the cell (grown by the grid's clearance on every side) touches a solid geom in
+app.static_space, where solid means that its coll_props has intersec_push set. Cells are only
+worked out once, when the grid is made; after static geoms are added, moved, or removed, call
+invalidate() with the area that changed. Use watch() to have a tilemap.TileMap do that for you.
+
+Paths are found by searching outwards from the destination over the 8 neighbors of each cell
+(diagonal steps aren't allowed to cut past blocked corners). The search for each destination cell
+is kept and resumed only as far as it needs to go to reach each start, so any number of chasers
+heading for the same place share one search, and asking again from a cell that has already been
+reached is a dictionary lookup. The searches for the last MAX_FIELDS destinations are kept.
+
+The insides of geoms that are only hollow meshes, such as those from geommold.ComplexGeomMold,
+can only be blocked at their walls. That doesn't change which paths are found from
+outside, since the walls still block the way in.
+
+Level files can have a NavGrid made when they're loaded; see level.py.
+"""
+
+from __future__ import division
+import ode, math, heapq
+from collections import OrderedDict
+
+import app, drive, broadphase
+from geometry import *
+
+CELL_SIZE = 0.5 #Default width and height in meters of each cell
+MAX_FIELDS = 8 #How many destinations' searches each NavGrid keeps
+LOOKAHEAD = 8 #How many cells along the path next_point() looks for a waypoint it can head straight for
+
+SQRT2 = math.sqrt(2)
+
+grid = None #The current level's NavGrid, or None if it doesn't have one
+
+class _Field(object):
+	#A search outwards from a destination cell, which can be carried on further when needed
+
+	def __init__(self, nav, goal):
+		self.goal = goal
+		self.dist = {goal: 0.0} #Key is cell, value is the best known distance to goal in cells
+		self.toward = {} #Key is cell, value is the next cell on the way to goal
+		self.done = set() #Cells whose dist is final
+		self.waypoints = {} #Key is start cell, value is the waypoint cell next_point() picked, or None if goal can't be reached
+		self._nav = nav
+		self._heap = [(0.0, goal)]
+
+	def reach(self, cell):
+		"""Carries on the search until cell's distance is final. Returns False if cell can't reach the goal."""
+		nav = self._nav
+		heap = self._heap
+		dist = self.dist
+		while cell not in self.done:
+			if len(heap) == 0:
+				return False
+			(d, c) = heapq.heappop(heap)
+			if c in self.done:
+				continue
+			self.done.add(c)
+			for (n, cost) in nav._moves(c):
+				nd = d + cost
+				if nd < dist.get(n, nd + 1):
+					dist[n] = nd
+					self.toward[n] = c
+					heapq.heappush(heap, (nd, n))
+		return True
+
+	def touches(self, cells):
+		"""Returns True if any of the given cells, or their neighbors, have been reached by the search."""
+		for c in cells:
+			if c in self.dist:
+				return True
+			for n in self._nav._adjacent(c):
+				if n in self.dist:
+					return True
+		return False
+
+
+class NavGrid(object):
+	"""A grid of free and blocked cells covering the level, for finding paths.
+
+	Cells are referred to by a single integer index, row*cols + col, with row 0 at the top.
+
+	Data attributes:
+	origin -- The Point at the top-left corner of the grid.
+	cell_size -- The width and height of each cell in meters.
+	clearance -- How far in meters a cell's center has to stay from solid geoms for it to be free,
+		beyond half the cell size. Set this to about the radius of the things that will follow the paths.
+	cols, rows -- The size of the grid in cells.
+	blocked -- A bytearray, nonzero for blocked cells.
+	"""
+
+	def __init__(self, bounds, cell_size = CELL_SIZE, clearance = 0.0):
+		"""Creates a NavGrid covering an axis-aligned Rect, and works out which cells are blocked."""
+		self.cell_size = cell_size
+		self.clearance = clearance
+		self.cols = max(1, int(math.ceil(bounds.size[0]/cell_size)))
+		self.rows = max(1, int(math.ceil(bounds.size[1]/cell_size)))
+		self.origin = Point(bounds.cen[0] - self.cols*cell_size/2, bounds.cen[1] - self.rows*cell_size/2)
+		self.blocked = bytearray(self.cols*self.rows)
+		self._fields = OrderedDict() #Key is goal cell, value is its _Field; least recently used first
+
+		n = self.cols
+		self._steps = ( #(index offset, column offset, cost, orthogonal offsets that must be free)
+			(-1, -1, 1.0, ()), (1, 1, 1.0, ()), (-n, 0, 1.0, ()), (n, 0, 1.0, ()),
+			(-n-1, -1, SQRT2, (-1, -n)), (-n+1, 1, SQRT2, (1, -n)),
+			(n-1, -1, SQRT2, (-1, n)), (n+1, 1, SQRT2, (1, n)),
+		)
+		self._rasterize(0, 0, self.cols-1, self.rows-1)
+
+	def __str__(self):
+		return "NavGrid(%ix%i, %s m)" % (self.cols, self.rows, self.cell_size)
+
+	def cell_of(self, pos):
+		"""Returns the index of the cell containing a point, or None if it's outside the grid."""
+		c = int(math.floor((pos[0] - self.origin[0])/self.cell_size))
+		r = int(math.floor((pos[1] - self.origin[1])/self.cell_size))
+		if 0 <= c < self.cols and 0 <= r < self.rows:
+			return r*self.cols + c
+		return None
+
+	def cell_center(self, cell):
+		"""Returns the Point at the center of a cell."""
+		r, c = divmod(cell, self.cols)
+		return Point(self.origin[0] + (c + 0.5)*self.cell_size, self.origin[1] + (r + 0.5)*self.cell_size)
+
+	def is_blocked(self, pos):
+		"""Returns True if the point is in a blocked cell or outside the grid."""
+		cell = self.cell_of(pos)
+		return cell == None or self.blocked[cell] != 0
+
+	def _adjacent(self, cell):
+		#Yields the cells around a cell, blocked or not
+		c = cell % self.cols
+		for (off, coff, cost, needs) in self._steps:
+			if 0 <= c + coff < self.cols and 0 <= cell + off < len(self.blocked):
+				yield cell + off
+
+	def _moves(self, cell):
+		#Yields (neighbor, cost) for each free cell that can be stepped to from cell
+		blocked = self.blocked
+		total = len(blocked)
+		c = cell % self.cols
+		for (off, coff, cost, needs) in self._steps:
+			n = cell + off
+			if not (0 <= c + coff < self.cols and 0 <= n < total) or blocked[n]:
+				continue
+			corner_free = True
+			for o in needs:
+				if blocked[cell + o]:
+					corner_free = False
+					break
+			if corner_free:
+				yield (n, cost)
+
+	def _free_near(self, cell):
+		#Returns cell if it's free, else a free cell next to it, else None
+		if cell == None:
+			return None
+		if not self.blocked[cell]:
+			return cell
+		for n in self._adjacent(cell):
+			if not self.blocked[n]:
+				return n
+		return None
+
+	def _rasterize(self, c0, r0, c1, r1):
+		#Works out whether each cell from (c0, r0) to (c1, r1) is blocked, and returns the cells that changed
+		cs = self.cell_size
+		lo = Point(self.origin[0] + c0*cs, self.origin[1] + r0*cs)
+		hi = Point(self.origin[0] + (c1+1)*cs, self.origin[1] + (r1+1)*cs)
+
+		#Let the broadphase find the geoms that might be in the area
+		area = ode.GeomBox(None, (hi[0]-lo[0] + 2*self.clearance, hi[1]-lo[1] + 2*self.clearance, 10))
+		area.setPosition(((lo[0]+hi[0])/2, (lo[1]+hi[1])/2, 0))
+		found = []
+		ode.collide2(area, app.static_space, found, _near_cb)
+
+		new = {} #Key is cell, value is whether it's blocked; only cells in the area
+		for r in range(r0, r1+1):
+			for c in range(c0, c1+1):
+				new[r*self.cols + c] = 0
+
+		side = cs + 2*self.clearance
+		box = ode.GeomBox(None, (side, side, 10))
+		for g in found:
+			aabb = g.getAABB()
+			gc0 = max(c0, int(math.floor((aabb[0] - self.clearance - self.origin[0])/cs)))
+			gc1 = min(c1, int(math.floor((aabb[1] + self.clearance - self.origin[0])/cs)))
+			gr0 = max(r0, int(math.floor((aabb[2] - self.clearance - self.origin[1])/cs)))
+			gr1 = min(r1, int(math.floor((aabb[3] + self.clearance - self.origin[1])/cs)))
+			for r in range(gr0, gr1+1):
+				for c in range(gc0, gc1+1):
+					cell = r*self.cols + c
+					if new[cell]:
+						continue
+					box.setPosition(self.cell_center(cell).fake_3d_tuple())
+					if len(ode.collide(box, g)) > 0:
+						new[cell] = 1
+
+		changed = []
+		for (cell, b) in new.iteritems():
+			if self.blocked[cell] != b:
+				self.blocked[cell] = b
+				changed.append(cell)
+		return changed
+
+	def invalidate(self, rect):
+		"""Works out again which cells are blocked within an axis-aligned Rect, after static geoms there have changed.
+
+		Cells outside the Rect but close enough for the change to affect them (see clearance) are worked out again too.
+		Kept searches are only thrown away if they've reached one of the cells that changed."""
+		cs = self.cell_size
+		hw = rect.size[0]/2 + self.clearance + cs/2
+		hh = rect.size[1]/2 + self.clearance + cs/2
+		c0 = max(0, int(math.floor((rect.cen[0] - hw - self.origin[0])/cs)))
+		c1 = min(self.cols-1, int(math.floor((rect.cen[0] + hw - self.origin[0])/cs)))
+		r0 = max(0, int(math.floor((rect.cen[1] - hh - self.origin[1])/cs)))
+		r1 = min(self.rows-1, int(math.floor((rect.cen[1] + hh - self.origin[1])/cs)))
+		if c0 > c1 or r0 > r1:
+			return
+		changed = self._rasterize(c0, r0, c1, r1)
+		if len(changed) == 0:
+			return
+		for goal in self._fields.keys():
+			if self._fields[goal].touches(changed):
+				del self._fields[goal]
+
+	def _field(self, goal):
+		f = self._fields.pop(goal, None)
+		if f == None:
+			f = _Field(self, goal)
+			if len(self._fields) >= MAX_FIELDS:
+				self._fields.popitem(last = False)
+		self._fields[goal] = f
+		return f
+
+	def _clear_line(self, a, b):
+		#Returns True if the straight line between the centers of cells a and b only crosses free cells
+		pa = self.cell_center(a)
+		pb = self.cell_center(b)
+		steps = int(math.ceil(pa.dist_to(pb)/(self.cell_size/4)))
+		for i in range(1, steps):
+			cell = self.cell_of(pa + (pb - pa)*(i/steps))
+			if cell == None or self.blocked[cell]:
+				return False
+		return True
+
+	def _ends(self, start, goal):
+		#Returns (start cell, goal's _Field), or None if there's no way from start to goal
+		s = self._free_near(self.cell_of(start))
+		g = self._free_near(self.cell_of(goal))
+		if s == None or g == None:
+			return None
+		f = self._field(g)
+		if not f.reach(s):
+			return None
+		return (s, f)
+
+	def next_point(self, start, goal):
+		"""Returns the Point to head straight for to get from start to goal, or None if goal can't be reached.
+
+		This is the next waypoint on the path, as far along it (up to LOOKAHEAD cells) as can be
+		seen from start's cell; or goal itself, once it's in sight. Waypoints are cached for each
+		start cell, so this is cheap to call for every chaser every step."""
+		ends = self._ends(start, goal)
+		if ends == None:
+			return None
+		(s, f) = ends
+		if not f.waypoints.has_key(s):
+			way = s
+			c = s
+			for i in range(LOOKAHEAD):
+				if c == f.goal:
+					break
+				c = f.toward[c]
+				if self._clear_line(s, c):
+					way = c
+			f.waypoints[s] = way
+		way = f.waypoints[s]
+		if way == f.goal:
+			return Point(goal[0], goal[1])
+		return self.cell_center(way)
+
+	def path(self, start, goal):
+		"""Returns a list of Points leading from start to goal, ending with goal, or None if goal can't be reached.
+
+		Cells along the way that can be skipped by going in a straight line are left out."""
+		ends = self._ends(start, goal)
+		if ends == None:
+			return None
+		(s, f) = ends
+		cells = [s]
+		while cells[-1] != f.goal:
+			cells.append(f.toward[cells[-1]])
+
+		ret = []
+		i = 0
+		while i < len(cells)-1:
+			j = len(cells)-1
+			while j > i+1 and not self._clear_line(cells[i], cells[j]):
+				j -= 1
+			if j < len(cells)-1:
+				ret.append(self.cell_center(cells[j]))
+			i = j
+		ret.append(Point(goal[0], goal[1]))
+		return ret
+
+
+def _near_cb(found, geom1, geom2):
+	#ode.collide2() callback that collects solid static geoms whose AABBs touch the area geom
+	for g in (geom1, geom2):
+		if g.isSpace():
+			continue
+		props = getattr(g, "coll_props", None)
+		if props != None and props.intersec_push:
+			found.append(g)
+
+def build(cell_size = CELL_SIZE, clearance = 0.0, margin = 1.0):
+	"""Makes a NavGrid covering the geoms in app.static_space, plus a margin in meters all around, and makes it the current grid."""
+	global grid
+	bounds = broadphase.geoms_bounds(broadphase.space_geoms(app.static_space))
+	if bounds == None:
+		bounds = Rect(Point(0, 0), Size(0, 0))
+	grid = NavGrid(Rect(bounds.cen, bounds.size + margin*2), cell_size, clearance)
+	return grid
+
+def clear():
+	"""Forgets the current grid."""
+	global grid
+	grid = None
+
+def watch(tilemap):
+	"""Has a tilemap.TileMap update the current grid (if there is one) whenever a tile is changed."""
+	tilemap.listeners.append(_tile_changed)
+
+def _tile_changed(tilemap, c, r):
+	if grid == None:
+		return
+	ts = tilemap.tile_size
+	grid.invalidate(Rect(Point(tilemap.pos[0] + (c + 0.5)*ts, tilemap.pos[1] + (r + 0.5)*ts), Size(ts, ts)))
+
+
+class DPursue(drive.Drive):
+	"""Drive that chases another GameObj around the static parts of the world, using the current NavGrid.
+
+	Objects with bodies are pushed towards the target's speed through app.forces; kinematic objects
+	just have their vel set. Nothing is done while there's no grid, no target, or no way to reach it.
+
+	Data attributes:
+	target -- The GameObj to chase, or None.
+	speed -- How fast to go, in meters per second.
+	accel -- For objects with bodies, how quickly to match the chasing speed, as the fraction of the difference made up per second.
+	stop_dist -- How close in meters to get to the target before stopping.
+	"""
+
+	def __init__(self, target = None, speed = 2.0, accel = 4.0, stop_dist = 0.5):
+		super(DPursue, self).__init__(stepping = True, sleep_stepping = True)
+		self.target = target
+		self.speed = speed
+		self.accel = accel
+		self.stop_dist = stop_dist
+
+	def _step(self, obj):
+		if self.target == None or self.target.destroyed:
+			self.target = None
+			want = Point(0, 0)
+		elif grid == None or obj.pos.dist_to(self.target.pos) <= self.stop_dist:
+			want = Point(0, 0)
+		else:
+			way = grid.next_point(obj.pos, self.target.pos)
+			if way == None or way.dist_to(obj.pos) == 0:
+				want = Point(0, 0)
+			else:
+				want = (way - obj.pos).to_length(self.speed)
+
+		if obj.body != None:
+			force = (want - obj.vel)*(obj.body.getMass().mass*self.accel)
+			if force[0] != 0 or force[1] != 0:
+				obj.wake()
+				app.forces.add_force(obj, force, "pursuit")
+		elif obj.kinematic:
+			obj.vel = want
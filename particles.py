@@ -0,0 +1,259 @@
+"""Sprays of many small, short-lived particles, such as sparks, dust, and smoke.
+
+A DParticles drive keeps all of its particles in NumPy arrays, moves them all at once each step,
+and draws them as a single batch of GL points. The particles are in world coordinates, so once
+they've been emitted they don't follow the emitting object around.
+
+NumPy is optional. If it isn't installed, enabled is False, and DParticles drives do nothing.
+"""
+
+from __future__ import division
+import math
+from OpenGL.GL import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import app, drive, resman, nav
+from geometry import *
+
+enabled = numpy != None #True if DParticles drives actually make particles
+
+GL_POINT_SPRITE = 0x8861
+GL_COORD_REPLACE = 0x8862
+
+class DParticles(drive.Drive):
+	"""Drive that emits particles from its object, moves them, and draws them.
+
+	Each particle is emitted at the object's pos (plus the drive's offset), heading out at
+	ang (relative to the object's, and the drive's rot_offset) give or take half of spread.
+	Over its life, its color goes from color to end_color.
+
+	Particles can also be bounced off the blocked cells of the current nav.NavGrid, if there is
+	one; that's only as exact as the grid's cells, but it costs about the same as moving them.
+
+	Data attributes:
+	rate -- How many particles to emit per second. Fractions carry over from step to step.
+	life -- How long in seconds each particle lasts.
+	life_var -- How much life varies randomly, in seconds either way.
+	speed -- How fast particles start out, in meters per second.
+	speed_var -- How much speed varies randomly, in meters per second either way.
+	ang -- The direction particles head out in, in revolutions.
+	spread -- How wide a range of directions particles head out in, in revolutions. 1.0 for every direction.
+	inherit -- How much of the object's vel particles start out with, from 0 to 1.
+	accel -- A Point, the acceleration in meters per second per second applied to every particle, such as gravity.
+	drag -- The fraction of its speed each particle loses per second.
+	field -- None, or a function that takes an N x 2 array of particle positions, and returns an
+		N x 2 array (or a single 2-tuple) of accelerations to add, for particles blown around by something.
+	collide -- If True, particles bounce off the blocked cells of nav.grid.
+	bounce -- The fraction of their speed that particles keep when they bounce.
+	color -- The starting color, as an (r, g, b) or (r, g, b, a) tuple.
+	end_color -- The color at the end of each particle's life. If None, it's color with alpha 0, so that particles fade out.
+	size -- The width of each particle in meters.
+	tex -- None, or a resman.Texture to draw each particle with (as a point sprite) instead of a plain dot.
+	max_particles -- The most particles there can be at once. Particles that would go over this aren't emitted.
+	count -- How many particles there are now.
+	"""
+
+	def __init__(self, rate = 50.0, life = 1.0, life_var = 0.0, speed = 1.0, speed_var = 0.0, ang = 0.0, spread = 1.0,
+	inherit = 0.0, accel = None, drag = 0.0, field = None, collide = False, bounce = 0.5,
+	color = (1.0, 1.0, 1.0), end_color = None, size = 0.05, tex = None, max_particles = 2000, offset = None, rot_offset = 0):
+		super(DParticles, self).__init__(drawing = True, stepping = True, sleep_stepping = True, offset = offset, rot_offset = rot_offset)
+		self.rate = rate
+		self.life = life
+		self.life_var = life_var
+		self.speed = speed
+		self.speed_var = speed_var
+		self.ang = ang
+		self.spread = spread
+		self.inherit = inherit
+		if accel == None: self.accel = Point(0, 0)
+		else: self.accel = Point(accel[0], accel[1])
+		self.drag = drag
+		self.field = field
+		self.collide = collide
+		self.bounce = bounce
+		self.color = color
+		self.end_color = end_color
+		self.size = size
+		if isinstance(tex, basestring): self.tex = resman.Texture(tex)
+		else: self.tex = tex
+		self.max_particles = max_particles
+		self.count = 0
+		self._carry = 0.0 #Fraction of a particle left over from the last emission
+		self._alloc()
+
+	def __str__(self):
+		return super(DParticles, self).__str__() + "(%i)" % self.count
+
+	def _alloc(self):
+		#Makes a fresh, empty set of particle arrays
+		self.count = 0
+		if not enabled:
+			return
+		n = self.max_particles
+		self._pos = numpy.zeros((n, 2))
+		self._prev = numpy.zeros((n, 2)) #Positions as of the step before, for drawing between steps
+		self._vel = numpy.zeros((n, 2))
+		self._age = numpy.zeros(n)
+		self._life = numpy.ones(n)
+		self._color = numpy.zeros((n, 4), dtype = numpy.float32)
+
+	def clone(self):
+		ret = super(DParticles, self).clone()
+		ret._carry = 0.0
+		ret._alloc()
+		return ret
+
+	def destroy(self, obj):
+		self.clear()
+
+	def clear(self):
+		"""Gets rid of every particle."""
+		self.count = 0
+		self._carry = 0.0
+
+	def _colors(self):
+		#Returns the start and end colors as RGBA arrays
+		start = numpy.array(tuple(self.color) + (1.0,)*(4 - len(self.color)))
+		if self.end_color == None:
+			end = start.copy()
+			end[3] = 0.0
+		else:
+			end = numpy.array(tuple(self.end_color) + (1.0,)*(4 - len(self.end_color)))
+		return (start, end)
+
+	def emit(self, obj, num):
+		"""Emits num particles right away, on top of the steady rate. Returns how many there was room for."""
+		if not enabled:
+			return 0
+		num = min(num, self.max_particles - self.count)
+		if num <= 0:
+			return 0
+		a = self.count
+		b = a + num
+		rand = numpy.random.uniform
+
+		xform = obj.transform() * self.local_transform()
+		origin = xform.pos()
+		base = xform.ang() + self.ang
+		angs = (base + rand(-0.5, 0.5, num)*self.spread)*(2*math.pi)
+		speeds = self.speed + rand(-1.0, 1.0, num)*self.speed_var
+		self._pos[a:b] = (origin[0], origin[1])
+		self._prev[a:b] = self._pos[a:b]
+		self._vel[a:b, 0] = numpy.cos(angs)*speeds
+		self._vel[a:b, 1] = numpy.sin(angs)*speeds
+		if self.inherit != 0:
+			vel = obj.vel
+			self._vel[a:b] += (vel[0]*self.inherit, vel[1]*self.inherit)
+		self._age[a:b] = 0.0
+		self._life[a:b] = numpy.maximum(self.life + rand(-1.0, 1.0, num)*self.life_var, 0.0001)
+		self._color[a:b] = self._colors()[0]
+		self.count = b
+		return num
+
+	def _bounce(self, n):
+		#Puts particles that have moved into blocked cells back where they were, bouncing them off
+		grid = nav.grid
+		blocked = numpy.frombuffer(grid.blocked, dtype = numpy.uint8)
+
+		def hits(x, y):
+			c = numpy.floor((x - grid.origin[0])/grid.cell_size).astype(int)
+			r = numpy.floor((y - grid.origin[1])/grid.cell_size).astype(int)
+			inside = (c >= 0) & (c < grid.cols) & (r >= 0) & (r < grid.rows)
+			cells = numpy.where(inside, r*grid.cols + c, 0)
+			return inside & (blocked[cells] != 0)
+
+		pos = self._pos[:n]
+		prev = self._prev[:n]
+		hit = hits(pos[:, 0], pos[:, 1])
+		if not hit.any():
+			return
+
+		#Work out which way each particle hit the wall by trying its x and y movements alone
+		hit_x = hit & hits(pos[:, 0], prev[:, 1])
+		hit_y = hit & hits(prev[:, 0], pos[:, 1])
+		corner = hit & ~hit_x & ~hit_y
+		vel = self._vel[:n]
+		vel[hit_x | corner, 0] *= -self.bounce
+		vel[hit_y | corner, 1] *= -self.bounce
+		pos[hit] = prev[hit]
+
+	def _step(self, obj):
+		if not enabled:
+			return
+		dt = 1/app.simfps
+		n = self.count
+		if n > 0:
+			pos = self._pos[:n]
+			vel = self._vel[:n]
+			self._prev[:n] = pos
+
+			vel += (self.accel[0]*dt, self.accel[1]*dt)
+			if self.field != None:
+				vel += numpy.asarray(self.field(pos))*dt
+			if self.drag != 0:
+				vel *= max(0.0, 1.0 - self.drag*dt)
+			pos += vel*dt
+			if self.collide and nav.grid != None:
+				self._bounce(n)
+
+			age = self._age[:n]
+			age += dt
+			alive = age < self._life[:n]
+			if not alive.all():
+				live = int(alive.sum())
+				for arr in (self._pos, self._prev, self._vel, self._age, self._life):
+					arr[:live] = arr[:n][alive]
+				n = self.count = live
+
+			(start, end) = self._colors()
+			t = (self._age[:n]/self._life[:n])[:, numpy.newaxis]
+			self._color[:n] = start + (end - start)*t
+
+		self._carry += self.rate*dt
+		num = int(self._carry)
+		if num > 0:
+			self._carry -= num
+			self.emit(obj, num)
+
+	def draw(self, obj):
+		#Particles are in world coordinates, so the object's and the drive's transforms are undone first
+		if not self.drawing or not enabled or self.count == 0:
+			return
+		glPushMatrix()
+		glMultMatrixf(obj.drawn_transform().inverse().gl_matrix())
+		self._draw(obj)
+		glPopMatrix()
+
+	def _draw(self, obj):
+		n = self.count
+		a = app.interp
+		pos = self._pos[:n]
+		if a < 1.0:
+			pos = self._prev[:n] + (pos - self._prev[:n])*a
+		verts = numpy.ascontiguousarray(pos, dtype = numpy.float32)
+		cols = numpy.ascontiguousarray(self._color[:n])
+
+		glPointSize(max(1.0, self.size*app.pixm*app.zoom))
+		if self.tex != None:
+			glEnable(GL_TEXTURE_2D)
+			glBindTexture(GL_TEXTURE_2D, self.tex.glname)
+			glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
+			glEnable(GL_POINT_SPRITE)
+			glTexEnvi(GL_POINT_SPRITE, GL_COORD_REPLACE, GL_TRUE)
+
+		glEnableClientState(GL_VERTEX_ARRAY)
+		glEnableClientState(GL_COLOR_ARRAY)
+		glVertexPointer(2, GL_FLOAT, 0, verts)
+		glColorPointer(4, GL_FLOAT, 0, cols)
+		glDrawArrays(GL_POINTS, 0, n)
+		glDisableClientState(GL_COLOR_ARRAY)
+		glDisableClientState(GL_VERTEX_ARRAY)
+
+		if self.tex != None:
+			glDisable(GL_POINT_SPRITE)
+			glDisable(GL_TEXTURE_2D)
+		glPointSize(4)
@@ -0,0 +1,118 @@
+from __future__ import division
+import ode
+
+import app, gameobj, util, lod
+from geometry import *
+
+class Prefab(object):
+	"""A template for quickly stamping out copies of a GameObj.
+
+	A Prefab is made from an existing, fully set up GameObj. It remembers the mass of its body,
+	the mold and arguments that made its geom, its drives and its props. Each call to spawn() then
+	creates a new GameObj just like it, without having to work any of that out again: the mass
+	and mold are shared between all the copies, and each copy gets clones of the drives (see
+	Drive.clone()), which share things like textures and sprite libraries.
+
+	Objects that are finished with should be handed back with release() instead of just being
+	thrown away. They're taken out of the world and kept on a free list, and the next spawn()
+	reuses one of them rather than creating a new body and geom. Recycled objects keep the drives
+	they had, but get their position, angle, velocity and props reset.
+
+	LimbedGameObjs and objects with joints to the environment (joints.DEnvJoint) can't be made into prefabs.
+
+	Data attributes:
+	layer -- The layer of app.objects that spawn() puts objects in, unless told otherwise.
+	max_free -- The most released objects that are kept around for reuse. Any more are destroyed.
+	"""
+
+	def __init__(self, obj, layer = 2, max_free = 32):
+		if isinstance(obj, gameobj.LimbedGameObj):
+			raise TypeError("Can't make a Prefab from a LimbedGameObj")
+		self.layer = layer
+		self.max_free = max_free
+
+		self._mass = None
+		self._body_attrs = {}
+		if obj.body != None:
+			self._mass = obj.body.getMass()
+			for attr in ("radius", "density"):
+				if hasattr(obj.body, attr):
+					self._body_attrs[attr] = getattr(obj.body, attr)
+
+		self._mold = None
+		self._static = False
+		if obj.geom != None:
+			self._mold = obj.geom.mold
+			self._geom_args = obj.geom.geom_args
+			self._static = obj.geom.getSpace() is app.static_space
+
+		self._kinematic = obj.kinematic
+		self._drives = [d.clone() for d in obj.drives]
+		self._props = frozenset(obj.props)
+		self._free = []
+
+	def _space(self):
+		if self._static: return app.static_space
+		else: return app.dyn_space
+
+	def _make(self):
+		body = None
+		if self._mass != None:
+			body = ode.Body(app.odeworld)
+			body.setMass(self._mass)
+			for (attr, val) in self._body_attrs.iteritems():
+				setattr(body, attr, val)
+
+		geom = None
+		if self._mold != None:
+			args = list(self._geom_args)
+			args[1] = self._space()
+			geom = self._mold.make_geom(*args)
+
+		obj = gameobj.GameObj(body = body, geom = geom, drives = [d.clone() for d in self._drives])
+		obj.kinematic = self._kinematic
+		obj.prefab = self
+		return obj
+
+	def spawn(self, pos, ang = 0, vel = None, layer = None):
+		"""Puts a new copy of the prefab into the world at the given position and angle, and returns it.
+
+		If vel is given, the copy starts out moving at that velocity. Layer overrides the layer data attribute."""
+		#Objects destroyed while on the free list (such as when the level was torn down) can't be reused
+		while len(self._free) > 0 and self._free[-1].destroyed:
+			self._free.pop()
+		if len(self._free) > 0:
+			obj = self._free.pop()
+			if obj.geom != None:
+				self._space().add(obj.geom)
+			if obj.body != None:
+				obj.body.setAngularVel((0, 0, 0))
+				obj.body.setForce((0, 0, 0))
+				obj.body.setTorque((0, 0, 0))
+		else:
+			obj = self._make()
+
+		obj.lod_tier = lod.FULL
+		obj.pos = Point(pos[0], pos[1])
+		obj.ang = ang
+		if vel != None: obj.vel = Point(vel[0], vel[1])
+		else: obj.vel = Point(0, 0)
+		obj.props = set(self._props)
+		obj.skip_interp()
+
+		if layer == None: layer = self.layer
+		app.objects[layer].append(obj)
+		return obj
+
+	def release(self, obj):
+		"""Takes an object made by spawn() out of the world, keeping it to be reused by a later spawn()."""
+		if getattr(obj, "prefab", None) is not self:
+			raise ValueError("Object wasn't spawned by this Prefab")
+		if len(self._free) >= self.max_free:
+			obj.destroy()
+			return
+		app.objects.remove(obj)
+		if obj.geom != None:
+			util.remove_geom(obj.geom)
+		obj.sleep()
+		self._free.append(obj)
@@ -0,0 +1,222 @@
+"""Asking what's in some part of the world, with answers in the same step.
+
+Each query tests a temporary ODE geom of the right shape against app.static_space and
+app.dyn_space, so geoms are found by the same broadphase that collision detection uses,
+and then checked exactly with ode.collide(). Objects without geoms are found through a
+spatial hash of their positions, which is brought up to date at the first query of each step.
+
+Results are cached until the next sim step, so many drives asking the same question in one
+step only pay for it once. That also means that a query made after objects have been moved
+or destroyed in the middle of a step can give the answer from earlier in that step.
+
+The temporary geoms aren't in any space, so they never take part in regular collision detection.
+"""
+
+from __future__ import division
+import ode, math
+
+import app
+from geometry import *
+
+CELL_SIZE = 2.0 #Size in meters of the squares in the spatial hash of geomless objects
+POINT_RAD = 0.0001 #Radius of the tiny sphere used by at_point()
+
+_world = None #The app.odeworld that the temporary geoms below were made for
+_box = None
+_sphere = None
+_ray = None
+
+_objects = None #The app.objects that the spatial hash is of
+_step = None #The app.totalsteps that the cache and spatial hash are for
+_cache = {} #Key is a tuple describing a query, value is its results
+_cells = {} #Key is (x, y) cell, value is dict from id(obj) to obj
+_placed = {} #Key is id(obj), value is ((x, y) of pos when hashed, cell)
+
+def _cell_of(pos):
+	return (int(math.floor(pos[0]/CELL_SIZE)), int(math.floor(pos[1]/CELL_SIZE)))
+
+def _sync():
+	#Gets the temporary geoms, cache and spatial hash ready for a query this step
+	global _world, _box, _sphere, _ray, _objects, _step, _cache, _cells, _placed
+	if app.odeworld is not _world:
+		_world = app.odeworld
+		_box = ode.GeomBox(None, (1, 1, 1))
+		_sphere = ode.GeomSphere(None, 1)
+		_ray = ode.GeomRay(None, 1)
+	if app.objects is not _objects:
+		_objects = app.objects
+		_step = None
+		_cells = {}
+		_placed = {}
+	if app.totalsteps != _step:
+		_step = app.totalsteps
+		_cache = {}
+		_rehash()
+
+def _rehash():
+	#Moves geomless objects that have moved to their new cells, and forgets ones that are gone
+	seen = set()
+	for o in app.objects.without_geom():
+		k = id(o)
+		seen.add(k)
+		pos = o.pos
+		xy = (pos[0], pos[1])
+		entry = _placed.get(k)
+		if entry != None and entry[0] == xy:
+			continue
+		cell = _cell_of(pos)
+		if entry != None and entry[1] != cell:
+			_drop(k, entry[1])
+		if entry == None or entry[1] != cell:
+			_cells.setdefault(cell, {})[k] = o
+		_placed[k] = (xy, cell)
+	for k in _placed.keys():
+		if k not in seen:
+			_drop(k, _placed.pop(k)[1])
+
+def _drop(k, cell):
+	objs = _cells[cell]
+	del objs[k]
+	if len(objs) == 0:
+		del _cells[cell]
+
+def _geomless_in(lo, hi, test):
+	#Returns (obj, pos) for hashed geomless objects within the bounds lo to hi for which test(pos) is true
+	ret = []
+	clo = _cell_of(lo)
+	chi = _cell_of(hi)
+	for cx in range(clo[0], chi[0]+1):
+		for cy in range(clo[1], chi[1]+1):
+			objs = _cells.get((cx, cy))
+			if objs == None:
+				continue
+			for o in objs.itervalues():
+				pos = o.pos
+				if not o.destroyed and test(pos):
+					ret.append((o, Point(pos[0], pos[1])))
+	return ret
+
+def _hit_cb(data, geom1, geom2):
+	(tmp, found) = data
+	if geom1 is tmp: other = geom2
+	else: other = geom1
+	if other.isSpace():
+		#Only reached for spaces nested within app.dyn_space or app.static_space by hand
+		ode.collide2(tmp, other, data, _hit_cb)
+		return
+	obj = getattr(other, "gameobj", None)
+	if obj == None or obj.destroyed:
+		return
+	contacts = ode.collide(tmp, other)
+	if len(contacts) > 0:
+		found.append((obj, [c.getContactGeomParams() for c in contacts]))
+
+def _geom_hits(tmp):
+	#Returns (GameObj, list of contact geom params) for each geom that the temporary geom touches
+	found = []
+	for space in (app.static_space, app.dyn_space):
+		ode.collide2(tmp, space, (tmp, found), _hit_cb)
+	return found
+
+def _overlaps(tmp):
+	#Returns (GameObj, average contact Point) for each object with a geom that the temporary geom touches
+	ret = []
+	seen = set()
+	for (obj, params) in _geom_hits(tmp):
+		if id(obj) in seen:
+			continue
+		seen.add(id(obj))
+		avg = Point(0, 0)
+		for p in params:
+			avg += Point(p[0][0], p[0][1])
+		avg /= len(params)
+		ret.append((obj, avg))
+	return ret
+
+def _results(hits, points):
+	#Returns cached (GameObj, Point) hits the way the caller asked for them
+	if points: return hits
+	else: return tuple([h[0] for h in hits])
+
+def in_aabb(cen, size, geomless = True, points = False):
+	"""Returns a tuple of the GameObjs within an axis-aligned box centered at cen with the given size.
+
+	If geomless is True, objects without geoms are included if their pos is within the box.
+	If points is True, each result is instead a tuple of (GameObj, Point), where the Point is
+	the average of the points where the object's geom touches the box (or the object's pos,
+	for objects without geoms)."""
+	_sync()
+	key = ("aabb", cen[0], cen[1], size[0], size[1], geomless)
+	hits = _cache.get(key)
+	if hits == None:
+		_box.setLengths((size[0], size[1], 10))
+		_box.setPosition((cen[0], cen[1], 0))
+		hits = _overlaps(_box)
+		if geomless:
+			lo = Point(cen[0] - size[0]/2, cen[1] - size[1]/2)
+			hi = Point(cen[0] + size[0]/2, cen[1] + size[1]/2)
+			hits.extend(_geomless_in(lo, hi,
+				lambda p: lo[0] <= p[0] <= hi[0] and lo[1] <= p[1] <= hi[1]))
+		hits = _cache[key] = tuple(hits)
+	return _results(hits, points)
+
+def in_circle(cen, rad, geomless = True, points = False):
+	"""Returns a tuple of the GameObjs within a circle of the given radius around cen.
+
+	The geomless and points arguments work as in in_aabb()."""
+	_sync()
+	key = ("circle", cen[0], cen[1], rad, geomless)
+	hits = _cache.get(key)
+	if hits == None:
+		_sphere.setRadius(rad)
+		_sphere.setPosition((cen[0], cen[1], 0))
+		hits = _overlaps(_sphere)
+		if geomless:
+			hits.extend(_geomless_in(Point(cen[0]-rad, cen[1]-rad), Point(cen[0]+rad, cen[1]+rad),
+				lambda p: (p[0]-cen[0])**2 + (p[1]-cen[1])**2 <= rad*rad))
+		hits = _cache[key] = tuple(hits)
+	return _results(hits, points)
+
+def at_point(pos, points = False):
+	"""Returns a tuple of the GameObjs whose geoms cover the given point.
+
+	Objects without geoms have no size, so they're never included. The points argument works as in in_aabb()."""
+	_sync()
+	key = ("point", pos[0], pos[1])
+	hits = _cache.get(key)
+	if hits == None:
+		_sphere.setRadius(POINT_RAD)
+		_sphere.setPosition((pos[0], pos[1], 0))
+		hits = _cache[key] = tuple(_overlaps(_sphere))
+	return _results(hits, points)
+
+def ray_cast(start, end):
+	"""Returns the geoms crossed by the line segment from start to end, nearest to start first.
+
+	The result is a tuple of (GameObj, Point, distance) tuples, where the Point is where the
+	segment first hits the object's geom and distance is how far that is from start. Each
+	object is only listed once. Objects without geoms are never hit."""
+	_sync()
+	key = ("ray", start[0], start[1], end[0], end[1])
+	hits = _cache.get(key)
+	if hits != None:
+		return hits
+
+	length = math.sqrt((end[0]-start[0])**2 + (end[1]-start[1])**2)
+	if length == 0:
+		_cache[key] = ()
+		return ()
+	_ray.setLength(length)
+	_ray.set((start[0], start[1], 0), ((end[0]-start[0])/length, (end[1]-start[1])/length, 0))
+
+	nearest = {} #Key is id(obj), value is (GameObj, Point, distance) of the nearest contact
+	for (obj, params) in _geom_hits(_ray):
+		for p in params:
+			dist = p[2] #For rays, contact depth is the distance along the ray
+			if not nearest.has_key(id(obj)) or dist < nearest[id(obj)][2]:
+				nearest[id(obj)] = (obj, Point(p[0][0], p[0][1]), dist)
+	hits = nearest.values()
+	hits.sort(key = lambda h: h[2])
+	hits = tuple(hits)
+	_cache[key] = hits
+	return hits
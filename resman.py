@@ -6,17 +6,25 @@ from OpenGL.GLU import *
 import app
 from geometry import *
 
+_unload_queue = [] #Filenames of textures that release() has let go of, for flush_unloads()
+
 class Texture(object):
 	"""An OpenGL 2D texture.
 
+	The image file is read as soon as the Texture is created, but it isn't given to GL until
+	the first time glname is used. That means Textures can be created ahead of time, even away
+	from the thread that does the drawing. Unloaded textures (see unload()) quietly load
+	themselves again if they're used afterwards.
+
 	Data attributes:
 	filename -- The filename that the texture was loaded from, or an empty string
 	glname -- The OpenGL texture name.
 	size -- The dimensions of the texture as a Size.
-	surf -- The PyGame surface.
+	surf -- The PyGame surface, or None if the texture is unloaded.
 	"""
 	
 	cache = {} #Key: filename, value: Texture instance
+	holds = {} #Key: filename, value: number of outstanding hold() calls on it
 
 	def __new__(cls, filename):
 		"""Creates a Texture from an image file, using pre-cached version if it exists."""
@@ -26,23 +34,75 @@ class Texture(object):
 		else:
 			obj = object.__new__(cls)
 			obj.filename = filename
+			obj.surf = None
+			obj._glname = None
 			Texture.cache[filename] = obj
-			obj.glname = glGenTextures(1)
-			fullpath = os.path.join('imgs', filename)
-			surf = pygame.image.load(fullpath)
-			obj.surf = surf
-			obj.size = Size(surf.get_width(), surf.get_height())
+			obj._load_surf()
+			return obj
+
+	def _load_surf(self):
+		fullpath = os.path.join('imgs', self.filename)
+		self.surf = pygame.image.load(fullpath)
+		self.size = Size(self.surf.get_width(), self.surf.get_height())
+
+	def _get_glname(self):
+		if self._glname == None:
+			if self.surf == None:
+				self._load_surf()
+			surf = self.surf
+			self._glname = glGenTextures(1)
 			texData = pygame.image.tostring(surf, "RGBA", 1)
-			glBindTexture(GL_TEXTURE_2D, obj.glname)
+			glBindTexture(GL_TEXTURE_2D, self._glname)
 			glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, surf.get_width(), surf.get_height(), 0, GL_RGBA, GL_UNSIGNED_BYTE, texData)
 			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
 			glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-			return obj
+		return self._glname
+
+	def unload(self):
+		"""Frees the GL texture and the image data. The Texture will reload itself if it's used again."""
+		if self._glname != None:
+			glDeleteTextures([self._glname])
+			self._glname = None
+		self.surf = None
+
+	glname = property(_get_glname)
+
+def hold(filename):
+	"""Makes sure a texture is loaded, and keeps it that way until a matching release()."""
+	Texture.holds[filename] = Texture.holds.get(filename, 0) + 1
+	tex = Texture(filename)
+	if tex.surf == None:
+		tex._load_surf()
+
+def release(filename):
+	"""Undoes a hold(). Once a texture has no more holds on it, it's queued up to be unloaded.
+	
+	Unloading frees GL textures, which can only be done on the drawing thread, so the queue is
+	only emptied by flush_unloads(), which app calls before drawing each frame. A texture that's
+	held again before then isn't unloaded after all.
+
+	Textures that were created without ever being held aren't affected by this."""
+	count = Texture.holds[filename] - 1
+	if count > 0:
+		Texture.holds[filename] = count
+	else:
+		del Texture.holds[filename]
+		_unload_queue.append(filename)
+
+def flush_unloads():
+	"""Unloads the textures queued up by release() that still have no holds on them. Call this only from the drawing thread."""
+	while len(_unload_queue) > 0:
+		filename = _unload_queue.pop(0) #Popping one at a time is safe against release() appending from the sim thread
+		if not Texture.holds.has_key(filename) and Texture.cache.has_key(filename):
+			Texture.cache[filename].unload()
 
 def unload_all():
 	"""Unloads all resources.
-	
+
 	Invalidates all instances of any of the classes in this module."""
-	if len(Texture.cache) > 0:
-		glDeleteTextures([ x.glname for x in Texture.cache.values() ])
-		Texture.cache = {}
+	names = [ x._glname for x in Texture.cache.values() if x._glname != None ]
+	if len(names) > 0:
+		glDeleteTextures(names)
+	Texture.cache = {}
+	Texture.holds = {}
+	del _unload_queue[:]
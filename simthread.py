@@ -0,0 +1,152 @@
+from __future__ import division
+import threading, time
+
+import app, util
+from geometry import *
+
+class Snapshot(object):
+	"""A record of what the world looked like at the end of one sim step, for drawing on another thread.
+
+	Snapshots are never changed after they're taken. The drives in them are the drive objects
+	themselves, not copies, so their drawing code should only read state that's replaced
+	(rather than modified in place) by their stepping code. Each entry holds the object's
+	dispatch tuples, which are only ever replaced, never changed, so they don't need copying.
+
+	Data attributes:
+	step -- The value of app.totalsteps when the snapshot was taken.
+	time -- The wall-clock time (from time.time()) when the snapshot was taken.
+	entries -- A tuple of (GameObj, pos, ang, dispatch, draw_geoms) tuples in drawing order; see GameObj.snap().
+	"""
+
+	def __init__(self):
+		self.step = app.totalsteps
+		self.time = time.time()
+		entries = []
+		for o in app.objects:
+			o.snap(entries)
+		self.entries = tuple(entries)
+		self._transforms = None
+
+	def transforms(self):
+		"""Returns a dictionary from id(GameObj) to that object's (pos, ang) in this snapshot."""
+		if self._transforms == None:
+			self._transforms = {}
+			for e in self.entries:
+				self._transforms[id(e[0])] = (e[1], e[2])
+		return self._transforms
+
+	def show(self, prev, frac):
+		"""Sets up each object in this snapshot to be drawn part of the way between prev and this snapshot.
+
+		Frac is how far along (0 to 1) to draw. Prev may be None, or may be missing objects
+		that were created since it was taken; those objects are just drawn where this snapshot has them."""
+		if prev != None:
+			prevxf = prev.transforms()
+		else:
+			prevxf = {}
+
+		for (obj, pos, ang, dispatch, draw_geoms) in self.entries:
+			old = prevxf.get(id(obj))
+			if old == None or frac >= 1.0:
+				obj._shown = (Point(pos[0], pos[1]), ang)
+			else:
+				(opos, oang) = old
+				obj._shown = (
+					Point(opos[0] + (pos[0]-opos[0])*frac, opos[1] + (pos[1]-opos[1])*frac),
+					(oang + util.min_ang_diff(oang, ang)*frac) % 1
+				)
+
+	def predraw(self):
+		"""Calls predraw() on each drive in the snapshot."""
+		for (obj, pos, ang, dispatch, draw_geoms) in self.entries:
+			obj._predraw_with(dispatch)
+
+	def draw(self):
+		"""Draws each entry in the snapshot."""
+		for (obj, pos, ang, dispatch, draw_geoms) in self.entries:
+			obj._draw_with(dispatch, draw_geoms)
+
+
+class SimThread(threading.Thread):
+	"""Runs the simulation on its own thread, publishing a Snapshot after every step.
+
+	The main thread keeps handling input and drawing; it passes input over with
+	give_input(), and draws whatever latest() returns. While the console is active,
+	the sim is paused, same as in app.run().
+
+	Data attributes:
+	error -- If the sim thread died because of an exception, this is the exception; otherwise None.
+	"""
+
+	def __init__(self):
+		super(SimThread, self).__init__(name = "sim")
+		self.setDaemon(True)
+		self.error = None
+		self._stopping = False
+		self._shots = (None, Snapshot()) #(previous, latest); replaced all at once, so no lock is needed to read it
+		self._inbox = [] #Events handed over by the main thread but not yet seen by a step
+		self._inbox_lock = threading.Lock()
+
+	def latest(self):
+		"""Returns a (previous Snapshot, latest Snapshot) tuple. The previous one may be None."""
+		return self._shots
+
+	def give_input(self, events, keys):
+		"""Passes along input gathered on the main thread; it's seen by the next sim step."""
+		self._inbox_lock.acquire()
+		try:
+			self._inbox.extend(events)
+			app.keys = keys
+		finally:
+			self._inbox_lock.release()
+
+	def stop(self):
+		"""Asks the sim thread to end, and waits for it to do so."""
+		self._stopping = True
+		self.join()
+
+	def run(self):
+		try:
+			stepsecs = 1/app.simfps
+			due = time.time()
+			while not self._stopping:
+				now = time.time()
+				if app.cons.active:
+					#Paused; don't try to catch up on the time spent in the console afterwards
+					due = now
+					time.sleep(stepsecs)
+					continue
+
+				if now < due:
+					time.sleep(due - now)
+					continue
+
+				steps = 0
+				while now >= due and steps < app.max_catchup_steps and not self._stopping:
+					self._step()
+					steps += 1
+					due += stepsecs
+
+				#If we couldn't catch up, drop the lost time rather than trying to make it up later
+				if now >= due:
+					due = now
+		except Exception, e:
+			self.error = e
+
+	def _step(self):
+		app.sim_lock.acquire()
+		try:
+			self._inbox_lock.acquire()
+			try:
+				app.events = self._inbox
+				self._inbox = []
+			finally:
+				self._inbox_lock.release()
+			
+			app._sim_step()
+			app.totalsteps += 1
+			shot = Snapshot()
+		finally:
+			app.sim_lock.release()
+
+		self._shots = (self._shots[1], shot)
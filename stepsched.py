@@ -0,0 +1,233 @@
+"""A scheduler for things that happen on particular sim steps, rather than every step.
+
+Drives that only have something to do now and then can ask app.scheduler to call them back
+on some later step instead of polling a counter every step. Longer-running behaviors, like
+enemies waiting around or patrolling, can be written as generators and handed to start():
+
+	def patrol(obj):
+		while True:
+			obj.vel = Point(1, 0)
+			yield 120 #Wait 120 steps
+			obj.vel = Point(-1, 0)
+			yield "alarm" #Wait until someone calls app.scheduler.signal("alarm")
+
+A behavior that's waiting costs nothing on the steps in between.
+"""
+
+from __future__ import division
+
+import app, drive
+
+class Timer(object):
+	"""A call waiting in a Scheduler. Returned by Scheduler.call_at() and call_in().
+
+	Data attributes:
+	step -- The sim step on which the call will be made.
+	cancelled -- True if cancel() has been called.
+	fired -- True once the call has been made.
+	"""
+
+	def __init__(self, step, func, args):
+		self.step = step
+		self.cancelled = False
+		self.fired = False
+		self._func = func
+		self._args = args
+
+	def cancel(self):
+		"""Stops the call from being made, if it hasn't been already."""
+		self.cancelled = True
+		self._func = None
+		self._args = None
+
+
+class Behavior(object):
+	"""A generator being run by a Scheduler. Returned by Scheduler.start().
+
+	Each time the generator yields, it's put to sleep until what it yielded comes about:
+	a number N means to wait N steps (at least 1), None means to wait until the next step,
+	and a string means to wait until that event is signalled with Scheduler.signal(). In that
+	last case, the value passed to signal() is what the yield evaluates to.
+
+	Data attributes:
+	owner -- If not None, the GameObj this behavior belongs to. Once it's destroyed, the behavior stops.
+	done -- True once the generator has finished, or stop() has been called.
+	"""
+
+	def __init__(self, sched, gen, owner = None):
+		self.owner = owner
+		self.done = False
+		self._sched = sched
+		self._gen = gen
+		self._timer = None
+		self._event = None
+
+	def _resume(self, value = None):
+		self._timer = None
+		self._event = None
+		if self.done:
+			return
+		if self.owner != None and self.owner.destroyed:
+			self.stop()
+			return
+
+		try:
+			req = self._gen.send(value)
+		except StopIteration:
+			self.done = True
+			self._gen = None
+			return
+
+		if req == None:
+			req = 1
+		if isinstance(req, basestring):
+			self._event = req
+			self._sched._waiters.setdefault(req, []).append(self)
+		elif isinstance(req, (int, long)):
+			self._timer = self._sched.call_in(max(req, 1), self._resume)
+		else:
+			self.stop()
+			raise TypeError("Behaviors must yield a number of steps, an event name, or None; got %r" % (req,))
+
+	def stop(self):
+		"""Stops the behavior for good, closing its generator."""
+		if self.done:
+			return
+		self.done = True
+		if self._timer != None:
+			self._timer.cancel()
+			self._timer = None
+		if self._event != None:
+			self._sched._waiters[self._event].remove(self)
+			if len(self._sched._waiters[self._event]) == 0:
+				del self._sched._waiters[self._event]
+			self._event = None
+		self._gen.close()
+		self._gen = None
+
+
+class Scheduler(object):
+	"""A timing wheel of calls to be made on particular sim steps.
+
+	Calls are kept in a ring of slots, one slot per step, wrapping around every
+	len(slots) steps. Each tick() only looks at the slot for the current step, so the
+	cost of a step depends on how much is due then, not on how much is waiting overall.
+	Calls more than a full turn of the wheel away just sit in their slot until their turn comes.
+
+	app.sim_init() makes one of these as app.scheduler, and app ticks it every step,
+	after ODE has run but before the GameObjs step.
+	"""
+
+	def __init__(self, slots = 256):
+		self._slots = [[] for i in range(slots)]
+		self._ticked = -1 #The last step that tick() has been called for
+		self._waiters = {} #Event names to lists of Behaviors waiting for them
+
+	def _next_step(self):
+		#Steps that have already been ticked are too late; those calls have to wait for the next tick
+		return max(app.totalsteps, self._ticked + 1)
+
+	def call_at(self, step, func, *args):
+		"""Arranges for func(*args) to be called on the given sim step, and returns a Timer.
+
+		If that step has already been ticked, the call is made on the next tick."""
+		step = max(step, self._next_step())
+		timer = Timer(step, func, args)
+		self._slots[step % len(self._slots)].append(timer)
+		return timer
+
+	def call_in(self, steps, func, *args):
+		"""Arranges for func(*args) to be called that many steps from the current one, and returns a Timer."""
+		return self.call_at(app.totalsteps + steps, func, *args)
+
+	def cancel(self, timer):
+		"""Stops a call made with call_at() or call_in() from happening. Same as timer.cancel()."""
+		timer.cancel()
+
+	def start(self, gen, owner = None):
+		"""Starts running the generator gen as a behavior, and returns its Behavior.
+
+		The generator runs right away, up to its first yield. If owner is given, the
+		behavior stops once that GameObj has been destroyed."""
+		b = Behavior(self, gen, owner)
+		b._resume()
+		return b
+
+	def signal(self, event, value = None):
+		"""Wakes up every behavior waiting for the named event, passing value to each of them.
+
+		Behaviors that go right back to waiting for the same event aren't woken again by this call."""
+		waiters = self._waiters.pop(event, ())
+		for b in waiters:
+			b._event = None
+			b._resume(value)
+
+	def pending(self):
+		"""Returns how many calls are waiting to be made, not counting cancelled ones."""
+		ret = 0
+		for slot in self._slots:
+			for timer in slot:
+				if not timer.cancelled:
+					ret += 1
+		return ret
+
+	def tick(self):
+		"""Makes all the calls due on the current sim step. This is called by app every step."""
+		step = app.totalsteps
+		self._ticked = step
+		idx = step % len(self._slots)
+		slot = self._slots[idx]
+		if len(slot) == 0:
+			return
+
+		due = []
+		later = []
+		for timer in slot:
+			if timer.cancelled:
+				continue
+			elif timer.step <= step:
+				due.append(timer)
+			else:
+				later.append(timer)
+		self._slots[idx] = later #Calls made from the due ones can then safely go into this slot
+
+		for timer in due:
+			if not timer.cancelled: #An earlier call this step may have cancelled it
+				timer.fired = True
+				func, args = timer._func, timer._args
+				timer._func = None
+				timer._args = None
+				func(*args)
+
+
+class DBehavior(drive.Drive):
+	"""Drive that runs a behavior generator (see Behavior) for its object.
+
+	The drive steps only once, to start the behavior on app.scheduler; after that it
+	turns stepping off, and the behavior is woken by the scheduler when it has something to do.
+	The behavior is stopped when the object is destroyed.
+
+	Data attributes:
+	func -- A function that takes the GameObj and returns a generator.
+	behavior -- The running Behavior, or None if it hasn't been started yet.
+	"""
+
+	def __init__(self, func):
+		super(DBehavior, self).__init__(stepping = True, sleep_stepping = True)
+		self.func = func
+		self.behavior = None
+
+	def clone(self):
+		ret = super(DBehavior, self).clone()
+		ret.behavior = None
+		ret._stepping = True
+		return ret
+
+	def destroy(self, obj):
+		if self.behavior != None:
+			self.behavior.stop()
+			self.behavior = None
+
+	def _step(self, obj):
+		self.behavior = app.scheduler.start(self.func(obj), obj)
+		self.stepping = False
@@ -0,0 +1,229 @@
+from __future__ import division
+import math
+
+import app, resman, gameobj, util
+from geometry import *
+
+class Chunk(object):
+	"""A square piece of a level that can be loaded into the world and unloaded again.
+
+	The first time a chunk is loaded, its builders create its objects. Unloading doesn't destroy
+	anything: objects are parked instead. They're taken out of app.objects, their geoms are taken
+	out of their spaces, and their bodies are disabled, so they keep all their state for when the
+	chunk is loaded again. Objects that move (ones with bodies, or kinematic ones) belong to whichever
+	chunk they're in when it's unloaded, not the one that built them; see ChunkMap.
+	
+	Data attributes:
+	key -- The (x, y) index of the chunk in its ChunkMap.
+	builders -- A list of callables. The first time the chunk is loaded, each is called with no
+		arguments, and should return a sequence of (layer number, GameObj) tuples. Those GameObjs
+		are appended to that layer of app.objects.
+	textures -- A set of image filenames used by the chunk's objects. These are held (see resman.hold())
+		while the chunk is loaded, and are preloaded a little while before it's needed.
+	loaded -- True if the chunk's objects are in the world right now.
+	objs -- The GameObjs that the chunk put into the world, while it's loaded.
+	"""
+
+	def __init__(self, key):
+		self.key = key
+		self.builders = []
+		self.textures = set()
+		self.loaded = False
+		self.objs = []
+		self._built = False
+		self._parked = [] #(GameObj, ObjectLayer, asleep, list of (geom, True if it was in static_space)) for each parked object
+		self._preloaded = False
+
+	def preload(self):
+		"""Reads in the chunk's textures, so that loading it later doesn't have to wait on the disk."""
+		if not self._preloaded:
+			for t in self.textures:
+				resman.hold(t)
+			self._preloaded = True
+
+	def load(self):
+		"""Puts the chunk's objects into the world, creating them if this is the first time."""
+		if self.loaded:
+			return
+		self.preload()
+		if not self._built:
+			for b in self.builders:
+				for (layer, obj) in b():
+					app.objects[layer].append(obj)
+					self.objs.append(obj)
+			self._built = True
+		for (obj, layer, asleep, geoms) in self._parked:
+			for (geom, static) in geoms:
+				if static: app.static_space.add(geom)
+				else: app.dyn_space.add(geom)
+			layer.append(obj)
+			if not asleep:
+				obj.wake()
+			self.objs.append(obj)
+		self._parked = []
+		self.loaded = True
+
+	def unload(self, movers = ()):
+		"""Parks the chunk's objects, and lets go of its textures.
+		
+		Movers is a sequence of the moving objects that are in the chunk now, which are parked along
+		with it. The chunk's own moving objects that have gone elsewhere are left in the world."""
+		if self.loaded:
+			keep = [o for o in self.objs if o.body == None and not o.kinematic]
+			seen = set()
+			for obj in keep + list(movers):
+				if obj.destroyed or id(obj) in seen or obj not in app.objects:
+					continue
+				seen.add(id(obj))
+				self._park(obj)
+			self.objs = []
+			self.loaded = False
+		if self._preloaded:
+			for t in self.textures:
+				resman.release(t)
+			self._preloaded = False
+
+	def _park(self, obj):
+		geoms = []
+		parts = [obj]
+		if isinstance(obj, gameobj.LimbedGameObj):
+			parts.extend(obj.limbs)
+		for part in parts:
+			for geom in part.owned_geoms():
+				geoms.append((geom, app.static_space.query(geom)))
+				util.remove_geom(geom)
+		asleep = obj.asleep
+		for part in parts:
+			part.sleep()
+		layer = app.objects.layer_of(obj)
+		app.objects.remove(obj)
+		self._parked.append((obj, layer, asleep, geoms))
+
+
+class ChunkMap(object):
+	"""Divides a level into Chunks, and keeps the ones near the camera loaded.
+
+	Set app.streamer to a ChunkMap to have it updated automatically each sim step.
+
+	Chunks are loaded when they come within load_radius of the camera, or of where the camera
+	is heading (based on its recent motion and lead_time). Their textures are read in earlier
+	still, at preload_radius. Chunks are unloaded once they're farther than unload_radius from
+	both of those, which should be a bit bigger than load_radius so that chunks don't flicker
+	in and out when the camera sits near a boundary. Preload_radius can't be bigger than unload_radius,
+	or chunks in between would be preloaded and unloaded again on every update.
+
+	Data attributes:
+	chunk_size -- The width and height of each chunk in meters.
+	chunks -- A dictionary from (x, y) chunk index to Chunk.
+	load_radius -- Distance in meters from the camera at which chunks are loaded.
+	preload_radius -- Distance in meters from the camera at which chunk textures are preloaded.
+	unload_radius -- Distance in meters from the camera past which chunks are unloaded.
+	lead_time -- How many seconds ahead to guess where the camera will be.
+	max_loads -- The most chunks loaded in one update, so that a burst of loading is spread over a few steps.
+		The nearest chunks are loaded first.
+	update_interval -- How many sim steps apart to check which chunks need loading or unloading.
+	"""
+
+	def __init__(self, chunk_size = 16.0, load_radius = 20.0, preload_radius = 26.0, unload_radius = 30.0, lead_time = 1.0, max_loads = 2, update_interval = 5):
+		assert preload_radius <= unload_radius, "preload_radius must not be larger than unload_radius"
+		self.chunk_size = chunk_size
+		self.chunks = {}
+		self.load_radius = load_radius
+		self.preload_radius = preload_radius
+		self.unload_radius = unload_radius
+		self.lead_time = lead_time
+		self.max_loads = max_loads
+		self.update_interval = update_interval
+		self._loaded = {} #Key: chunk key, value: Chunk; just the ones that are loaded or preloaded
+		self._last_cam = None
+		self._last_step = 0
+
+	def key_of(self, pos):
+		"""Returns the (x, y) index of the chunk containing the given position."""
+		return (int(math.floor(pos[0]/self.chunk_size)), int(math.floor(pos[1]/self.chunk_size)))
+
+	def chunk_at(self, pos):
+		"""Returns the Chunk containing the given position, creating an empty one if needed."""
+		key = self.key_of(pos)
+		if not self.chunks.has_key(key):
+			self.chunks[key] = Chunk(key)
+		return self.chunks[key]
+
+	def add(self, pos, builder, textures = ()):
+		"""Adds a builder (see Chunk.builders) to the chunk containing pos, along with the textures it uses."""
+		chunk = self.chunk_at(pos)
+		chunk.builders.append(builder)
+		chunk.textures.update(textures)
+		return chunk
+
+	def _dist(self, key, pos):
+		#Distance from pos to the nearest point of the chunk
+		size = self.chunk_size
+		dx = max(key[0]*size - pos[0], 0, pos[0] - (key[0]+1)*size)
+		dy = max(key[1]*size - pos[1], 0, pos[1] - (key[1]+1)*size)
+		return math.sqrt(dx*dx + dy*dy)
+
+	def _near(self, pos, radius):
+		#Returns the chunks that have any part within radius of pos
+		ret = []
+		lo = self.key_of(pos - radius)
+		hi = self.key_of(pos + radius)
+		for x in range(lo[0], hi[0]+1):
+			for y in range(lo[1], hi[1]+1):
+				chunk = self.chunks.get((x, y))
+				if chunk != None and self._dist(chunk.key, pos) <= radius:
+					ret.append(chunk)
+		return ret
+
+	def update(self, force = False):
+		"""Loads, preloads and unloads chunks as needed based on where the camera is and where it's going.
+
+		Unless force is True, this only does anything every update_interval steps."""
+		if not force and app.totalsteps - self._last_step < self.update_interval and self._last_cam != None:
+			return
+
+		cam = Point(app.camera[0], app.camera[1])
+		if self._last_cam == None or app.totalsteps == self._last_step:
+			ahead = cam
+		else:
+			vel = (cam - self._last_cam)*(app.simfps/(app.totalsteps - self._last_step))
+			ahead = cam + vel*self.lead_time
+		self._last_cam = cam
+		self._last_step = app.totalsteps
+
+		for pos in (cam, ahead):
+			for chunk in self._near(pos, self.preload_radius):
+				chunk.preload()
+				self._loaded[chunk.key] = chunk
+
+		wanted = {}
+		for pos in (cam, ahead):
+			for chunk in self._near(pos, self.load_radius):
+				if not chunk.loaded:
+					wanted[chunk.key] = min(self._dist(chunk.key, cam), wanted.get(chunk.key, self._dist(chunk.key, cam)))
+		order = wanted.keys()
+		order.sort(key = lambda k: wanted[k])
+		for key in order[:self.max_loads]:
+			self.chunks[key].load()
+
+		for chunk in self._loaded.values():
+			if self._dist(chunk.key, cam) > self.unload_radius and self._dist(chunk.key, ahead) > self.unload_radius:
+				chunk.unload(self._movers(chunk))
+				del self._loaded[chunk.key]
+
+	def _movers(self, chunk):
+		#Returns the moving objects now in a chunk
+		ret = []
+		for o in app.objects.with_body():
+			if self.key_of(o.pos) == chunk.key:
+				ret.append(o)
+		for o in chunk.objs:
+			if o.kinematic and self.key_of(o.pos) == chunk.key:
+				ret.append(o)
+		return ret
+	
+	def unload_all(self):
+		"""Unloads every chunk."""
+		for chunk in self._loaded.values():
+			chunk.unload(self._movers(chunk))
+		self._loaded = {}
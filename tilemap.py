@@ -0,0 +1,258 @@
+"""Levels made out of a grid of tiles, instead of hand-placed boxes."""
+
+from __future__ import division
+import array
+from OpenGL.GL import *
+
+import app, gameobj, geommold, drive, resman, util, collision
+from geometry import *
+
+class TileSet(object):
+	"""The images and solidity of the tiles that a TileMap can use.
+
+	Tile images come from texture pages: image files divided into a grid of equally sized tiles.
+	Tile ids are numbered from 1, going across each row of the first page, then down its rows,
+	then on to the next page. Tile id 0 is always empty.
+
+	Data attributes:
+	pages -- A list of (resman.Texture, columns, rows) tuples.
+	solid -- A set of the tile ids that collide, or None if every non-empty tile does.
+	"""
+
+	def __init__(self, pages, solid = None):
+		"""Creates a TileSet from a list of (image file, columns, rows) tuples."""
+		self.pages = [(resman.Texture(img), cols, rows) for (img, cols, rows) in pages]
+		self.solid = solid
+
+		self._lookup = [None] #Index is tile id, value is (page index, texture coordinates of tl, tr, br, bl)
+		for (p, (tex, cols, rows)) in enumerate(self.pages):
+			for j in range(rows):
+				for i in range(cols):
+					u0, u1 = i/cols, (i+1)/cols
+					vt, vb = 1 - j/rows, 1 - (j+1)/rows #Textures are loaded upside down, so v of 1 is the top
+					self._lookup.append((p, ((u0, vt), (u1, vt), (u1, vb), (u0, vb))))
+
+	def __len__(self):
+		return len(self._lookup)
+
+	def tile(self, tid):
+		"""Returns (page index, texture coordinates) for a tile id. The texture coordinates are for the tl, tr, br and bl corners."""
+		return self._lookup[tid]
+
+	def is_solid(self, tid):
+		if tid == 0: return False
+		if self.solid == None: return True
+		return tid in self.solid
+
+
+class DTiles(drive.Drive):
+	"""Drive that draws a TileMap's tiles, with one GL display list per texture page.
+
+	A page's display list is rebuilt when the TileMap says that a tile on it has changed.
+	This drive should only be used on TileMaps; TileMap adds it for you.
+	"""
+
+	def __init__(self):
+		super(DTiles, self).__init__(drawing = True)
+		self._lists = None
+
+	def clone(self):
+		ret = super(DTiles, self).clone()
+		ret._lists = None
+		return ret
+
+	def destroy(self, obj):
+		if self._lists != None:
+			glDeleteLists(self._lists, len(obj.tileset.pages))
+			self._lists = None
+
+	def _compile(self, obj, page):
+		ts = obj.tile_size
+		glNewList(self._lists + page, GL_COMPILE)
+		glBegin(GL_QUADS)
+		for (c, r, texcoords) in obj.page_tiles(page):
+			corners = ((c*ts, r*ts), ((c+1)*ts, r*ts), ((c+1)*ts, (r+1)*ts), (c*ts, (r+1)*ts))
+			for i in range(4):
+				glTexCoord2fv(texcoords[i])
+				glVertex2fv(corners[i])
+		glEnd()
+		glEndList()
+
+	def _draw(self, obj):
+		#The set is swapped out in one go, since set_tile() can add to it from the sim thread
+		pages, obj._dirty_pages = obj._dirty_pages, set()
+		if self._lists == None:
+			self._lists = glGenLists(len(obj.tileset.pages))
+			pages = range(len(obj.tileset.pages))
+		for page in pages:
+			self._compile(obj, page)
+
+		glEnable(GL_TEXTURE_2D)
+		glTexEnvf(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+		for (page, (tex, cols, rows)) in enumerate(obj.tileset.pages):
+			glBindTexture(GL_TEXTURE_2D, tex.glname)
+			glCallList(self._lists + page)
+		glDisable(GL_TEXTURE_2D)
+
+
+class TileMap(gameobj.GameObj):
+	"""A GameObj that is a grid of tiles, meant for layer 1.
+
+	The tiles are kept in a compact array of tile ids (see TileSet). The object's pos is the top-left
+	corner of the map; tile (0, 0) is the top-left tile, and tile (c, r) is c tiles right and r tiles down
+	from it. A TileMap can't be moved or rotated once it's made.
+
+	Solid tiles are covered by as few GeomBoxes in app.static_space as greedy meshing can manage:
+	each box is grown as far right as it can go along a row, then as far down as that whole
+	run stays solid. When a tile is changed with set_tile(), only the rows with boxes touching
+	that tile are meshed again. The boxes all have the TileMap as their gameobj, but it has no geom
+	of its own; owns_geoms is set so that it isn't treated as a geomless point at its pos.
+
+	Data attributes:
+	tileset -- The TileSet.
+	cols, rows -- The size of the map in tiles.
+	tile_size -- The width and height of each tile in meters.
+	tiles -- An array.array of tile ids, row after row. Use get_tile() and set_tile() rather than changing it directly.
+	listeners -- A list of functions to call as f(tilemap, col, row) after set_tile() changes a tile.
+		For example, navigation data built from the map can use this to know when to update itself.
+	"""
+
+	owns_geoms = True
+	
+	def __init__(self, tileset, cols, rows, tile_size = 1.0, pos = None, tiles = None, coll_props = -1):
+		"""Creates a TileMap. If tiles is given, it's a list of rows, each a list of tile ids; otherwise the map starts empty.
+
+		Coll_props is used for all the boxes, as in GeomMold.make_geom()."""
+		super(TileMap, self).__init__(pos = pos)
+		self.tileset = tileset
+		self.cols = cols
+		self.rows = rows
+		self.tile_size = tile_size
+		self.tiles = array.array("H", [0]*(cols*rows))
+		if tiles != None:
+			for (r, row) in enumerate(tiles):
+				for (c, tid) in enumerate(row):
+					self.tiles[r*cols + c] = tid
+		self.listeners = []
+
+		if coll_props == -1: self._coll_props = collision.Props()
+		else: self._coll_props = coll_props
+		self._mold = geommold.BoxGeomMold()
+		self._boxes = {} #Key is (col, row, width, height) in tiles, value is the GeomBox
+		self._dirty_pages = set(range(len(tileset.pages)))
+
+		self.drives.append(DTiles())
+		self._mesh(0, rows-1)
+
+	def get_tile(self, c, r):
+		"""Returns the id of the tile at column c and row r."""
+		return self.tiles[r*self.cols + c]
+
+	def set_tile(self, c, r, tid):
+		"""Changes the tile at column c and row r, updating the collision boxes and drawing to match."""
+		old = self.tiles[r*self.cols + c]
+		if old == tid:
+			return
+		self.tiles[r*self.cols + c] = tid
+		for t in (old, tid):
+			if t != 0:
+				self._dirty_pages.add(self.tileset.tile(t)[0])
+		if self.tileset.is_solid(old) != self.tileset.is_solid(tid):
+			self._remesh(r)
+		for f in self.listeners:
+			f(self, c, r)
+
+	def boxes(self):
+		"""Returns a list of the (col, row, width, height) rectangles of tiles that the collision boxes cover."""
+		return self._boxes.keys()
+
+	def owned_geoms(self):
+		return self._boxes.values()
+	
+	def tile_at(self, pos):
+		"""Returns the (col, row) of the tile under a point, or None if it's outside the map."""
+		c = int((pos[0] - self.pos[0])//self.tile_size)
+		r = int((pos[1] - self.pos[1])//self.tile_size)
+		if 0 <= c < self.cols and 0 <= r < self.rows:
+			return (c, r)
+		return None
+
+	def page_tiles(self, page):
+		"""Returns a list of (col, row, texture coordinates) for each tile on the given texture page."""
+		ret = []
+		i = 0
+		for r in range(self.rows):
+			for c in range(self.cols):
+				tid = self.tiles[i]
+				i += 1
+				if tid == 0:
+					continue
+				(p, texcoords) = self.tileset.tile(tid)
+				if p == page:
+					ret.append((c, r, texcoords))
+		return ret
+
+	def _solid(self, c, r):
+		return self.tileset.is_solid(self.tiles[r*self.cols + c])
+
+	def _mesh(self, r0, r1):
+		#Greedily covers the solid tiles in rows r0 through r1 with boxes
+		covered = set()
+		for r in range(r0, r1+1):
+			c = 0
+			while c < self.cols:
+				if not self._solid(c, r) or (c, r) in covered:
+					c += 1
+					continue
+
+				w = 1
+				while c+w < self.cols and self._solid(c+w, r) and (c+w, r) not in covered:
+					w += 1
+
+				h = 1
+				while r+h <= r1:
+					full = True
+					for x in range(c, c+w):
+						if not self._solid(x, r+h) or (x, r+h) in covered:
+							full = False
+							break
+					if not full:
+						break
+					h += 1
+
+				for y in range(r, r+h):
+					for x in range(c, c+w):
+						covered.add((x, y))
+				self._add_box((c, r, w, h))
+				c += w
+
+	def _add_box(self, rect):
+		(c, r, w, h) = rect
+		ts = self.tile_size
+		geom = self._mold.make_geom(Size(w*ts, h*ts), app.static_space, self._coll_props)
+		geom.setPosition((self.pos[0] + (c + w/2)*ts, self.pos[1] + (r + h/2)*ts, 0))
+		geom.gameobj = self
+		self._boxes[rect] = geom
+
+	def _remesh(self, row):
+		#Finds the band of rows that boxes touching the row reach, takes out all the boxes in it, and meshes it again
+		r0, r1 = row, row
+		changed = True
+		while changed:
+			changed = False
+			for (c, r, w, h) in self._boxes.iterkeys():
+				if r <= r1 and r+h-1 >= r0 and (r < r0 or r+h-1 > r1):
+					r0 = min(r0, r)
+					r1 = max(r1, r+h-1)
+					changed = True
+		for rect in self._boxes.keys():
+			if rect[1] <= r1 and rect[1]+rect[3]-1 >= r0:
+				util.remove_geom(self._boxes.pop(rect))
+		self._mesh(r0, r1)
+
+	def _teardown(self):
+		for geom in self._boxes.itervalues():
+			util.remove_geom(geom)
+			geom.gameobj = None
+		self._boxes = {}
+		super(TileMap, self)._teardown()
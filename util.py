@@ -1,6 +1,6 @@
 from __future__ import division
 
-import pygame, os, ode, math, sre
+import pygame, os, ode, math, sre, collections
 
 import app, collision
 from geometry import *
@@ -72,12 +72,27 @@ def sphere_body(density, radius):
 	body.body_type = "sphere"
 	return body
 
+def remove_geom(geom):
+	"""Takes a geom out of whichever space it's in, if any.
+	
+	The geom's getSpace() only knows the space the geom was created in, which might not be where
+	it is now (see app.optimize_spaces()), so app.dyn_space and app.static_space are checked as well."""
+	for space in (app.dyn_space, app.static_space, geom.getSpace()):
+		if space != None and space.query(geom):
+			space.remove(geom)
+			return
+
 
 class TrackerList(list):
 	"""A membership-checking optimized version of the regular list.
 	
 	Behaves exactly like a list, except that the 'in' operator, count, and __contains__ are
-	more efficient, and compare by id(), rather than by equality."""
+	more efficient, and compare by id(), rather than by equality.
+	
+	Subclasses can override _changed(), which is called after anything is added or removed."""
+	
+	def _changed(self):
+		pass
 	
 	def _decrid(self, i, n = 1):
 		#Decrease the idcount for the given id by n
@@ -115,6 +130,7 @@ class TrackerList(list):
 			for e in list.__getitem__(self, y):
 				self._decrid(id(e))
 		list.__delitem__(self, y)
+		self._changed()
 	
 	def __delslice__(self, i, j):
 		self.__delitem__(slice(i, j))
@@ -137,12 +153,14 @@ class TrackerList(list):
 		else:
 			for v in y:
 				self._incrid(id(v))
+		self._changed()
 		return self
 	
 	def __imul__(self, y):
 		list.__imul__(self, y)
 		for k in self._idcounts.keys():
 			self._idcounts[k] *= y
+		self._changed()
 		return self
 	
 	def __mul__(self, y):
@@ -163,6 +181,7 @@ class TrackerList(list):
 			list.__setitem__(self, i, y)
 			for e in y:
 				self._incrid(id(e))
+		self._changed()
 	
 	def __setslice__(self, i, j, v):
 		self.__setitem__(slice(i, j), v)
@@ -191,6 +210,7 @@ class TrackerList(list):
 	def append(self, o):
 		list.append(self, o)
 		self._incrid(id(o))
+		self._changed()
 	
 	def count(self, val):
 		if self._idcounts.has_key(id(val)):
@@ -206,23 +226,132 @@ class TrackerList(list):
 		else:
 			for v in iterable:
 				self._incrid(id(v))
+		self._changed()
 
 	def insert(self, idx, o):
 		list.insert(self, idx, o)
 		self._incrid(id(o))
+		self._changed()
 	
 	def pop(self, idx = None):
 		if idx == None:
 			self._decrid(id(self[-1]))
-			return list.pop(self)
+			ret = list.pop(self)
 		else:
 			self._decrid(id(self[idx]))
-			return list.pop(self, idx)
+			ret = list.pop(self, idx)
+		self._changed()
+		return ret
 	
 	def remove(self, val):
 		#This will throw an exception (before _decrid() is called) if val is not in list
 		list.remove(self, val)
 		self._decrid(id(val))
+		self._changed()
+
+
+class DriveList(TrackerList):
+	"""A TrackerList of drives that tells the GameObj it belongs to whenever it changes, so that indexes can be kept up to date.
+	
+	Each drive in the list is told which list it's in, so that changing its drawing, stepping or
+	sleep_stepping flags (see drive.Drive) bumps just this list's gen. A drive should only be in one
+	DriveList at a time; use Drive.clone() to put the same sort of drive on another object.
+	
+	Data attributes:
+	owner -- The GameObj to call _drives_changed() on, or None.
+	gen -- A number that goes up whenever the list changes, or the flags of a drive in it change.
+		GameObjs use this to know when their dispatch tuples (see GameObj._dispatch_for()) are out of date.
+	"""
+	
+	def __init__(self, seq = None, owner = None):
+		super(DriveList, self).__init__(seq)
+		self.owner = owner
+		self.gen = 0
+		self._claim()
+	
+	def _claim(self):
+		#Tells each drive that it's in this list
+		for d in self:
+			d._drive_list = self
+	
+	def _changed(self):
+		self.gen += 1
+		self._claim()
+		if self.owner != None:
+			self.owner._drives_changed()
+
+
+class PropSet(set):
+	"""A set of property strings that tells the GameObj it belongs to whenever it changes; see GameObj.props.
+	
+	Data attributes:
+	owner -- The GameObj to call _props_changed() on, or None.
+	"""
+	
+	owner = None #Sets made by operators like - and & come out as PropSets without going through __init__
+	
+	def __init__(self, seq = (), owner = None):
+		set.__init__(self, seq)
+		self.owner = owner
+	
+	def _changed(self):
+		if self.owner != None:
+			self.owner._props_changed()
+	
+	def add(self, x):
+		if x not in self:
+			set.add(self, x)
+			self._changed()
+	
+	def discard(self, x):
+		if x in self:
+			set.discard(self, x)
+			self._changed()
+	
+	def remove(self, x):
+		set.remove(self, x)
+		self._changed()
+	
+	def pop(self):
+		ret = set.pop(self)
+		self._changed()
+		return ret
+	
+	def clear(self):
+		set.clear(self)
+		self._changed()
+	
+	def update(self, *seqs):
+		set.update(self, *seqs)
+		self._changed()
+	
+	def difference_update(self, *seqs):
+		set.difference_update(self, *seqs)
+		self._changed()
+	
+	def intersection_update(self, *seqs):
+		set.intersection_update(self, *seqs)
+		self._changed()
+	
+	def symmetric_difference_update(self, seq):
+		set.symmetric_difference_update(self, seq)
+		self._changed()
+	
+	def __ior__(self, y):
+		self.update(y)
+		return self
+	
+	def __iand__(self, y):
+		self.intersection_update(y)
+		return self
+	
+	def __isub__(self, y):
+		self.difference_update(y)
+		return self
+	
+	def __ixor__(self, y):
+		self.symmetric_difference_update(y)
+		return self
 
 
 class LayeredList(list):
@@ -285,6 +414,14 @@ class LayeredList(list):
 		else:
 			self[len(self)-1].append(o)
 	
+	def remove(self, val):
+		"""Removes val from whichever sublist it is in. Raises ValueError if it isn't in any of them."""
+		for sublist in self.plain_iter():
+			if val in sublist:
+				sublist.remove(val)
+				return
+		raise ValueError("LayeredList.remove(x): x not in list")
+	
 	def plain_iter(self):
 		"""Returns an iterator that behaves like a regular list iterator, doesnt skip over or descend into sublists."""
 		return super(LayeredList, self).__iter__()
@@ -295,3 +432,252 @@ class LayeredList(list):
 		for sublist in self:
 			sum += sublist.count(val)
 		return sum
+
+
+class ObjectLayer(object):
+	"""One layer of an ObjectRegistry: an ordered collection of objects, without duplicates.
+	
+	Appending and removing are O(1), as are membership checks, which compare by id().
+	Iterating goes over a tuple that's cached until the layer next changes, so it's safe to
+	append or remove objects in the middle of iterating; the change shows up in the next iteration.
+	Indexing works as with a list, but is O(n) the first time after each change.
+	"""
+	
+	def __init__(self, seq = None):
+		"""Creates a new ObjectLayer. If seq is provided, the layer starts out with seq's items."""
+		self._objs = collections.OrderedDict() #Key is id(obj), value is obj
+		self._cache = None
+		self._registry = None
+		if seq != None:
+			for o in seq:
+				self.append(o)
+	
+	def __contains__(self, o):
+		return self._objs.has_key(id(o))
+	
+	def __getitem__(self, i):
+		return self.items()[i]
+	
+	def __iter__(self):
+		return iter(self.items())
+	
+	def __len__(self):
+		return len(self._objs)
+	
+	def __str__(self):
+		ret = ""
+		x = 0
+		for i in self.items():
+			ret = ret + "%02i: %s\n" % (x, str(i))
+			x += 1
+		return ret
+	
+	def _changed(self):
+		self._cache = None
+		if self._registry != None:
+			self._registry._cache = None
+	
+	def append(self, o):
+		"""Adds an object to the end of the layer. Raises ValueError if it's already in this layer or another of the same registry."""
+		if self._objs.has_key(id(o)):
+			raise ValueError("ObjectLayer.append(x): x already in layer")
+		if self._registry != None:
+			self._registry._add(o, self)
+		self._objs[id(o)] = o
+		self._changed()
+	
+	def extend(self, seq):
+		for o in seq:
+			self.append(o)
+	
+	def remove(self, o):
+		"""Removes an object from the layer. Raises ValueError if it isn't in the layer."""
+		if not self._objs.has_key(id(o)):
+			raise ValueError("ObjectLayer.remove(x): x not in layer")
+		del self._objs[id(o)]
+		if self._registry != None:
+			self._registry._discard(o)
+		self._changed()
+	
+	def count(self, o):
+		if self._objs.has_key(id(o)): return 1
+		else: return 0
+	
+	def items(self):
+		"""Returns a tuple of the objects in the layer, in order."""
+		if self._cache == None:
+			self._cache = tuple(self._objs.itervalues())
+		return self._cache
+
+
+class ObjectRegistry(object):
+	"""A collection of objects sorted into ObjectLayers, which iterates over all their objects in layer order.
+	
+	Like LayeredList, append() with an ObjectLayer (or any list, which is turned into an ObjectLayer)
+	adds a new layer at the end, and append() with anything else adds it to the last layer. Indexing gives
+	the layers. Each object can only be in one layer at a time.
+	
+	Iteration goes over a tuple of every object that's cached until anything changes, so it's safe
+	to add and remove objects while iterating. Removing an object and checking membership are O(1),
+	since the registry keeps track of which layer each object is in.
+	
+	The registry also keeps indexes of its objects by property (see GameObj.props), by the classes
+	of their drives, and by whether they have a body or geom. The with_*() methods use these,
+	so they take time in proportion to how many objects they return, not how many are in the registry.
+	GameObjs call reindex() on the registry themselves whenever any of those things change.
+	"""
+	
+	def __init__(self):
+		self._layers = []
+		self._where = {} #Key is id(obj), value is the ObjectLayer it's in
+		self._cache = None
+		self._indexed = {} #Key is id(obj), value is (props, drive classes, has body, has geom, counts as geomless) as of the last index
+		self._by_prop = {} #Key is prop string, value is OrderedDict from id(obj) to obj
+		self._by_drive = {} #Key is drive class, value is OrderedDict from id(obj) to obj
+		self._by_body = collections.OrderedDict()
+		self._by_geom = collections.OrderedDict()
+		self._by_no_geom = collections.OrderedDict()
+	
+	def __contains__(self, o):
+		return self._where.has_key(id(o))
+	
+	def __getitem__(self, i):
+		return self._layers[i]
+	
+	def __iter__(self):
+		return iter(self.items())
+	
+	def __len__(self):
+		return len(self._layers)
+	
+	def __str__(self):
+		ret = ""
+		x = 0
+		for i in self._layers:
+			ret = ret + ("%02i:\n%s\n" % (x, sre.sub(LayeredList._tabberpat, " ", str(i)))).strip() + "\n"
+			x += 1
+		return ret.strip()
+	
+	def _add(self, o, layer):
+		#Called by a layer of this registry when an object is appended to it
+		if self._where.has_key(id(o)):
+			raise ValueError("ObjectRegistry: x already in another layer")
+		self._where[id(o)] = layer
+		self._index(o)
+	
+	def _discard(self, o):
+		#Called by a layer of this registry when an object is removed from it
+		del self._where[id(o)]
+		self._unindex(o)
+	
+	def _index(self, o):
+		props = frozenset(getattr(o, "props", ()))
+		classes = set()
+		for d in getattr(o, "drives", ()):
+			classes.add(type(d))
+		for d in getattr(o, "postdrives", ()):
+			classes.add(type(d))
+		has_body = getattr(o, "body", None) != None
+		has_geom = getattr(o, "geom", None) != None
+		geomless = not has_geom and not getattr(o, "owns_geoms", False)
+		
+		k = id(o)
+		for p in props:
+			self._by_prop.setdefault(p, collections.OrderedDict())[k] = o
+		for c in classes:
+			self._by_drive.setdefault(c, collections.OrderedDict())[k] = o
+		if has_body: self._by_body[k] = o
+		if has_geom: self._by_geom[k] = o
+		if geomless: self._by_no_geom[k] = o
+		self._indexed[k] = (props, classes, has_body, has_geom, geomless)
+	
+	def _unindex(self, o):
+		k = id(o)
+		(props, classes, has_body, has_geom, geomless) = self._indexed.pop(k)
+		for p in props:
+			index = self._by_prop[p]
+			del index[k]
+			if len(index) == 0: del self._by_prop[p]
+		for c in classes:
+			index = self._by_drive[c]
+			del index[k]
+			if len(index) == 0: del self._by_drive[c]
+		if has_body: del self._by_body[k]
+		if has_geom: del self._by_geom[k]
+		if geomless: del self._by_no_geom[k]
+	
+	def reindex(self, o):
+		"""Brings the indexes up to date with an object's props, drives, body and geom. Does nothing if it isn't in the registry."""
+		if self._indexed.has_key(id(o)):
+			self._unindex(o)
+			self._index(o)
+	
+	def with_prop(self, prop):
+		"""Returns a tuple of the objects that have the given string in their props."""
+		index = self._by_prop.get(prop)
+		if index == None: return ()
+		return tuple(index.itervalues())
+	
+	def with_drive(self, cls):
+		"""Returns a tuple of the objects that have a drive (or postdrive) that is an instance of the given class."""
+		ret = collections.OrderedDict()
+		for (c, index) in self._by_drive.iteritems():
+			if issubclass(c, cls):
+				ret.update(index)
+		return tuple(ret.itervalues())
+	
+	def with_body(self):
+		"""Returns a tuple of the objects that have a body."""
+		return tuple(self._by_body.itervalues())
+	
+	def with_geom(self):
+		"""Returns a tuple of the objects that have a geom."""
+		return tuple(self._by_geom.itervalues())
+	
+	def without_geom(self):
+		"""Returns a tuple of the objects that don't have a geom, other than ones with owns_geoms set (see GameObj)."""
+		return tuple(self._by_no_geom.itervalues())
+	
+	def append(self, o):
+		if isinstance(o, ObjectLayer) or isinstance(o, list):
+			if isinstance(o, ObjectLayer):
+				layer = o
+			else:
+				layer = ObjectLayer(o)
+			if layer._registry != None:
+				raise ValueError("ObjectRegistry.append(x): layer x already belongs to a registry")
+			for obj in layer:
+				self._add(obj, layer)
+			layer._registry = self
+			self._layers.append(layer)
+			self._cache = None
+		else:
+			self._layers[-1].append(o)
+	
+	def remove(self, o):
+		"""Removes an object from whichever layer it's in. Raises ValueError if it isn't in any of them."""
+		layer = self._where.get(id(o))
+		if layer == None:
+			raise ValueError("ObjectRegistry.remove(x): x not in registry")
+		layer.remove(o)
+	
+	def layer_of(self, o):
+		"""Returns the ObjectLayer that an object is in, or None if it isn't in the registry."""
+		return self._where.get(id(o))
+	
+	def count(self, o):
+		if self._where.has_key(id(o)): return 1
+		else: return 0
+	
+	def plain_iter(self):
+		"""Returns an iterator over the layers themselves, like LayeredList.plain_iter()."""
+		return iter(self._layers)
+	
+	def items(self):
+		"""Returns a tuple of every object in every layer, in layer order."""
+		if self._cache == None:
+			objs = []
+			for layer in self._layers:
+				objs.extend(layer.items())
+			self._cache = tuple(objs)
+		return self._cache